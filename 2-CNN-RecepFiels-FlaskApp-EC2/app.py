@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, abort, Response, g
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
@@ -7,20 +7,109 @@ import matplotlib.patches as patches
 from PIL import Image
 import io
 import base64
+import json
 import os
+import threading
+import time
+import zipfile
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import partial
+
+from conv_engine import conv2d
+from pool_engine import normalize_pool_type, pool2d
+from render_cache import RenderCache, cache_key
+from image_store import ImageStore
+from render_pool import RenderPool
+from prefix_cache import PrefixCache, options_tag, prefix_keys
+from layer_stream import stream_stack
+from metrics import Metrics, StageTimer, profile_call
+from digit_predictor import DynamicBatcher, load_model, prepare_digit
+import fast_render
 
 app = Flask(__name__)
 
 # Ensure static folder exists
 os.makedirs('static', exist_ok=True)
 
-def create_sample_image():
+# Rendered results keyed on (input pixels, layer stack, render options)
+RENDER_CACHE_ENABLED = os.environ.get('RENDER_CACHE', '1') != '0'
+RENDER_OPTIONS = {'dpi': 100}
+render_cache = RenderCache(
+    max_memory_entries=int(os.environ.get('RENDER_CACHE_ENTRIES', 128)),
+    disk_dir=os.environ.get('RENDER_CACHE_DIR', 'render_cache') or None,
+    max_disk_bytes=int(os.environ.get('RENDER_CACHE_DISK_MB', 256)) * 1024 * 1024,
+)
+
+# Per-layer outputs and figures keyed by config prefix, so editing the tail of
+# a stack only recomputes and re-renders the layers after the edit
+prefix_cache = PrefixCache(max_bytes=int(os.environ.get('PREFIX_CACHE_MB', 64)) * 1024 * 1024)
+
+# 'matplotlib' draws the pretty figures, 'fast' rasterizes them with NumPy/PIL
+RENDERERS = ('matplotlib', 'fast')
+DEFAULT_RENDERER = os.environ.get('RENDERER', 'matplotlib')
+
+# 'grid' shrinks inputs to the classic 8x8 teaching grid; 'full' keeps native
+# resolution and only downsamples the figures to PREVIEW_SIZE
+RESOLUTIONS = ('grid', 'full')
+GRID_SIZE = 8
+FULL_SAMPLE_SIZE = 28   # MNIST resolution for the built-in sample
+PREVIEW_SIZE = int(os.environ.get('PREVIEW_SIZE', 128))
+# Full-resolution /process/batch outputs are returned, so they live for the whole
+# request; float32 halves them
+FULL_RESOLUTION_DTYPE = np.float32
+
+# Refuse oversized uploads before reading or decoding them
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 8)) * 1024 * 1024
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 4096 * 4096))
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# Worker processes for matplotlib figures; 0 renders serially in the request thread
+render_pool = RenderPool(workers=int(os.environ.get('RENDER_WORKERS', 0)))
+
+# /process/batch limits and result formats
+MAX_BATCH_IMAGES = int(os.environ.get('MAX_BATCH_IMAGES', 10000))
+MAX_BATCH_PIXELS = int(os.environ.get('MAX_BATCH_PIXELS', 64 * 1024 * 1024))
+BATCH_FORMATS = ('jsonl', 'zip')
+BATCH_OUTPUTS = ('none', 'final', 'all')
+
+# How figures are returned: 'url' (per-request URLs), 'inline'
+# (base64 data URLs in the JSON) or 'static' (legacy fixed files in static/)
+OUTPUT_MODES = ('url', 'inline', 'static')
+OUTPUT_MODE = os.environ.get('OUTPUT_MODE', 'url')
+image_store = ImageStore(
+    ttl=int(os.environ.get('IMAGE_STORE_TTL', 300)),
+    max_entries=int(os.environ.get('IMAGE_STORE_ENTRIES', 256)),
+    max_bytes=int(os.environ.get('IMAGE_STORE_MB', 64)) * 1024 * 1024,
+    # Off by default: each worker keeps its own figures. Point every worker at one
+    # shared directory so /images/ works whichever worker a GET lands on
+    disk_dir=os.environ.get('IMAGE_STORE_DIR') or None,
+)
+
+# Stage timings and request counts, exported at /metrics; "profile" in a
+# /process request is only honoured when PROFILE_REQUESTS=1
+metrics = Metrics()
+metrics.describe('stage_seconds', 'histogram', 'Time spent in each stage of a request')
+metrics.describe('request_seconds', 'histogram', 'Total request handling time by endpoint')
+metrics.describe('requests_total', 'counter', 'Requests handled by endpoint and status code')
+PROFILING_ENABLED = os.environ.get('PROFILE_REQUESTS', '0') == '1'
+
+# /predict serves an exported MNIST Net (TorchScript .pt or ONNX .onnx), batching
+# concurrent requests for up to DIGIT_BATCH_WAIT_MS; torch is only loaded if it is set
+DIGIT_MODEL = os.environ.get('DIGIT_MODEL')
+DIGIT_BATCH_MAX = int(os.environ.get('DIGIT_BATCH_MAX', 64))
+DIGIT_BATCH_WAIT_MS = float(os.environ.get('DIGIT_BATCH_WAIT_MS', 5))
+DIGIT_TIMEOUT = float(os.environ.get('DIGIT_TIMEOUT', 10))
+DIGIT_THREADS = int(os.environ.get('DIGIT_THREADS', 0)) or None
+digit_batcher = None
+_digit_batcher_lock = threading.Lock()
+
+def create_sample_image(size=8):
     """Load the MNIST digit image as the default sample"""
     try:
         # Try to load the MNIST image
         img = Image.open('MNIST-Number3.png').convert('L')  # Convert to grayscale
-        # Resize to 8x8 for educational clarity
-        img_resized = img.resize((8, 8), Image.Resampling.LANCZOS)
+        # Resize to 8x8 for educational clarity (or 28x28 in full-resolution mode)
+        img_resized = img.resize((size, size), Image.Resampling.LANCZOS)
         return np.array(img_resized)
     except:
         # Fallback to generated pattern if image loading fails
@@ -33,71 +122,61 @@ def create_sample_image():
         img[6, 6] = 255      
         img[3:5, 1:7] = 128  # Horizontal line
         img[1:7, 3:5] = 128  # Vertical line
+        if size != 8:
+            img = np.array(Image.fromarray(img).resize((size, size), Image.Resampling.NEAREST))
         return img
 
-def apply_convolution(image, kernel, padding=0, stride=1):
-    """Apply 2D convolution to image with configurable padding and stride"""
-    h, w = image.shape
-    kh, kw = kernel.shape
-    
-    # Calculate output dimensions
-    output_h = (h + 2 * padding - kh) // stride + 1
-    output_w = (w + 2 * padding - kw) // stride + 1
-    
-    # Pad image
-    padded = np.pad(image, ((padding, padding), (padding, padding)), mode='constant')
-    
-    # Apply convolution
-    output = np.zeros((output_h, output_w))
-    for i in range(output_h):
-        for j in range(output_w):
-            y = i * stride
-            x = j * stride
-            output[i, j] = np.sum(padded[y:y+kh, x:x+kw] * kernel)
-    
-    return output
-
-def apply_pooling(image, pool_size=2, pool_type='max', stride=None):
-    """Apply pooling operation with configurable parameters"""
-    if stride is None:
-        stride = pool_size
-    
-    h, w = image.shape
-    output_h = (h - pool_size) // stride + 1
-    output_w = (w - pool_size) // stride + 1
-    
-    output = np.zeros((output_h, output_w))
-    
-    for i in range(output_h):
-        for j in range(output_w):
-            y = i * stride
-            x = j * stride
-            region = image[y:y+pool_size, x:x+pool_size]
-            if pool_type == 'max':
-                output[i, j] = np.max(region)
-            else:  # average
-                output[i, j] = np.mean(region)
-    
-    return output
-
-def calculate_receptive_field(layers_config):
-    """Calculate receptive field size for each layer based on configuration"""
+def apply_convolution(image, kernel, padding=0, stride=1, dilation=1):
+    """Apply 2D convolution to image with configurable padding, stride and dilation
+
+    Runs on the vectorized engine in conv_engine.py. The exact reduction keeps
+    results bit-identical to the original per-pixel np.sum loop. image may also
+    be an (N, H, W) stack, which is convolved image by image in one call.
+    """
+    if np.ndim(image) == 3:
+        # Stack of single-channel images -> (N, 1, H, W) batch
+        image = np.asarray(image)[:, np.newaxis]
+    return conv2d(image, kernel, padding=padding, stride=stride, dilation=dilation, exact=True)
+
+def apply_pooling(image, pool_size=2, pool_type='max', stride=None, padding=0, ceil_mode=False):
+    """Apply pooling operation with configurable parameters
+
+    Runs on the vectorized engine in pool_engine.py, which also accepts stacks
+    of feature maps and the min/l2/global pool types.
+    """
+    return pool2d(image, pool_size=pool_size, pool_type=pool_type, stride=stride,
+                  padding=padding, ceil_mode=ceil_mode)
+
+def calculate_receptive_field(layers_config, input_size):
+    """Calculate receptive field size for each layer based on configuration
+
+    input_size is the longer side of the input, the receptive field of a
+    global pool, which sees all of it.
+    """
     rf_sizes = [1]  # Input layer
+    sees_all = False  # After a global pool every unit sees the whole input
     
     for i, layer in enumerate(layers_config):
-        if layer['type'] == 'conv':
-            kernel_size = layer['kernel_size']
-            stride = layer['stride']
-            padding = layer['padding']
+        if sees_all:
+            rf_sizes.append(input_size)
+            
+        elif layer['type'] == 'conv':
+            # Dilation spreads the kernel taps, widening its effective size
+            kernel_size = layer.get('dilation', 1) * (layer['kernel_size'] - 1) + 1
+            stride = layer.get('stride', 1)
             
             # RF calculation for convolution
             prev_rf = rf_sizes[-1]
             new_rf = prev_rf + (kernel_size - 1) * stride
             rf_sizes.append(new_rf)
             
+        elif layer['type'] == 'pool' and normalize_pool_type(layer.get('pool_type', 'max')).startswith('global_'):
+            sees_all = True
+            rf_sizes.append(input_size)
+            
         elif layer['type'] == 'pool':
-            pool_size = layer['pool_size']
-            stride = layer['stride']
+            pool_size = layer.get('pool_size', 2)
+            stride = layer.get('stride', 2)
             
             # RF calculation for pooling
             prev_rf = rf_sizes[-1]
@@ -106,7 +185,24 @@ def calculate_receptive_field(layers_config):
     
     return rf_sizes
 
-def create_layer_visualization(image, layer_output, layer_name, layer_config, filename):
+def _finish_figure(filename=None):
+    """Save the current figure to static/<filename>, or return it as PNG bytes when no filename is given"""
+    plt.tight_layout()
+    
+    if filename is None:
+        buf = io.BytesIO()
+        plt.savefig(buf, format='png', dpi=100, bbox_inches='tight', pad_inches=0.1)
+        plt.close()
+        return buf.getvalue()
+    
+    # Save to static folder
+    filepath = os.path.join('static', filename)
+    plt.savefig(filepath, dpi=100, bbox_inches='tight', pad_inches=0.1)
+    plt.close()
+    
+    return filepath
+
+def create_layer_visualization(image, layer_output, layer_name, layer_config, filename=None):
     """Create visualization for a specific layer"""
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
     
@@ -134,17 +230,13 @@ def create_layer_visualization(image, layer_output, layer_name, layer_config, fi
         for j in range(layer_output.shape[1] + 1):
             ax2.axvline(j - 0.5, color='blue', linewidth=0.5, alpha=0.5)
     
-    plt.tight_layout()
-    
-    # Save to static folder
-    filepath = os.path.join('static', filename)
-    plt.savefig(filepath, dpi=100, bbox_inches='tight', pad_inches=0.1)
-    plt.close()
-    
-    return filepath
+    return _finish_figure(filename)
+
+def create_receptive_field_visualization(image, rf_sizes, selected_layer, filename=None, scale=1.0):
+    """Create visualization showing receptive field growth through layers
 
-def create_receptive_field_visualization(image, rf_sizes, selected_layer, filename):
-    """Create visualization showing receptive field growth through layers"""
+    scale maps receptive-field sizes onto image when it is a downsampled preview.
+    """
     fig, axes = plt.subplots(1, len(rf_sizes), figsize=(4*len(rf_sizes), 4))
     if len(rf_sizes) == 1:
         axes = [axes]
@@ -157,11 +249,12 @@ def create_receptive_field_visualization(image, rf_sizes, selected_layer, filena
         center_y, center_x = image.shape[0] // 2, image.shape[1] // 2
         
         # Draw receptive field box
-        half_rf = rf_size // 2
+        drawn_rf = max(1, int(round(rf_size * scale)))
+        half_rf = drawn_rf // 2
         x_start = max(0, center_x - half_rf)
         y_start = max(0, center_y - half_rf)
-        width = min(rf_size, image.shape[1] - x_start)
-        height = min(rf_size, image.shape[0] - y_start)
+        width = min(drawn_rf, image.shape[1] - x_start)
+        height = min(drawn_rf, image.shape[0] - y_start)
         
         # Color code based on selection
         if i == selected_layer:
@@ -184,152 +277,738 @@ def create_receptive_field_visualization(image, rf_sizes, selected_layer, filena
         ax.plot(center_x, center_y, 'o', markersize=8, markeredgecolor=color, 
                 markerfacecolor='yellow', markeredgewidth=2)
         
-        # Add grid
-        for grid_i in range(image.shape[0] + 1):
-            ax.axhline(grid_i - 0.5, color='gray', linewidth=0.3, alpha=0.3)
-        for grid_j in range(image.shape[1] + 1):
-            ax.axvline(grid_j - 0.5, color='gray', linewidth=0.3, alpha=0.3)
+        # Add grid (skipped for large previews, where it would hide the image)
+        if image.shape[0] <= 32:
+            for grid_i in range(image.shape[0] + 1):
+                ax.axhline(grid_i - 0.5, color='gray', linewidth=0.3, alpha=0.3)
+            for grid_j in range(image.shape[1] + 1):
+                ax.axvline(grid_j - 0.5, color='gray', linewidth=0.3, alpha=0.3)
         
         ax.set_title(f'Layer {i}\nRF: {rf_size}×{rf_size}', fontsize=12, fontweight='bold')
         ax.axis('off')
     
-    plt.tight_layout()
-    
-    # Save to static folder
-    filepath = os.path.join('static', filename)
-    plt.savefig(filepath, dpi=100, bbox_inches='tight', pad_inches=0.1)
-    plt.close()
-    
-    return filepath
+    return _finish_figure(filename)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/process', methods=['POST'])
-def process_image():
-    try:
-        data = request.get_json()
-        
-        # Get layer configurations from frontend
-        layers_config = data.get('layers', [])
-        
-        # Get uploaded image or use sample
-        if 'image' in request.files and request.files['image'].filename:
-            file = request.files['image']
-            img = Image.open(file).convert('L')
-            image = np.array(img)
-            
-            # Resize to manageable size
-            if image.shape[0] > 16 or image.shape[1] > 16:
-                img_resized = img.resize((8, 8), Image.Resampling.LANCZOS)
-                image = np.array(img_resized)
-        else:
-            image = create_sample_image()
-        
-        # Process through each layer
-        current_image = image.copy()
-        layer_outputs = []
-        layer_names = []
-        layer_configs = []
+def build_kernel(layer_config):
+    """Create the convolution kernel for a conv layer config"""
+    kernel_type = layer_config.get('kernel_type', 'edge_detection')
+    if kernel_type == 'edge_detection':
+        return np.array([[-1, -1, -1],
+                         [-1,  8, -1],
+                         [-1, -1, -1]])
+    elif kernel_type == 'blur':
+        return np.array([[1, 1, 1],
+                         [1, 1, 1],
+                         [1, 1, 1]]) / 9
+    elif kernel_type == 'sharpen':
+        return np.array([[0, -1, 0],
+                         [-1, 5, -1],
+                         [0, -1, 0]])
+    # Custom kernel
+    return np.array(layer_config.get('custom_kernel', [[1, 1, 1], [1, 1, 1], [1, 1, 1]]))
+
+def get_request_data():
+    """Request options from a JSON body, or from the 'config' field of a multipart upload"""
+    data = request.get_json(silent=True)
+    if data is None:
+        data = json.loads(request.form.get('config', '{}'))
+    return data
+
+def open_image(stream, label='Image'):
+    """Open an uploaded image, refusing it from its header if it is over MAX_IMAGE_PIXELS
+
+    Image.open only reads the header, so nothing has been decoded yet when
+    the size is checked. label names the upload in the error message.
+    """
+    img = Image.open(stream)
+    if img.width * img.height > MAX_IMAGE_PIXELS:
+        raise ValueError(f"{label} is {img.width}×{img.height}, larger than the {MAX_IMAGE_PIXELS} pixel limit")
+    return img
+
+def load_input_image(resolution='grid'):
+    """Get uploaded image or use sample"""
+    if 'image' in request.files and request.files['image'].filename:
+        img = open_image(request.files['image'])
+        img = img.convert('L')
+        image = np.array(img)
         
-        for i, layer_config in enumerate(layers_config):
-            layer_type = layer_config['type']
-            
-            if layer_type == 'conv':
-                # Create kernel based on type
-                kernel_type = layer_config.get('kernel_type', 'edge_detection')
-                if kernel_type == 'edge_detection':
-                    kernel = np.array([[-1, -1, -1],
-                                     [-1,  8, -1],
-                                     [-1, -1, -1]])
-                elif kernel_type == 'blur':
-                    kernel = np.array([[1, 1, 1],
-                                     [1, 1, 1],
-                                     [1, 1, 1]]) / 9
-                elif kernel_type == 'sharpen':
-                    kernel = np.array([[0, -1, 0],
-                                     [-1, 5, -1],
-                                     [0, -1, 0]])
-                else:
-                    # Custom kernel
-                    kernel = np.array(layer_config.get('custom_kernel', [[1, 1, 1], [1, 1, 1], [1, 1, 1]]))
-                
-                # Apply convolution
-                output = apply_convolution(
-                    current_image, 
-                    kernel, 
-                    padding=layer_config.get('padding', 0),
-                    stride=layer_config.get('stride', 1)
-                )
-                
-                layer_name = f"Conv {i+1}"
-                config_str = f"Kernel: {kernel.shape}, Stride: {layer_config.get('stride', 1)}, Padding: {layer_config.get('padding', 0)}"
-                
-            elif layer_type == 'pool':
-                output = apply_pooling(
-                    current_image,
-                    pool_size=layer_config.get('pool_size', 2),
-                    pool_type=layer_config.get('pool_type', 'max'),
-                    stride=layer_config.get('stride', 2)
-                )
-                
-                layer_name = f"Pool {i+1}"
-                config_str = f"Size: {layer_config.get('pool_size', 2)}×{layer_config.get('pool_size', 2)}, Type: {layer_config.get('pool_type', 'max')}, Stride: {layer_config.get('stride', 2)}"
-            
-            # Store layer info
-            layer_outputs.append(output.copy())
+        # Resize to manageable size
+        if resolution == 'grid' and (image.shape[0] > 16 or image.shape[1] > 16):
+            img_resized = img.resize((GRID_SIZE, GRID_SIZE), Image.Resampling.LANCZOS)
+            image = np.array(img_resized)
+        return image
+    return create_sample_image(FULL_SAMPLE_SIZE if resolution == 'full' else GRID_SIZE)
+
+def make_preview(array, max_size):
+    """Box-downsample a map so its longer side is at most max_size; returns (preview, scale)"""
+    h, w = array.shape
+    if max(h, w) <= max_size:
+        return array, 1.0
+    scale = max_size / max(h, w)
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    preview = Image.fromarray(np.asarray(array, dtype=np.float32)).resize(size, Image.Resampling.BOX)
+    return np.asarray(preview, dtype=np.float64), scale
+
+def describe_layer(layer_config, i, kernel=None):
+    """(display name, config string) for layer i"""
+    if layer_config['type'] == 'conv':
+        return (f"Conv {i+1}",
+                f"Kernel: {kernel.shape}, Stride: {layer_config.get('stride', 1)}, Padding: {layer_config.get('padding', 0)}")
+    return (f"Pool {i+1}",
+            f"Size: {layer_config.get('pool_size', 2)}×{layer_config.get('pool_size', 2)}, Type: {layer_config.get('pool_type', 'max')}, Stride: {layer_config.get('stride', 2)}")
+
+def layer_params(layer_config):
+    """Engine keyword arguments for a conv or pool layer config, with the frontend's defaults"""
+    layer_type = layer_config['type']
+    if layer_type == 'conv':
+        return {
+            'kernel': build_kernel(layer_config),
+            'padding': layer_config.get('padding', 0),
+            'stride': layer_config.get('stride', 1),
+            'dilation': layer_config.get('dilation', 1),
+        }
+    if layer_type == 'pool':
+        return {
+            'pool_size': layer_config.get('pool_size', 2),
+            'pool_type': layer_config.get('pool_type', 'max'),
+            'stride': layer_config.get('stride', 2),
+            'padding': layer_config.get('padding', 0),
+            'ceil_mode': layer_config.get('ceil_mode', False),
+        }
+    raise ValueError(f"Unknown layer type '{layer_type}'")
+
+def apply_layer(current_image, layer_config, i):
+    """Run layer i on an image or (N, H, W) stack, returning (output, name, config string)"""
+    params = layer_params(layer_config)
+    
+    if layer_config['type'] == 'conv':
+        kernel = params.pop('kernel')
+        with metrics.stage('conv'):
+            output = apply_convolution(current_image, kernel, **params)
+        layer_name, config_str = describe_layer(layer_config, i, kernel)
+    else:
+        with metrics.stage('pool'):
+            output = apply_pooling(current_image, **params)
+        layer_name, config_str = describe_layer(layer_config, i)
+    
+    return output, layer_name, config_str
+
+def run_layers(image, layers_config, layer_keys=None):
+    """Process the image through each layer, returning (outputs, names, config strings)
+
+    With layer_keys from prefix_keys(), the longest already computed prefix of
+    the stack is taken from the prefix cache and only the rest is run.
+    """
+    layer_outputs = []
+    layer_names = []
+    layer_configs = []
+    
+    if layer_keys is not None:
+        for key in layer_keys[1:]:
+            cached = prefix_cache.get_layer(key)
+            if cached is None:
+                break
+            output, layer_name, config_str = cached
+            layer_outputs.append(output)
             layer_names.append(layer_name)
             layer_configs.append(config_str)
-            
-            # Update current image for next layer
-            current_image = output.copy()
-        
-        # Calculate receptive fields
-        rf_sizes = calculate_receptive_field(layers_config)
-        
-        # Create visualizations
-        visualizations = {}
+    
+    start = len(layer_outputs)
+    current_image = layer_outputs[-1] if layer_outputs else image.copy()
+    
+    for i, layer_config in enumerate(layers_config[start:], start):
+        output, layer_name, config_str = apply_layer(current_image, layer_config, i)
         
-        # Layer-by-layer visualizations
-        for i, (output, name, config) in enumerate(zip(layer_outputs, layer_names, layer_configs)):
-            input_img = image if i == 0 else layer_outputs[i-1]
-            filename = f'layer_{i+1}.png'
-            filepath = create_layer_visualization(input_img, output, name, config, filename)
-            visualizations[f'layer_{i+1}'] = filename
+        # Store layer info
+        layer_outputs.append(output)
+        layer_names.append(layer_name)
+        layer_configs.append(config_str)
+        if layer_keys is not None:
+            prefix_cache.put_layer(layer_keys[i+1], output, layer_name, config_str)
         
-        # Receptive field visualization
-        rf_filename = 'receptive_fields.png'
-        rf_filepath = create_receptive_field_visualization(image, rf_sizes, len(layers_config)-1, rf_filename)
-        visualizations['receptive_fields'] = rf_filename
+        # Update current image for next layer
+        current_image = output
+    
+    return layer_outputs, layer_names, layer_configs
+
+def run_layers_streamed(image, layers_config, preview_size):
+    """Full-resolution run_layers that never holds a whole layer output
+
+    The stack runs band by band (layer_stream.py), and each layer is kept
+    only as a preview no larger than preview_size. Returns (previews,
+    output shapes, names, config strings).
+    """
+    stages, layer_names, layer_configs = [], [], []
+    for i, layer_config in enumerate(layers_config):
+        params = layer_params(layer_config)
+        stages.append((layer_config['type'], params))
+        layer_name, config_str = describe_layer(layer_config, i, params.get('kernel'))
+        layer_names.append(layer_name)
+        layer_configs.append(config_str)
+    with metrics.stage('layers'):
+        previews, shapes = stream_stack(image, stages, preview_size)
+    return previews, shapes, layer_names, layer_configs
+
+def render_visualizations(image, layer_outputs, layer_names, layer_configs, rf_sizes, renderer='matplotlib',
+                          preview_size=None, grid_view=False, layer_keys=None, figure_tag=None):
+    """Render every figure for a run as {visualization name: png bytes}
+
+    With preview_size, maps larger than that are box-downsampled before drawing,
+    so figure cost stays flat however large the processed image is. grid_view
+    adds the classic 8x8 view of the input. With layer_keys and figure_tag,
+    figures already rendered for the same prefix come from the prefix cache.
+    """
+    if renderer == 'fast':
+        render_layer = fast_render.render_layer
+        render_receptive_fields = fast_render.render_receptive_fields
+    else:
+        render_layer = create_layer_visualization
+        render_receptive_fields = create_receptive_field_visualization
+    
+    def preview(array):
+        return make_preview(array, preview_size) if preview_size else (array, 1.0)
+    
+    # Each figure only needs the layer outputs, so collect them as independent tasks
+    tasks = {}
+    image_preview, scale = preview(image)
+    output_previews = [preview(output)[0] for output in layer_outputs]
+    
+    # Layer-by-layer visualizations
+    for i, (output, name, config) in enumerate(zip(output_previews, layer_names, layer_configs)):
+        input_img = image_preview if i == 0 else output_previews[i-1]
+        tasks[f'layer_{i+1}'] = (render_layer, (input_img, output, name, config))
+    
+    # Receptive field visualization
+    tasks['receptive_fields'] = (partial(render_receptive_fields, scale=scale),
+                                 (image_preview, rf_sizes, len(layer_outputs)-1))
+    
+    # Original image
+    tasks['original'] = (render_layer, (image_preview, image_preview, 'Original',
+                                        f'{image.shape[0]}×{image.shape[1]} Input'))
+    
+    if grid_view:
+        grid = np.array(Image.fromarray(image).resize((GRID_SIZE, GRID_SIZE), Image.Resampling.LANCZOS))
+        tasks['grid_view'] = (render_layer, (grid, grid, 'Grid View', f'{GRID_SIZE}×{GRID_SIZE} Input'))
+    
+    # Layer i's figure depends on prefix i only; the input views and the
+    # receptive-field strip depend on the bare image (plus the RF sizes)
+    figures = {}
+    figure_keys = {}
+    if layer_keys is not None:
+        for name in tasks:
+            tag = f'{figure_tag}:{name}'
+            if name.startswith('layer_'):
+                key = layer_keys[int(name[len('layer_'):])]
+            else:
+                key = layer_keys[0]
+                if name == 'receptive_fields':
+                    tag += f':{rf_sizes}'
+            figure_keys[name] = (key, tag)
+            png = prefix_cache.get_figure(*figure_keys[name])
+            if png is not None:
+                figures[name] = png
+        tasks = {name: task for name, task in tasks.items() if name not in figures}
+    
+    # Matplotlib figures fan out over the worker pool; the fast renderer is
+    # cheaper than shipping its inputs to another process
+    if renderer == 'fast' or not render_pool.active:
+        rendered = {}
+        for name, (func, args) in tasks.items():
+            with metrics.stage('render_layer' if name.startswith('layer_') else f'render_{name}'):
+                rendered[name] = func(*args)
+    else:
+        with metrics.stage('render_pool'):
+            rendered = render_pool.map(tasks)
+    
+    for name, png in rendered.items():
+        if name in figure_keys:
+            prefix_cache.put_figure(*figure_keys[name], png)
+    figures.update(rendered)
+    return figures
+
+def build_payload(image, layer_outputs, layer_names, layer_configs, rf_sizes, layer_shapes=None):
+    """JSON payload for a run, without the visualization URLs
+
+    layer_shapes gives the output shapes when layer_outputs are only previews.
+    """
+    if layer_shapes is None:
+        layer_shapes = [output.shape for output in layer_outputs]
+    return {
+        'success': True,
+        'receptive_fields': rf_sizes,
+        'layer_info': [
+            {
+                'name': name,
+                'config': config,
+                'input_shape': list(layer_shapes[i-1]) if i > 0 else list(image.shape),
+                'output_shape': list(shape)
+            }
+            for i, (name, config, shape) in enumerate(zip(layer_names, layer_configs, layer_shapes))
+        ],
+        'input_shape': list(image.shape),
+        'final_shape': list(layer_shapes[-1] if layer_shapes else image.shape)
+    }
+
+def cached_visualizations(key, names):
+    """Map visualization names to their content-addressed /cache URLs"""
+    return {name: f'/cache/{key}/{name}.png' for name in names}
+
+def inline_visualizations(figures):
+    """Map visualization names to base64 PNG data URLs"""
+    return {name: 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
+            for name, png in figures.items()}
+
+def stored_visualizations(figures):
+    """Keep figures in the per-request image store and map names to their URLs"""
+    request_id = image_store.put(figures)
+    return {name: f'/images/{request_id}/{name}.png' for name in figures}
+
+def static_visualizations(figures):
+    """Write figures to the shared static folder under fixed names (legacy mode)"""
+    visualizations = {}
+    for name, png in figures.items():
+        filename = f'{name}.png'
+        with open(os.path.join('static', filename), 'wb') as f:
+            f.write(png)
+        visualizations[name] = filename
+    return visualizations
+
+def deliver_visualizations(figures, output_mode, key=None):
+    """Map visualization names to whatever the frontend should load for output_mode"""
+    if output_mode == 'inline':
+        return inline_visualizations(figures)
+    if output_mode == 'static':
+        return static_visualizations(figures)
+    # Cached figures already have stable, request-independent URLs
+    if key is not None:
+        return cached_visualizations(key, figures)
+    return stored_visualizations(figures)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None and request.url_rule is not None:
+        endpoint = request.url_rule.rule
+        metrics.observe('request_seconds', time.perf_counter() - started, endpoint=endpoint)
+        metrics.inc('requests_total', endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.route('/process', methods=['POST'])
+def process_image():
+    """Run one image through the layer stack and return its figures
+
+    "debug": true adds per-stage timings in milliseconds to the response;
+    "profile": "cprofile" or "pyinstrument" adds a profiler report, when the
+    server runs with PROFILE_REQUESTS=1.
+    """
+    try:
+        data = get_request_data()
+        profiler = data.get('profile')
+        if profiler and not PROFILING_ENABLED:
+            raise ValueError("Profiling is disabled; start the app with PROFILE_REQUESTS=1")
         
-        # Original image
-        orig_filename = 'original.png'
-        create_layer_visualization(image, image, 'Original', '8×8 Input', orig_filename)
-        visualizations['original'] = orig_filename
+        with StageTimer() as timer:
+            if profiler:
+                payload, report = profile_call(partial(run_process, data),
+                                               'cprofile' if profiler is True else profiler)
+                payload['profile'] = report
+            else:
+                payload = run_process(data)
+        if data.get('debug', False):
+            payload['timings'] = timer.as_ms()
+        return jsonify(payload)
         
-        return jsonify({
-            'success': True,
-            'visualizations': visualizations,
-            'receptive_fields': rf_sizes,
-            'layer_info': [
-                {
-                    'name': name,
-                    'config': config,
-                    'input_shape': list(layer_outputs[i-1].shape) if i > 0 else list(image.shape),
-                    'output_shape': list(output.shape)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+def run_process(data):
+    """The /process pipeline for one parsed request, returning the response payload"""
+    # Get layer configurations from frontend
+    layers_config = data.get('layers', [])
+    use_cache = RENDER_CACHE_ENABLED and data.get('cache', True)
+    output_mode = data.get('output', OUTPUT_MODE)
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode '{output_mode}', expected one of {', '.join(OUTPUT_MODES)}")
+    renderer = data.get('renderer', DEFAULT_RENDERER)
+    if renderer not in RENDERERS:
+        raise ValueError(f"Unknown renderer '{renderer}', expected one of {', '.join(RENDERERS)}")
+    resolution = data.get('resolution', 'grid')
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution '{resolution}', expected one of {', '.join(RESOLUTIONS)}")
+    grid_view = resolution == 'full' and bool(data.get('grid_view', False))
+    render_options = dict(RENDER_OPTIONS, renderer=renderer, resolution=resolution, grid_view=grid_view,
+                          preview_size=PREVIEW_SIZE if resolution == 'full' else None)
+    
+    with metrics.stage('decode'):
+        image = load_input_image(resolution)
+    
+    if use_cache:
+        with metrics.stage('cache_lookup'):
+            key = cache_key(image, layers_config, render_options)
+            entry = render_cache.get(key)
+        if entry is not None:
+            with metrics.stage('deliver'):
+                visualizations = deliver_visualizations(entry.images, output_mode, key)
+            return dict(entry.payload, cache='hit', visualizations=visualizations)
+    
+    # Reuse whatever prefix of the stack an earlier request already computed; full
+    # resolution keeps no layer outputs, so only its figures come from the prefix cache
+    layer_keys = prefix_keys(image, layers_config) if use_cache else None
+    if resolution == 'full':
+        layer_outputs, layer_shapes, layer_names, layer_configs = run_layers_streamed(image, layers_config,
+                                                                                      PREVIEW_SIZE)
+    else:
+        layer_outputs, layer_names, layer_configs = run_layers(image, layers_config, layer_keys)
+        layer_shapes = None
+    
+    # Calculate receptive fields
+    with metrics.stage('receptive_field'):
+        rf_sizes = calculate_receptive_field(layers_config, max(image.shape))
+    
+    # Create visualizations
+    figures = render_visualizations(image, layer_outputs, layer_names, layer_configs, rf_sizes, renderer,
+                                    render_options['preview_size'], grid_view,
+                                    layer_keys, options_tag(render_options))
+    payload = build_payload(image, layer_outputs, layer_names, layer_configs, rf_sizes, layer_shapes)
+    
+    if use_cache:
+        with metrics.stage('cache_store'):
+            render_cache.put(key, payload, figures)
+        with metrics.stage('deliver'):
+            visualizations = deliver_visualizations(figures, output_mode, key)
+        return dict(payload, cache='miss', visualizations=visualizations)
+    
+    with metrics.stage('deliver'):
+        visualizations = deliver_visualizations(figures, output_mode)
+    return dict(payload, visualizations=visualizations)
+
+def shrink_to_grid(image):
+    """Shrink an image larger than 16 pixels to the 8x8 grid, as /process does for uploads"""
+    if image.shape[0] <= 16 and image.shape[1] <= 16:
+        return image
+    img = Image.fromarray(image if image.dtype == np.uint8 else image.astype(np.float32))
+    return np.array(img.resize((GRID_SIZE, GRID_SIZE), Image.Resampling.LANCZOS))
+
+def read_npy_header(archive, name):
+    """(shape, dtype) of one array in an open .npz, read from its .npy header without loading it"""
+    with archive.zip.open(f'{name}.npy') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        elif version == (2, 0):
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+        else:
+            raise ValueError(f"Unsupported .npy format version {version}")
+    return shape, dtype
+
+def load_batch_images(resolution='grid'):
+    """Images for /process/batch from multipart 'images' files and/or an .npz upload
+
+    The image count, each image's size and the batch's total pixels are all
+    checked from headers, before anything is decoded.
+    """
+    images = []
+    total_pixels = 0
+    
+    def reserve(count, height, width, label):
+        nonlocal total_pixels
+        if len(images) + count > MAX_BATCH_IMAGES:
+            raise ValueError(f"Batch has more than the limit of {MAX_BATCH_IMAGES} images")
+        if height * width > MAX_IMAGE_PIXELS:
+            raise ValueError(f"{label} is {height}×{width}, larger than the {MAX_IMAGE_PIXELS} pixel limit")
+        total_pixels += count * height * width
+        if total_pixels > MAX_BATCH_PIXELS:
+            raise ValueError(f"Batch has more than the limit of {MAX_BATCH_PIXELS} pixels in total")
+    
+    files = request.files.getlist('images')
+    if len(files) > MAX_BATCH_IMAGES:
+        raise ValueError(f"Batch has {len(files)} images, more than the limit of {MAX_BATCH_IMAGES}")
+    for file in files:
+        img = open_image(file, file.filename)
+        reserve(1, img.height, img.width, file.filename)
+        image = np.array(img.convert('L'))
+        # Shrink as we go, so grid batches never hold the full-size images
+        images.append(shrink_to_grid(image) if resolution == 'grid' else image)
+    
+    if 'npz' in request.files:
+        # An (N, H, W) array stored as 'images', or as the archive's only array
+        with np.load(request.files['npz'].stream, allow_pickle=False) as archive:
+            name = 'images' if 'images' in archive.files else archive.files[0]
+            shape, dtype = read_npy_header(archive, name)
+            if len(shape) not in (2, 3):
+                raise ValueError(f"Expected an (N, H, W) image array, got shape {shape}")
+            if dtype.hasobject:
+                raise ValueError("Image arrays cannot hold Python objects")
+            reserve(*((1,) + shape if len(shape) == 2 else shape), 'Each npz image')
+            arrays = archive[name]
+        if arrays.ndim == 2:
+            arrays = arrays[np.newaxis]
+        if resolution == 'grid':
+            arrays = [shrink_to_grid(image) for image in arrays]
+        images.extend(arrays)
+    
+    if not images:
+        images = [create_sample_image(FULL_SAMPLE_SIZE if resolution == 'full' else GRID_SIZE)]
+    return images
+
+def run_batch(images, stacks, outputs='final', renderer=None, preview_size=None, dtype=None):
+    """Yield one result dict per (stack, image), running each stack on same-shaped images as one array"""
+    # Group images by shape so each group runs through the engines as one (N, H, W) stack
+    groups = {}
+    for index, image in enumerate(images):
+        groups.setdefault(image.shape, []).append(index)
+    
+    for stack_index, layers_config in enumerate(stacks):
+        for shape, indices in groups.items():
+            rf_sizes = calculate_receptive_field(layers_config, max(shape))
+            batch = np.stack([images[i] for i in indices])
+            layer_outputs, layer_names, layer_configs = [], [], []
+            current = batch
+            for i, layer_config in enumerate(layers_config):
+                current, name, config = apply_layer(current, layer_config, i)
+                if dtype is not None:
+                    current = current.astype(dtype, copy=False)
+                layer_outputs.append(current)
+                layer_names.append(name)
+                layer_configs.append(config)
+            
+            for position, image_index in enumerate(indices):
+                image_outputs = [output[position] for output in layer_outputs]
+                result = {
+                    'image': image_index,
+                    'stack': stack_index,
+                    'receptive_fields': rf_sizes,
+                    'input_shape': list(batch.shape[1:]),
+                    'layer_shapes': [list(output.shape) for output in image_outputs],
+                    'final_shape': list(image_outputs[-1].shape if image_outputs else batch.shape[1:]),
                 }
-                for i, (name, config, output) in enumerate(zip(layer_names, layer_configs, layer_outputs))
-            ],
-            'final_shape': list(current_image.shape)
-        })
+                if outputs == 'final':
+                    result['output'] = (image_outputs[-1] if image_outputs else batch[position]).tolist()
+                elif outputs == 'all':
+                    result['outputs'] = [output.tolist() for output in image_outputs]
+                figures = None
+                if renderer is not None:
+                    figures = render_visualizations(batch[position], image_outputs, layer_names, layer_configs,
+                                                    rf_sizes, renderer, preview_size)
+                yield result, figures
+
+class ZipStream:
+    """Write-only file object for zipfile that hands back what was written since the last drain()
+
+    zipfile sees it as unseekable and writes sizes after each entry's data,
+    so an archive can be sent in pieces while it is being built.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+@app.route('/process/batch', methods=['POST'])
+def process_batch():
+    """Run many images through one or more layer stacks, streaming the results back
+
+    Images come as multipart 'images' files and/or an 'npz' upload; options are
+    the JSON body or the multipart 'config' field. Results are JSON lines, or a
+    zip when "format": "zip". Figures are only rendered when "render" is true.
+    The last line (or summary.json in the zip) reports images per second.
+    """
+    try:
+        data = get_request_data()
+        stacks = data.get('stacks') or [data.get('layers', [])]
+        out_format = data.get('format', 'jsonl')
+        if out_format not in BATCH_FORMATS:
+            raise ValueError(f"Unknown format '{out_format}', expected one of {', '.join(BATCH_FORMATS)}")
+        outputs = data.get('outputs', 'final')
+        if outputs not in BATCH_OUTPUTS:
+            raise ValueError(f"Unknown outputs '{outputs}', expected one of {', '.join(BATCH_OUTPUTS)}")
+        renderer = data.get('renderer', DEFAULT_RENDERER) if data.get('render', False) else None
+        if renderer is not None and renderer not in RENDERERS:
+            raise ValueError(f"Unknown renderer '{renderer}', expected one of {', '.join(RENDERERS)}")
+        resolution = data.get('resolution', 'grid')
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}', expected one of {', '.join(RESOLUTIONS)}")
+        images = load_batch_images(resolution)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Full-resolution figures are drawn from previews and layers kept in float32, as in /process
+    preview_size = PREVIEW_SIZE if resolution == 'full' else None
+    dtype = FULL_RESOLUTION_DTYPE if resolution == 'full' else None
+    
+    def results():
+        return run_batch(images, stacks, outputs, renderer, preview_size, dtype)
+    
+    def summary(started, count):
+        seconds = time.perf_counter() - started
+        # Every image goes through every stack, so results = images × stacks
+        return {'images': len(images), 'stacks': len(stacks), 'results': count, 'seconds': seconds,
+                'images_per_second': len(images) / seconds if seconds > 0 else None,
+                'results_per_second': count / seconds if seconds > 0 else None}
+    
+    if out_format == 'zip':
+        def generate_zip():
+            started = time.perf_counter()
+            count = 0
+            stream = ZipStream()
+            with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+                try:
+                    for result, figures in results():
+                        folder = f"stack_{result['stack']}/image_{result['image']}"
+                        archive.writestr(f'{folder}/result.json', json.dumps(result))
+                        for name, png in (figures or {}).items():
+                            archive.writestr(f'{folder}/{name}.png', png)
+                        count += 1
+                        yield stream.drain()
+                except Exception as e:
+                    archive.writestr('error.json', json.dumps({'success': False, 'error': str(e)}))
+                archive.writestr('summary.json', json.dumps(summary(started, count)))
+            yield stream.drain()
         
+        return Response(generate_zip(), mimetype='application/zip',
+                        headers={'Content-Disposition': 'attachment; filename=batch.zip'})
+    
+    def generate():
+        started = time.perf_counter()
+        count = 0
+        try:
+            for result, figures in results():
+                if figures is not None:
+                    result['visualizations'] = inline_visualizations(figures)
+                count += 1
+                yield json.dumps(result) + '\n'
+        except Exception as e:
+            yield json.dumps({'success': False, 'error': str(e)}) + '\n'
+        yield json.dumps({'summary': summary(started, count)}) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+def get_digit_batcher():
+    """The batcher for DIGIT_MODEL, started on first use so its thread begins after the render workers fork"""
+    global digit_batcher
+    with _digit_batcher_lock:
+        if digit_batcher is None:
+            if not DIGIT_MODEL:
+                raise LookupError("No digit model loaded; start the app with DIGIT_MODEL=path/to/net.pt")
+            digit_batcher = DynamicBatcher(load_model(DIGIT_MODEL, DIGIT_THREADS), DIGIT_BATCH_MAX,
+                                           DIGIT_BATCH_WAIT_MS / 1000)
+        return digit_batcher
+
+def load_digit():
+    """The digit to classify: a multipart 'image' upload, a base64 "image" or a 2-D "pixels" list"""
+    if 'image' in request.files and request.files['image'].filename:
+        return prepare_digit(open_image(request.files['image']))
+    data = get_request_data()
+    if 'pixels' in data:
+        return prepare_digit(data['pixels'])
+    if 'image' in data:
+        encoded = data['image'].split(',', 1)[-1]
+        return prepare_digit(open_image(io.BytesIO(base64.b64decode(encoded))))
+    raise ValueError("Send an 'image' file, a base64 \"image\" or a \"pixels\" array")
+
+@app.route('/predict', methods=['POST'])
+def predict_digit():
+    """Classify one handwritten digit with the exported MNIST Net
+
+    Concurrent requests are run together in micro-batches; the response has
+    the predicted digit and all ten probabilities.
+    """
+    try:
+        batcher = get_digit_batcher()
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    try:
+        with metrics.stage('decode'):
+            digit = load_digit()
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return jsonify({'success': False, 'error': str(e)}), 400
+    future = batcher.submit(digit)
+    try:
+        with metrics.stage('predict'):
+            probabilities = future.result(timeout=DIGIT_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()
+        return jsonify({'success': False, 'error': f"No prediction within {DIGIT_TIMEOUT:g} seconds"}), 504
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify({
+        'success': True,
+        'digit': int(np.argmax(probabilities)),
+        'probabilities': [float(p) for p in probabilities],
+    })
+
+@app.route('/predict/stats')
+def predict_stats():
+    if digit_batcher is None:
+        return jsonify({'loaded': False, 'model': DIGIT_MODEL})
+    return jsonify({'loaded': True, 'model': DIGIT_MODEL, **digit_batcher.stats()})
+
+@app.route('/cache/<key>/<name>.png')
+def cached_file(key, name):
+    png = render_cache.get_image(key, name)
+    if png is None:
+        abort(404)
+    # Content-addressed, so the browser may keep it for good
+    return send_file(io.BytesIO(png), mimetype='image/png', max_age=31536000)
+
+@app.route('/images/<request_id>/<name>.png')
+def stored_file(request_id, name):
+    png = image_store.get(request_id, name)
+    if png is None:
+        abort(404)
+    return send_file(io.BytesIO(png), mimetype='image/png', max_age=image_store.ttl)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape target: stage/request histograms plus cache and store gauges"""
+    cache = render_cache.stats()
+    prefix = prefix_cache.stats()
+    store = image_store.stats()
+    gauges = {
+        'render_cache_hits': (cache['hits'], {}),
+        'render_cache_misses': (cache['misses'], {}),
+        'render_cache_memory_bytes': (cache['memory_bytes'], {}),
+        'prefix_cache_hits': (prefix['hits'], {}),
+        'prefix_cache_misses': (prefix['misses'], {}),
+        'prefix_cache_bytes': (prefix['bytes'], {}),
+        'image_store_bytes': (store['bytes'], {}),
+        'render_workers': (render_pool.workers if render_pool.active else 0, {}),
+    }
+    if digit_batcher is not None:
+        batches = digit_batcher.stats()
+        gauges['predict_batches'] = (batches['batches'], {})
+        gauges['predict_items'] = (batches['items'], {})
+        gauges['predict_mean_batch_size'] = (batches['mean_batch_size'], {})
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(render_cache.stats())
 
 @app.route('/static/<filename>')
 def static_file(filename):
     return send_file(f'static/{filename}')
 
+# Fork and warm the render workers before the server starts any threads
+render_pool.start()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
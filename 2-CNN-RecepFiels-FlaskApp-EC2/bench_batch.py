@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark: one /process/batch call vs looping over /process, one image at a time
+
+Usage: python bench_batch.py [--images N] [--repeat N]
+"""
+
+import argparse
+import io
+import json
+import sys
+
+import numpy as np
+
+sys.path.append('.')
+
+import app
+from bench_conv import best_of
+
+LAYERS = [
+    {'type': 'conv', 'kernel_size': 3, 'stride': 1, 'padding': 1, 'kernel_type': 'edge_detection'},
+    {'type': 'pool', 'pool_size': 2, 'stride': 2},
+    {'type': 'conv', 'kernel_size': 3, 'stride': 1, 'padding': 1, 'kernel_type': 'blur'},
+]
+
+
+def png_bytes(image):
+    buf = io.BytesIO()
+    app.Image.fromarray(image).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--resolution', choices=app.RESOLUTIONS, default='full')
+    args = parser.parse_args()
+
+    # Time the layer work, not cache lookups
+    app.RENDER_CACHE_ENABLED = False
+    client = app.app.test_client()
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, (args.images, 28, 28), dtype=np.uint8)
+    pngs = [png_bytes(image) for image in images]
+
+    def loop(renderer):
+        for png in pngs:
+            config = {'layers': LAYERS, 'resolution': args.resolution, 'renderer': renderer,
+                      'output': 'inline', 'cache': False}
+            response = client.post('/process', content_type='multipart/form-data',
+                                   data={'image': (io.BytesIO(png), 'image.png'), 'config': json.dumps(config)})
+            assert response.status_code == 200
+
+    def batch(render):
+        npz = io.BytesIO()
+        np.savez(npz, images=images)
+        npz.seek(0)
+        config = {'layers': LAYERS, 'resolution': args.resolution, 'render': render, 'renderer': 'fast'}
+        response = client.post('/process/batch', content_type='multipart/form-data',
+                               data={'npz': (npz, 'images.npz'), 'config': json.dumps(config)})
+        response.get_data()
+        assert response.status_code == 200
+
+    print(f"{args.images} images, {args.resolution} resolution, {len(LAYERS)} layers")
+    print(f"{'case':>32} {'ms':>10} {'images/s':>10}")
+    cases = [
+        ('/process loop (fast renderer)', lambda: loop('fast')),
+        ('/process/batch (render)', lambda: batch(True)),
+        ('/process/batch (no figures)', lambda: batch(False)),
+    ]
+    for label, fn in cases:
+        ms = best_of(fn, args.repeat)
+        print(f"{label:>32} {ms:>10.1f} {args.images / ms * 1000:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
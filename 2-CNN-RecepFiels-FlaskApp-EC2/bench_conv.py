@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: legacy per-pixel convolution loop vs the vectorized engine
+
+Usage: python bench_conv.py [--repeat N]
+"""
+
+import argparse
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.append('.')
+
+from conv_engine import conv2d
+from test_app import legacy_convolution
+
+SIZES = [8, 28, 64, 128, 224]
+KERNEL = np.array([[-1, -1, -1],
+                   [-1,  8, -1],
+                   [-1, -1, -1]])
+
+
+def best_of(fn, repeat):
+    """Best wall time of a single call, in milliseconds"""
+    number = 1
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>6} {'legacy ms':>11} {'exact ms':>10} {'matmul ms':>10} {'speedup':>8}")
+    for size in SIZES:
+        image = rng.integers(0, 256, (size, size), dtype=np.uint8)
+        legacy = best_of(lambda: legacy_convolution(image, KERNEL, 1, 1), args.repeat)
+        exact = best_of(lambda: conv2d(image, KERNEL, 1, 1, exact=True), args.repeat)
+        matmul = best_of(lambda: conv2d(image, KERNEL, 1, 1), args.repeat)
+        print(f"{size:>6} {legacy:>11.3f} {exact:>10.3f} {matmul:>10.3f} {legacy / exact:>7.1f}x")
+
+    # Batched multi-filter case, which the legacy loop cannot express in one call
+    batch = rng.random((32, 3, 64, 64))
+    weight = rng.random((16, 3, 3, 3))
+    batched = best_of(lambda: conv2d(batch, weight, padding=1), args.repeat)
+    print(f"\nbatch 32x3x64x64, 16 filters: {batched:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
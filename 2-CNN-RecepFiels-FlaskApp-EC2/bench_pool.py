@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: legacy per-cell pooling loop vs the vectorized engine
+
+Usage: python bench_pool.py [--repeat N]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+sys.path.append('.')
+
+from bench_conv import SIZES, best_of
+from pool_engine import pool2d
+from test_app import legacy_pooling
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>6} {'type':>8} {'legacy ms':>11} {'engine ms':>10} {'speedup':>8}")
+    for size in SIZES:
+        image = rng.random((size, size)) * 255
+        for pool_type in ('max', 'average'):
+            legacy = best_of(lambda: legacy_pooling(image, 2, pool_type, 2), args.repeat)
+            engine = best_of(lambda: pool2d(image, 2, pool_type, 2), args.repeat)
+            print(f"{size:>6} {pool_type:>8} {legacy:>11.3f} {engine:>10.3f} {legacy / engine:>7.1f}x")
+
+    # A stack of feature maps pooled in one call
+    stack = rng.random((32, 16, 224, 224))
+    stacked = best_of(lambda: pool2d(stack, 2, 'max', 2), args.repeat)
+    print(f"\nstack 32x16x224x224 max pool: {stacked:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
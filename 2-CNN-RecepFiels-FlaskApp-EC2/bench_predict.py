@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Load generator for /predict: latency and throughput versus the micro-batch window
+
+Serves the app on a local threaded server, then for each batch window keeps
+--clients concurrent clients sending digits for --duration seconds over
+keep-alive connections, and reports requests/second, p50/p99 latency and the
+mean batch the model actually ran. Without --model an untrained Net from
+../Assignment-4-MNIST is traced on the fly: latency does not depend on the
+weights.
+
+Usage: python bench_predict.py [--model net.pt] [--clients N] [--windows 0 2 5 10] [--duration S]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.append('.')
+
+import app
+from digit_predictor import DynamicBatcher, load_model
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def untrained_model(path):
+    """Trace a freshly initialized Net to path, for timing only."""
+    import torch
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Assignment-4-MNIST'))
+    from mnist_training import Net, fuse_for_inference
+
+    with torch.no_grad():
+        torch.jit.trace(fuse_for_inference(Net()), torch.zeros(8, 1, 28, 28)).save(path)
+    return path
+
+
+def start_local_server():
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args):
+            pass
+
+    server = make_server('127.0.0.1', 0, app.app, threaded=True, request_handler=KeepAliveHandler)
+    server.socket.listen(1024)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def client(port, body, deadline, latencies, errors, start_barrier):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    start_barrier.wait()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            connection.request('POST', '/predict', body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(response.status)
+        except Exception as e:
+            errors.append(type(e).__name__)
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.close()
+
+
+def run_window(port, predict, window_ms, max_batch, args, body):
+    if app.digit_batcher is not None:
+        app.digit_batcher.close()
+    app.digit_batcher = DynamicBatcher(predict, max_batch, window_ms / 1000)
+
+    latencies, errors = [], []
+    start_barrier = threading.Barrier(args.clients + 1)
+    deadline = time.perf_counter() + args.duration + 0.1
+    threads = [threading.Thread(target=client, args=(port, body, deadline, latencies, errors, start_barrier))
+               for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = app.digit_batcher.stats()
+    return {
+        'window_ms': window_ms,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_batch': stats['mean_batch_size'],
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--model', help='exported Net (.pt TorchScript or .onnx)')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent clients')
+    parser.add_argument('--windows', type=float, nargs='+', default=[0, 1, 2, 5, 10], help='batch windows, ms')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per window')
+    parser.add_argument('--threads', type=int, default=None, help='torch threads for the model')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        model_path = args.model or untrained_model(os.path.join(model_dir, 'net.pt'))
+        predict = load_model(model_path, args.threads)
+        app.DIGIT_MODEL = model_path
+        server = start_local_server()
+        body = json.dumps({'pixels': np.random.default_rng(0).integers(0, 256, (28, 28)).tolist()})
+
+        print(f"{args.clients} clients, max batch {args.max_batch}, {args.duration:g}s per window, "
+              f"{os.cpu_count()} CPUs\n")
+        print(f"{'window ms':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>10} {'errors':>6}")
+        # First row: no batching at all, one forward pass per request
+        runs = [('unbatched', 0, 1)] + [(f'{window_ms:g}', window_ms, args.max_batch) for window_ms in args.windows]
+        for label, window_ms, max_batch in runs:
+            result = run_window(server.server_port, predict, window_ms, max_batch, args, body)
+            print(f"{label:>9} {result['requests_per_second']:>8.0f} {result['p50_ms']:>8.1f} "
+                  f"{result['p99_ms']:>8.1f} {result['mean_batch']:>10.1f} {result['errors']:>6}", flush=True)
+
+        app.digit_batcher.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-figure render latency of the matplotlib and fast renderers
+
+Usage: python bench_render.py [--repeat N]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+sys.path.append('.')
+
+import fast_render
+from app import (create_layer_visualization, create_receptive_field_visualization,
+                 calculate_receptive_field, render_visualizations, run_layers)
+from bench_conv import best_of
+from render_pool import RenderPool
+import app
+
+SIZES = [8, 28, 64]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4, help='render pool size for the deep-stack case')
+    parser.add_argument('--depth', type=int, default=6, help='conv layers in the deep-stack case')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    rf_sizes = [1, 3, 5, 7]
+    print(f"{'figure':>16} {'size':>5} {'matplotlib ms':>14} {'fast ms':>8} {'speedup':>8}")
+    for size in SIZES:
+        image = rng.integers(0, 256, (size, size), dtype=np.uint8)
+        output = rng.random((size - 2, size - 2))
+        cases = [
+            ('layer', lambda: create_layer_visualization(image, output, 'Conv 1', 'Kernel: (3, 3)'),
+                      lambda: fast_render.render_layer(image, output, 'Conv 1', 'Kernel: (3, 3)')),
+            ('receptive_field', lambda: create_receptive_field_visualization(image, rf_sizes, 3),
+                                lambda: fast_render.render_receptive_fields(image, rf_sizes, 3)),
+        ]
+        for name, slow, fast in cases:
+            slow_ms = best_of(slow, args.repeat)
+            fast_ms = best_of(fast, args.repeat)
+            print(f"{name:>16} {size:>5} {slow_ms:>14.2f} {fast_ms:>8.2f} {slow_ms / fast_ms:>7.1f}x")
+
+    # Whole /process render stage for a deep stack, serial vs the worker pool
+    image = rng.integers(0, 256, (28, 28), dtype=np.uint8)
+    layers = [{'type': 'conv', 'kernel_size': 3, 'stride': 1, 'padding': 1}] * args.depth
+    outputs, names, configs = run_layers(image, layers)
+    rf = calculate_receptive_field(layers)
+    render = lambda: render_visualizations(image, outputs, names, configs, rf)
+
+    serial = best_of(render, args.repeat)
+    app.render_pool = RenderPool(args.workers)
+    app.render_pool.start()
+    try:
+        pooled = best_of(render, args.repeat)
+    finally:
+        app.render_pool.shutdown()
+    print(f"\n{len(outputs) + 2} matplotlib figures: serial {serial:.1f} ms, "
+          f"{args.workers} workers {pooled:.1f} ms ({serial / pooled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Upper bound on the temporaries built for one band of output rows
+TILE_BYTES = 32 * 1024 * 1024
+
+
+def _as_nchw(x):
+    """Promote a (H, W), (C, H, W) or (N, C, H, W) array to 4D and return the original rank"""
+    x = np.asarray(x)
+    if x.ndim == 2:
+        return x[np.newaxis, np.newaxis], 2
+    if x.ndim == 3:
+        return x[np.newaxis], 3
+    if x.ndim == 4:
+        return x, 4
+    raise ValueError(f"Expected a 2D, 3D or 4D input, got shape {x.shape}")
+
+
+def _as_fckk(weight, channels):
+    """Promote a (kh, kw), (C, kh, kw) or (F, C, kh, kw) kernel to 4D"""
+    weight = np.asarray(weight)
+    if weight.ndim == 2:
+        weight = np.broadcast_to(weight, (channels,) + weight.shape)
+    if weight.ndim == 3:
+        weight = weight[np.newaxis]
+    if weight.ndim != 4:
+        raise ValueError(f"Expected a 2D, 3D or 4D kernel, got shape {weight.shape}")
+    if weight.shape[1] != channels:
+        raise ValueError(f"Kernel expects {weight.shape[1]} input channels, input has {channels}")
+    return weight
+
+
+def output_size(size, kernel_size, padding=0, stride=1, dilation=1):
+    """Spatial output size of a sliding window along one axis"""
+    effective = dilation * (kernel_size - 1) + 1
+    return (size + 2 * padding - effective) // stride + 1
+
+
+def sliding_windows(x, window, stride=1, dilation=1):
+    """Strided (..., out_h, out_w, kh, kw) view of every window over the last two axes of x.
+
+    No data is copied; the view shares memory with x.
+    """
+    kh, kw = window
+    eh = dilation * (kh - 1) + 1
+    ew = dilation * (kw - 1) + 1
+    if x.shape[-2] < eh or x.shape[-1] < ew:
+        raise ValueError(f"Window {eh}x{ew} does not fit in input of size {x.shape[-2]}x{x.shape[-1]}")
+    windows = sliding_window_view(x, (eh, ew), axis=(-2, -1))
+    return windows[..., ::stride, ::stride, ::dilation, ::dilation]
+
+
+def _patch_rows(windows):
+    """(N, C, oh, ow, kh, kw) window view -> contiguous (N, oh, ow, C*kh*kw) patch rows"""
+    n, c, out_h, out_w, kh, kw = windows.shape
+    return windows.transpose(0, 2, 3, 1, 4, 5).reshape(n, out_h, out_w, c * kh * kw)
+
+
+def band_rows(row_bytes, max_tile_bytes=TILE_BYTES):
+    """Output rows per band so a band's temporaries stay within max_tile_bytes"""
+    return max(1, max_tile_bytes // max(row_bytes, 1))
+
+
+def im2col(x, kernel_size, padding=0, stride=1, dilation=1):
+    """Unfold an (N, C, H, W) array into (N, out_h, out_w, C*kh*kw) patch rows.
+
+    Patch rows are laid out in (C, kh, kw) order so they line up with a
+    flattened (F, C, kh, kw) kernel.
+    """
+    if padding:
+        x = np.pad(x, ((0, 0), (0, 0), (padding, padding), (padding, padding)), mode='constant')
+    return _patch_rows(sliding_windows(x, kernel_size, stride, dilation))
+
+
+def conv2d(x, weight, padding=0, stride=1, dilation=1, exact=False, max_tile_bytes=TILE_BYTES):
+    """Vectorized 2D convolution (cross-correlation, as in the rest of the app).
+
+    x:      (H, W), (C, H, W) or (N, C, H, W)
+    weight: (kh, kw), (C, kh, kw) or (F, C, kh, kw); a 2D kernel is shared by every channel
+
+    Returns (N, F, out_h, out_w) for 4D input, and drops the batch axis (and the
+    filter axis for a single 2D/3D kernel) to match lower-rank inputs.
+
+    The default path is im2col followed by a single matmul. With exact=True each
+    output is reduced over its patch with np.add.reduce instead, which sums in the
+    same order as the per-pixel np.sum loop and reproduces it bit for bit, at the
+    cost of materialising an (N, F, out_h, out_w, C*kh*kw) product.
+
+    Large inputs are processed in bands of output rows so the unfolded patches
+    never take more than about max_tile_bytes, whatever the image size.
+    """
+    x4, rank = _as_nchw(x)
+    single_filter = np.ndim(weight) < 4
+    w4 = _as_fckk(weight, x4.shape[1])
+    f, c, kh, kw = w4.shape
+    k = c * kh * kw
+    w_flat = w4.reshape(f, k)
+
+    if padding:
+        x4 = np.pad(x4, ((0, 0), (0, 0), (padding, padding), (padding, padding)), mode='constant')
+    windows = sliding_windows(x4, (kh, kw), stride, dilation)
+    n, _, out_h, out_w = windows.shape[:4]
+    out = np.empty((n, f, out_h, out_w))
+
+    row_bytes = n * out_w * k * 8 * (f if exact else 1)
+    band = band_rows(row_bytes, max_tile_bytes)
+    for r0 in range(0, out_h, band):
+        cols = _patch_rows(windows[:, :, r0:r0 + band])
+        if exact:
+            # (N, rows, ow, 1, K) * (F, K) -> (N, rows, ow, F, K), reduced along the patch axis
+            res = np.add.reduce(cols[:, :, :, np.newaxis, :] * w_flat, axis=-1)
+        else:
+            # Integer matmul bypasses BLAS, so always multiply in float64
+            res = cols.astype(np.float64, copy=False) @ w_flat.T.astype(np.float64, copy=False)
+        out[:, :, r0:r0 + band] = res.transpose(0, 3, 1, 2)
+
+    if single_filter:
+        out = out[:, 0]
+    return out[0] if rank < 4 else out
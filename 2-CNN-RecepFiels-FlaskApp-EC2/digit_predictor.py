@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image
+
+MNIST_MEAN = 0.1307
+MNIST_STD = 0.3081
+DIGIT_SIZE = 28
+
+
+def prepare_digit(image):
+    """A 1 x 28 x 28 float32 array normalized like the training data, from a grayscale image.
+
+    image is a PIL image or a 2-D array of 0-255 values, white digit on black
+    like MNIST; anything not 28 x 28 is resized.
+    """
+    if isinstance(image, Image.Image):
+        image = image.convert('L')
+    else:
+        array = np.asarray(image, dtype=np.float32)
+        if array.ndim != 2:
+            raise ValueError(f"Expected a 2-D grayscale image, got shape {array.shape}")
+        image = Image.fromarray(np.clip(array, 0, 255).astype(np.uint8))
+    if image.size != (DIGIT_SIZE, DIGIT_SIZE):
+        image = image.resize((DIGIT_SIZE, DIGIT_SIZE), Image.Resampling.BILINEAR)
+    pixels = np.asarray(image, dtype=np.float32) / 255.0
+    return ((pixels - MNIST_MEAN) / MNIST_STD)[None]
+
+
+def load_model(path, threads=None):
+    """predict(batch) -> probabilities for an exported Net: TorchScript (.pt) or ONNX (.onnx).
+
+    batch is N x 1 x 28 x 28 float32 and the result N x 10. torch (or
+    onnxruntime) is only imported here, so the visualizer runs without them.
+    """
+    if path.endswith('.onnx'):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        input_name = session.get_inputs()[0].name
+
+        def predict(batch):
+            return np.exp(session.run(None, {input_name: batch})[0])
+        return predict
+
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    model = torch.jit.load(path, map_location='cpu').eval()
+
+    def predict(batch):
+        with torch.inference_mode():
+            # Net ends in log_softmax
+            return model(torch.from_numpy(batch)).exp().numpy()
+    return predict
+
+
+class DynamicBatcher:
+    """Runs concurrent single-digit predictions as micro-batches on one worker thread.
+
+    The first request waiting opens a batch; requests arriving within
+    max_wait seconds of it join, up to max_batch, and the whole batch goes
+    through the model in one forward pass. A lone request therefore waits
+    at most max_wait longer, while a burst costs one pass instead of many.
+    """
+
+    def __init__(self, predict, max_batch=64, max_wait=0.005):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.busy_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name='digit-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, digit):
+        """Future for the probabilities of one prepared 1 x 28 x 28 digit."""
+        future = Future()
+        self._queue.put((digit, future))
+        return future
+
+    def __call__(self, digit, timeout=None):
+        return self.submit(digit).result(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+                'largest_batch': self.largest_batch,
+                'busy_seconds': self.busy_seconds,
+                'max_batch': self.max_batch,
+                'max_wait_ms': self.max_wait * 1000,
+            }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Closing: finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            # Skip requests whose caller gave up
+            batch = [(digit, future) for digit, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                probabilities = self.predict(np.stack([digit for digit, _ in batch]).astype(np.float32))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                with self._lock:
+                    self.batches += 1
+                    self.items += len(batch)
+                    self.largest_batch = max(self.largest_batch, len(batch))
+                    self.busy_seconds += time.perf_counter() - start
+            for (_, future), row in zip(batch, probabilities):
+                future.set_result(row)
@@ -0,0 +1,150 @@
+"""
+Lightweight NumPy/PIL renderer for the layer and receptive-field figures.
+
+Draws the same content as the matplotlib figures in app.py (grayscale maps,
+cell grids, receptive-field boxes, captions) straight into an RGB array, which
+is an order of magnitude cheaper than building, laying out and saving a
+matplotlib figure. Matplotlib stays the default "pretty" renderer.
+"""
+
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+PANEL_SIZE = 256     # Target edge length of each map, in pixels
+MARGIN = 12
+TITLE_LINE_HEIGHT = 16
+BACKGROUND = (255, 255, 255)
+
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+GRAY = (128, 128, 128)
+YELLOW = (255, 255, 0)
+TEXT = (0, 0, 0)
+
+_font = None
+
+
+def _get_font():
+    global _font
+    if _font is None:
+        _font = ImageFont.load_default()
+    return _font
+
+
+def to_gray(array):
+    """Min-max scale a 2D map to uint8, as imshow(cmap='gray') does"""
+    array = np.asarray(array, dtype=np.float64)
+    low, high = array.min(), array.max()
+    if high <= low:
+        return np.zeros(array.shape, dtype=np.uint8)
+    return np.round((array - low) * (255.0 / (high - low))).astype(np.uint8)
+
+
+def upscale(array, cell):
+    """Nearest-neighbour upscale of a 2D map by an integer cell size, as RGB"""
+    gray = np.repeat(np.repeat(to_gray(array), cell, axis=0), cell, axis=1)
+    return np.repeat(gray[:, :, np.newaxis], 3, axis=2)
+
+
+def cell_size(shape):
+    return max(1, PANEL_SIZE // max(shape))
+
+
+def draw_grid(rgb, shape, cell, color, alpha):
+    """Alpha-blend one-pixel grid lines on every cell boundary, in place"""
+    color = np.array(color, dtype=np.float64)
+    rows = np.minimum(np.arange(shape[0] + 1) * cell, rgb.shape[0] - 1)
+    cols = np.minimum(np.arange(shape[1] + 1) * cell, rgb.shape[1] - 1)
+    for index, axis in ((rows, 0), (cols, 1)):
+        lines = rgb[index, :] if axis == 0 else rgb[:, index]
+        blended = (lines * (1 - alpha) + color * alpha).astype(np.uint8)
+        if axis == 0:
+            rgb[index, :] = blended
+        else:
+            rgb[:, index] = blended
+
+
+def _panel(array, grid_color, grid_alpha, grid=True):
+    shape = np.shape(array)
+    cell = cell_size(shape)
+    rgb = upscale(array, cell)
+    if grid:
+        draw_grid(rgb, shape, cell, grid_color, grid_alpha)
+    return rgb, cell
+
+
+def _compose(panels, titles):
+    """Lay out RGB panels left to right with their (possibly multi-line) titles above"""
+    title_lines = max(len(title.split('\n')) for title in titles)
+    title_height = title_lines * TITLE_LINE_HEIGHT + MARGIN // 2
+    width = sum(panel.shape[1] for panel in panels) + MARGIN * (len(panels) + 1)
+    height = max(panel.shape[0] for panel in panels) + title_height + 2 * MARGIN
+
+    canvas = Image.new('RGB', (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(canvas)
+    font = _get_font()
+    x = MARGIN
+    for panel, title in zip(panels, titles):
+        # The bundled default font has no multiplication sign
+        title = title.replace('×', 'x')
+        for line_no, line in enumerate(title.split('\n')):
+            text_width = draw.textlength(line, font=font)
+            draw.text((x + (panel.shape[1] - text_width) / 2, MARGIN + line_no * TITLE_LINE_HEIGHT),
+                      line, fill=TEXT, font=font)
+        canvas.paste(Image.fromarray(panel), (x, MARGIN + title_height))
+        x += panel.shape[1] + MARGIN
+    return canvas, draw, title_height
+
+
+def to_png(canvas):
+    """Encode a PIL image as PNG bytes, favouring speed over file size"""
+    buf = io.BytesIO()
+    canvas.save(buf, format='PNG', compress_level=1)
+    return buf.getvalue()
+
+
+def render_layer(image, layer_output, layer_name, layer_config):
+    """PNG bytes of the input/output pair for one layer"""
+    left, _ = _panel(image, RED, 0.5, grid=np.shape(image)[0] <= 8)
+    right, _ = _panel(layer_output, BLUE, 0.5, grid=np.shape(layer_output)[0] <= 8)
+    canvas, _, _ = _compose([left, right], [f'Input to {layer_name}', f'{layer_name} Output\n{layer_config}'])
+    return to_png(canvas)
+
+
+def render_receptive_fields(image, rf_sizes, selected_layer, scale=1.0):
+    """PNG bytes of the receptive-field strip, one panel per layer
+
+    scale maps receptive-field sizes onto image when it is a downsampled preview.
+    """
+    shape = np.shape(image)
+    panel, cell = _panel(image, GRAY, 0.3, grid=shape[0] <= 32)
+    panels = [panel] * len(rf_sizes)
+    titles = [f'Layer {i}\nRF: {rf_size}×{rf_size}' for i, rf_size in enumerate(rf_sizes)]
+    canvas, draw, title_height = _compose(panels, titles)
+
+    center_y, center_x = shape[0] // 2, shape[1] // 2
+    x = MARGIN
+    y = MARGIN + title_height
+    for i, rf_size in enumerate(rf_sizes):
+        # Same box geometry as create_receptive_field_visualization
+        drawn_rf = max(1, int(round(rf_size * scale)))
+        half_rf = drawn_rf // 2
+        x_start = max(0, center_x - half_rf)
+        y_start = max(0, center_y - half_rf)
+        width = min(drawn_rf, shape[1] - x_start)
+        height = min(drawn_rf, shape[0] - y_start)
+
+        color, line_width = (RED, 3) if i == selected_layer else (BLUE, 2)
+        draw.rectangle([x + x_start * cell, y + y_start * cell,
+                        x + (x_start + width) * cell - 1, y + (y_start + height) * cell - 1],
+                       outline=color, width=line_width)
+
+        # Highlight center neuron
+        cx = x + center_x * cell + cell // 2
+        cy = y + center_y * cell + cell // 2
+        radius = max(3, cell // 4)
+        draw.ellipse([cx - radius, cy - radius, cx + radius, cy + radius], fill=YELLOW, outline=color, width=2)
+        x += panel.shape[1] + MARGIN
+    return to_png(canvas)
@@ -0,0 +1,141 @@
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+REQUEST_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+
+class ImageStore:
+    """Bounded, expiring in-memory store of the figures rendered for each request.
+
+    Every put() gets its own request ID, so concurrent requests never share
+    output names. Entries expire after ttl seconds, and the oldest are dropped
+    early once the store holds more than max_entries requests or max_bytes of PNG.
+
+    With disk_dir, figures are also written there (one directory per request),
+    so any worker process sharing the directory can serve them. The disk copy
+    expires after the same ttl, and every trim_every puts the directory is
+    swept and trimmed, oldest first, to max_bytes. Between sweeps it can run
+    over by up to trim_every - 1 requests; expired entries are never served.
+    """
+
+    def __init__(self, ttl=300, max_entries=256, max_bytes=64 * 1024 * 1024, disk_dir=None, trim_every=16):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.trim_every = trim_every
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._puts_since_trim = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def put(self, images):
+        """Store {name: png bytes} and return the new request ID"""
+        request_id = uuid.uuid4().hex
+        size = sum(len(png) for png in images.values())
+        with self._lock:
+            self._entries[request_id] = (time.monotonic() + self.ttl, size, dict(images))
+            self._bytes += size
+            self._evict()
+            self._puts_since_trim += 1
+            trim = self._puts_since_trim >= self.trim_every
+            if trim:
+                self._puts_since_trim = 0
+        if self.disk_dir and self._write_disk(request_id, images) and trim:
+            self._trim_disk()
+        return request_id
+
+    def get(self, request_id, name):
+        """PNG bytes for one figure of a request, or None if unknown or expired"""
+        with self._lock:
+            entry = self._entries.get(request_id)
+            if entry is not None:
+                expires, _, images = entry
+                if expires <= time.monotonic():
+                    self._drop(request_id)
+                    return None
+                return images.get(name)
+        # Stored by another worker, or already dropped from this one's memory
+        return self._read_disk(request_id, name)
+
+    def stats(self):
+        with self._lock:
+            self._evict()
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+    def _drop(self, request_id):
+        # Caller holds the lock
+        _, size, _ = self._entries.pop(request_id)
+        self._bytes -= size
+
+    def _evict(self):
+        # Caller holds the lock; entries are in insertion order, so oldest first
+        now = time.monotonic()
+        while self._entries:
+            request_id, (expires, _, _) = next(iter(self._entries.items()))
+            over_budget = len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            # Never evict the entry just stored, even if it alone exceeds the budget
+            if expires > now and (not over_budget or len(self._entries) == 1):
+                break
+            self._drop(request_id)
+
+    def _read_disk(self, request_id, name):
+        # IDs arrive from URLs, so never let one name a path outside disk_dir
+        if not self.disk_dir or not REQUEST_ID_PATTERN.fullmatch(request_id):
+            return None
+        entry_dir = os.path.join(self.disk_dir, request_id)
+        try:
+            if os.path.getmtime(entry_dir) + self.ttl <= time.time():
+                return None
+            with open(os.path.join(entry_dir, f'{os.path.basename(name)}.png'), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, request_id, images):
+        entry_dir = os.path.join(self.disk_dir, request_id)
+        tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(tmp_dir)
+            for name, png in images.items():
+                with open(os.path.join(tmp_dir, f'{name}.png'), 'wb') as f:
+                    f.write(png)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+        return True
+
+    def _trim_disk(self):
+        # Scans the whole directory, so put() only calls it every trim_every puts
+        now = time.time()
+        entries = []
+        total = 0
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            if name.endswith('.tmp') or not os.path.isdir(path):
+                continue
+            try:
+                mtime = os.path.getmtime(path)
+                size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            except OSError:
+                continue
+            if mtime + self.ttl <= now:
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            entries.append((mtime, size, path))
+            total += size
+
+        # Never remove the newest entry, even if it alone exceeds the budget
+        for _, size, path in sorted(entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
@@ -0,0 +1,185 @@
+import math
+
+import numpy as np
+
+from conv_engine import TILE_BYTES, band_rows, conv2d, output_size
+from pool_engine import normalize_pool_type, pool2d, pool_output_size
+
+# Every stage holds about this much at a time; smaller than the engines' own
+# TILE_BYTES because a deep stack has one band in flight per layer, and it
+# costs no speed (2-32 MB bands ran a 4096x4096 stack in the same time)
+STREAM_TILE_BYTES = 4 * 1024 * 1024
+
+
+def _source_blocks(image, max_tile_bytes):
+    """Row bands of the input image (views, no copies)"""
+    band = band_rows(image.shape[1] * 8, max_tile_bytes)
+    for r0 in range(0, image.shape[0], band):
+        yield image[r0:r0 + band]
+
+
+def _padded_blocks(blocks, width, top, bottom, left, right, fill):
+    """Pad a stream of row bands: fill rows above and below, fill columns on each band"""
+    dtype = None
+    for block in blocks:
+        if fill != 0:
+            block = block.astype(np.float64)
+        dtype = block.dtype
+        if top:
+            yield np.full((top, width + left + right), fill, dtype=dtype)
+            top = 0
+        yield np.pad(block, ((0, 0), (left, right)), mode='constant', constant_values=fill) if left or right else block
+    if bottom:
+        yield np.full((bottom, width + left + right), fill, dtype=dtype or np.float64)
+
+
+def _window_bands(blocks, window, stride, out_rows, row_bytes, max_tile_bytes):
+    """Yield (first output row, input rows) for bands of consecutive output rows.
+
+    Input rows are buffered only until every window that reads them is done, so
+    a stage holds about one band plus one window of its input at a time.
+    """
+    band = band_rows(row_bytes, max_tile_bytes)
+    buffer = None
+    start = 0  # input row index of buffer[0]
+    done = 0
+    for block in blocks:
+        buffer = block if buffer is None else np.concatenate([buffer, block])
+        while done < out_rows:
+            available = start + len(buffer)
+            ready = min(out_rows, (available - window) // stride + 1) if available >= window else 0
+            if ready <= done:
+                break
+            end = min(ready, done + band)
+            yield done, buffer[done * stride - start:(end - 1) * stride + window - start]
+            done = end
+            drop = min(done * stride - start, len(buffer))
+            buffer = buffer[drop:]
+            start += drop
+
+
+def _conv_stage(blocks, shape, kernel, padding=0, stride=1, dilation=1, max_tile_bytes=TILE_BYTES):
+    h, w = shape
+    kh, kw = kernel.shape
+    out_h = output_size(h, kh, padding, stride, dilation)
+    out_w = output_size(w, kw, padding, stride, dilation)
+    if out_h < 1 or out_w < 1:
+        raise ValueError(f"Kernel {kh}x{kw} does not fit in input of size {h}x{w} with padding {padding}")
+
+    def run():
+        padded = _padded_blocks(blocks, w, padding, padding, padding, padding, 0)
+        effective = dilation * (kh - 1) + 1
+        for _, rows in _window_bands(padded, effective, stride, out_h, out_w * kh * kw * 8, max_tile_bytes):
+            yield conv2d(rows, kernel, stride=stride, dilation=dilation, exact=True, max_tile_bytes=max_tile_bytes)
+    return run(), (out_h, out_w)
+
+
+def _pool_stage(blocks, shape, pool_size=2, pool_type='max', stride=None, padding=0, ceil_mode=False,
+                max_tile_bytes=TILE_BYTES):
+    h, w = shape
+    pool_type = normalize_pool_type(pool_type)
+
+    if pool_type in ('global_max', 'global_avg'):
+        def run_global():
+            total = None
+            for block in blocks:
+                if pool_type == 'global_max':
+                    value = np.max(block).astype(np.float64)
+                    total = value if total is None else max(total, value)
+                else:
+                    value = np.sum(block, dtype=np.float64)
+                    total = value if total is None else total + value
+            yield np.array([[total if pool_type == 'global_max' else total / (h * w)]])
+        return run_global(), (1, 1)
+
+    if stride is None:
+        stride = pool_size
+    out_h = pool_output_size(h, pool_size, stride, padding, ceil_mode)
+    out_w = pool_output_size(w, pool_size, stride, padding, ceil_mode)
+    # Same padding and ceil_mode overhang as pool2d
+    extra_h = max(0, (out_h - 1) * stride + pool_size - (h + 2 * padding))
+    extra_w = max(0, (out_w - 1) * stride + pool_size - (w + 2 * padding))
+    fill = {'max': -np.inf, 'min': np.inf}.get(pool_type, 0)
+
+    def window_counts(count, size):
+        # Cells of each window inside the input or its explicit padding, never the overhang
+        starts = np.arange(count) * stride
+        return np.minimum(starts + pool_size, size + 2 * padding) - starts
+
+    row_counts = window_counts(out_h, h)
+    col_counts = window_counts(out_w, w)
+
+    def run():
+        padded = _padded_blocks(blocks, w, padding, padding + extra_h, padding, padding + extra_w, fill)
+        row_bytes = out_w * pool_size * pool_size * 8
+        for first, rows in _window_bands(padded, pool_size, stride, out_h, row_bytes, max_tile_bytes):
+            out = pool2d(rows, pool_size, pool_type, stride, max_tile_bytes=max_tile_bytes)
+            if pool_type == 'avg' and (extra_h or extra_w):
+                counts = np.outer(row_counts[first:first + len(out)], col_counts)
+                out = out * (pool_size * pool_size) / counts
+            yield out
+    return run(), (out_h, out_w)
+
+
+class PreviewAccumulator:
+    """Block-mean preview of a map that arrives in row bands, no larger than max_size on its longer side.
+
+    Maps already within max_size are kept exactly.
+    """
+
+    def __init__(self, shape, max_size):
+        self.shape = shape
+        self.factor = max(1, math.ceil(max(shape) / max_size))
+        self.sums = np.zeros((-(-shape[0] // self.factor), -(-shape[1] // self.factor)))
+        self.row = 0
+
+    def add(self, block):
+        f = self.factor
+        if f == 1:
+            self.sums[self.row:self.row + len(block)] = block
+        else:
+            columns = np.add.reduceat(block, np.arange(0, self.shape[1], f), axis=1, dtype=np.float64)
+            np.add.at(self.sums, (self.row + np.arange(len(block))) // f, columns)
+        self.row += len(block)
+
+    def result(self):
+        f = self.factor
+        if f == 1:
+            return self.sums
+        h, w = self.shape
+        rows = np.minimum(f, h - np.arange(self.sums.shape[0]) * f)
+        cols = np.minimum(f, w - np.arange(self.sums.shape[1]) * f)
+        return self.sums / np.outer(rows, cols)
+
+
+def stream_stack(image, stages, preview_size, max_tile_bytes=STREAM_TILE_BYTES):
+    """Run a 2D image through a stack of layers band by band, keeping only previews.
+
+    stages are ('conv', kwargs for the conv stage) or ('pool', kwargs for
+    pool2d) pairs. No layer's output is ever held whole: each stage keeps
+    a band of its input rows, and every output is reduced on the fly to a
+    block-mean preview no larger than preview_size. Returns (previews,
+    output shapes), one per stage.
+    """
+    image = np.asarray(image)
+    blocks = _source_blocks(image, max_tile_bytes)
+    shape = image.shape
+    previews, shapes = [], []
+
+    def tap(stream, preview):
+        for block in stream:
+            preview.add(block)
+            yield block
+
+    for kind, params in stages:
+        stage = _conv_stage if kind == 'conv' else _pool_stage
+        stream, shape = stage(blocks, shape, max_tile_bytes=max_tile_bytes, **params)
+        preview = PreviewAccumulator(shape, preview_size)
+        blocks = tap(stream, preview)
+        previews.append(preview)
+        shapes.append(shape)
+
+    # Pull the last stage through; every earlier stage runs as it is pulled
+    for _ in blocks:
+        pass
+    return [preview.result() for preview in previews], shapes
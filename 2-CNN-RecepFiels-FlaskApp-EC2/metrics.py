@@ -0,0 +1,180 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Prometheus client defaults, plus a sub-millisecond bucket for the layer maths
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+# The StageTimer of the request running in this thread, if any
+_active_timer = ContextVar('stage_timer', default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class StageTimer:
+    """Wall-clock seconds spent in each named stage of one request.
+
+    Used as a context manager: while active, every Metrics.stage() in the same
+    thread also adds its duration here, so a request can report its own
+    breakdown alongside the process-wide histograms.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._token = None
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def as_ms(self):
+        return {name: round(seconds * 1000, 3) for name, seconds in self.timings.items()}
+
+    def __enter__(self):
+        self._token = _active_timer.set(self)
+        return self
+
+    def __exit__(self, *exc):
+        _active_timer.reset(self._token)
+        return False
+
+
+class Metrics:
+    """Process-wide counters and histograms, exported in Prometheus text format.
+
+    Every metric name gets the prefix, and each distinct set of labels is its
+    own series. With several gunicorn workers each process keeps its own
+    numbers, as with the Prometheus client's default (non-multiprocess) mode.
+    """
+
+    def __init__(self, prefix='visualizer', buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, text):
+        """Register HELP/TYPE lines for a metric ('counter', 'gauge' or 'histogram')"""
+        self._help[name] = (kind, text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as stage `name`, in the histogram and the active StageTimer"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe('stage_seconds', elapsed, stage=name)
+            timer = _active_timer.get()
+            if timer is not None:
+                timer.add(name, elapsed)
+
+    def render(self, gauges=None):
+        """Prometheus text exposition of every metric, plus {name: (value, labels)} gauges"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (h.buckets, list(h.counts), h.sum, h.count)
+                          for key, h in self._histograms.items()}
+
+        lines = []
+        described = set()
+
+        def header(name, default_kind):
+            if name in described:
+                return
+            described.add(name)
+            kind, text = self._help.get(name, (default_kind, name.replace('_', ' ')))
+            lines.append(f'# HELP {self.prefix}_{name} {text}')
+            lines.append(f'# TYPE {self.prefix}_{name} {kind}')
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f'{self.prefix}_{name}{_labels(labels)} {_number(value)}')
+
+        for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            header(name, 'histogram')
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append(f'{self.prefix}_{name}_bucket{_labels(labels + (("le", _number(bound)),))} {bucket_count}')
+            lines.append(f'{self.prefix}_{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{self.prefix}_{name}_sum{_labels(labels)} {_number(total)}')
+            lines.append(f'{self.prefix}_{name}_count{_labels(labels)} {count}')
+
+        for name, (value, labels) in sorted((gauges or {}).items()):
+            header(name, 'gauge')
+            lines.append(f'{self.prefix}_{name}{_labels(tuple(sorted(labels.items())))} {_number(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def profile_call(func, profiler='cprofile', limit=30):
+    """Run func() under a profiler and return (result, text report)"""
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ValueError("pyinstrument is not installed (pip install pyinstrument)")
+        profile = Profiler()
+        profile.start()
+        try:
+            result = func()
+        finally:
+            profile.stop()
+        return result, profile.output_text()
+
+    if profiler != 'cprofile':
+        raise ValueError(f"Unknown profiler '{profiler}', expected one of {', '.join(PROFILERS)}")
+    profile = cProfile.Profile()
+    result = profile.runcall(func)
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(limit)
+    return result, out.getvalue()
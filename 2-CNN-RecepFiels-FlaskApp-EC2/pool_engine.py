@@ -0,0 +1,129 @@
+import math
+
+import numpy as np
+
+from conv_engine import TILE_BYTES, band_rows, sliding_windows
+
+POOL_TYPES = ('max', 'avg', 'min', 'l2', 'global_max', 'global_avg')
+
+# Names accepted from the frontend / older configs
+POOL_ALIASES = {
+    'average': 'avg',
+    'mean': 'avg',
+    'global_average': 'global_avg',
+}
+
+
+def pool_output_size(size, pool_size, stride, padding=0, ceil_mode=False):
+    """Spatial output size of a pooling window along one axis (PyTorch semantics)"""
+    span = size + 2 * padding - pool_size
+    if span < 0:
+        raise ValueError(f"Pool size {pool_size} does not fit in input of size {size} with padding {padding}")
+    if not ceil_mode:
+        return span // stride + 1
+    out = math.ceil(span / stride) + 1
+    # The last window has to start inside the input or its left padding
+    if (out - 1) * stride >= size + padding:
+        out -= 1
+    return out
+
+
+def normalize_pool_type(pool_type):
+    """Resolve aliases such as 'average' and reject unknown pool types"""
+    pool_type = POOL_ALIASES.get(pool_type, pool_type)
+    if pool_type not in POOL_TYPES:
+        raise ValueError(f"Unknown pool type '{pool_type}', expected one of {', '.join(POOL_TYPES)}")
+    return pool_type
+
+
+def pool2d(x, pool_size=2, pool_type='max', stride=None, padding=0, ceil_mode=False, count_include_pad=True,
+           max_tile_bytes=TILE_BYTES):
+    """Vectorized 2D pooling over the last two axes of x.
+
+    Any leading axes (channels, batch) are pooled independently, so a whole
+    (N, C, H, W) stack is reduced in one call. Windows are strided views of the
+    input reduced along the window axes; nothing loops over output cells.
+
+    Padding uses the neutral element of the reduction (-inf for max, +inf for
+    min, 0 for avg/l2). Average pooling divides by the full window size when
+    count_include_pad is set, and never counts the overhang added by ceil_mode.
+    global_max / global_avg ignore size, stride and padding and return a 1x1 map.
+
+    Average and L2 pooling flatten windows in bands of output rows no larger
+    than about max_tile_bytes, so memory stays flat for large inputs.
+    """
+    pool_type = normalize_pool_type(pool_type)
+    x = np.asarray(x)
+    if x.ndim < 2:
+        raise ValueError(f"Expected at least a 2D input, got shape {x.shape}")
+
+    if pool_type == 'global_max':
+        return np.max(x, axis=(-2, -1), keepdims=True).astype(np.float64)
+    if pool_type == 'global_avg':
+        return np.mean(x, axis=(-2, -1), keepdims=True)
+
+    if stride is None:
+        stride = pool_size
+    h, w = x.shape[-2:]
+    out_h = pool_output_size(h, pool_size, stride, padding, ceil_mode)
+    out_w = pool_output_size(w, pool_size, stride, padding, ceil_mode)
+
+    # Explicit padding plus whatever overhang ceil_mode needs on the bottom/right
+    extra_h = max(0, (out_h - 1) * stride + pool_size - (h + 2 * padding))
+    extra_w = max(0, (out_w - 1) * stride + pool_size - (w + 2 * padding))
+    pad_width = [(0, 0)] * (x.ndim - 2) + [(padding, padding + extra_h), (padding, padding + extra_w)]
+
+    if pool_type == 'max':
+        fill = -np.inf
+    elif pool_type == 'min':
+        fill = np.inf
+    else:
+        fill = 0
+    if padding or extra_h or extra_w:
+        x = np.pad(x.astype(np.float64), pad_width, mode='constant', constant_values=fill)
+
+    windows = sliding_windows(x, (pool_size, pool_size), stride)[..., :out_h, :out_w, :, :]
+
+    if pool_type in ('max', 'min'):
+        # Fold the k*k window offsets with an elementwise max/min; each step is a
+        # strided slice over every output cell, which beats reducing the 6D view
+        reduce = np.maximum if pool_type == 'max' else np.minimum
+        out = windows[..., 0, 0].astype(np.float64)
+        for dy in range(pool_size):
+            for dx in range(pool_size):
+                if dy or dx:
+                    reduce(out, windows[..., dy, dx], out=out)
+        return out
+
+    # Flatten each window into one contiguous row so sums run in the same order
+    # as np.sum/np.mean over a single region
+    window_cells = pool_size * pool_size
+    total = np.empty(windows.shape[:-2])
+    leading = int(np.prod(windows.shape[:-4], dtype=np.int64))
+    band = band_rows(leading * out_w * window_cells * 8, max_tile_bytes)
+    for r0 in range(0, out_h, band):
+        rows = windows[..., r0:r0 + band, :, :, :]
+        flat = rows.reshape(rows.shape[:-2] + (window_cells,))
+        if pool_type == 'l2':
+            total[..., r0:r0 + band, :] = np.add.reduce(np.square(flat, dtype=np.float64), axis=-1)
+        else:
+            total[..., r0:r0 + band, :] = np.add.reduce(flat, axis=-1, dtype=np.float64)
+
+    if pool_type == 'l2':
+        return np.sqrt(total)
+    if not (padding or extra_h or extra_w):
+        return total / (pool_size * pool_size)
+    return total / _window_counts(h, w, pool_size, stride, padding, extra_h, extra_w,
+                                  out_h, out_w, count_include_pad)
+
+
+def _window_counts(h, w, pool_size, stride, padding, extra_h, extra_w, out_h, out_w, count_include_pad):
+    """Number of elements each average window should divide by"""
+    mask = np.ones((h, w))
+    counted = padding if count_include_pad else 0
+    uncounted = padding - counted
+    # Explicit padding counts when count_include_pad is set; ceil overhang never does
+    mask = np.pad(mask, ((counted, counted), (counted, counted)), mode='constant', constant_values=1)
+    mask = np.pad(mask, ((uncounted, uncounted + extra_h), (uncounted, uncounted + extra_w)), mode='constant')
+    windows = sliding_windows(mask, (pool_size, pool_size), stride)[:out_h, :out_w]
+    return np.maximum(windows.sum(axis=(-2, -1)), 1)
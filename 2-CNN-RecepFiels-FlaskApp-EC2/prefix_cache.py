@@ -0,0 +1,88 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from render_cache import CACHE_VERSION
+
+
+def prefix_keys(image, layers_config):
+    """Chained content hashes: keys[k] identifies the input plus its first k layers"""
+    image = np.ascontiguousarray(image)
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION}|{image.dtype.str}|{image.shape}|".encode())
+    h.update(image.tobytes())
+    key = h.hexdigest()
+
+    keys = [key]
+    for layer in layers_config:
+        key = hashlib.sha256((key + json.dumps(layer, sort_keys=True, default=str)).encode()).hexdigest()
+        keys.append(key)
+    return keys
+
+
+def options_tag(render_options):
+    """Short stable digest of the render options, to tell figures of one prefix apart"""
+    return hashlib.sha256(json.dumps(render_options, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class PrefixCache:
+    """Byte-bounded LRU of per-layer results keyed by config prefix.
+
+    Holds each layer's output array (with its display name and config string)
+    under its prefix key, and each rendered figure under a prefix key plus a
+    tag for the render options. Editing layer k of a stack leaves the keys of
+    the layers before it unchanged, so only layers k..n are recomputed and
+    re-rendered.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_layer(self, key):
+        """(output, name, config string) for a prefix key, or None"""
+        return self._get(('layer', key))
+
+    def put_layer(self, key, output, name, config):
+        # Outputs are shared with callers, so freeze them against in-place edits
+        output.setflags(write=False)
+        self._put(('layer', key), (output, name, config), output.nbytes)
+
+    def get_figure(self, key, tag):
+        return self._get(('figure', key, tag))
+
+    def put_figure(self, key, tag, png):
+        self._put(('figure', key, tag), png, len(png))
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._entries), 'bytes': self._bytes}
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _put(self, key, value, size):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Bump when the layer maths or figure layout changes so stale renders are not served
+CACHE_VERSION = 1
+
+KEY_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+def cache_key(image, layers_config, render_options=None):
+    """Content hash of (input pixels, full layer stack, render options)"""
+    image = np.ascontiguousarray(image)
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_VERSION}|{image.dtype.str}|{image.shape}|".encode())
+    h.update(image.tobytes())
+    h.update(json.dumps(layers_config, sort_keys=True, default=str).encode())
+    h.update(json.dumps(render_options or {}, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class CacheEntry:
+    """JSON payload plus the PNG bytes rendered for one configuration"""
+
+    def __init__(self, payload, images):
+        self.payload = payload
+        self.images = images
+
+    @property
+    def size(self):
+        return sum(len(png) for png in self.images.values())
+
+
+class RenderCache:
+    """Two-level LRU cache of rendered /process results.
+
+    The memory level holds up to max_memory_entries entries. When disk_dir is
+    set, entries are also written there (one directory per key) and the disk
+    level is trimmed, least recently used first, to max_disk_bytes.
+    """
+
+    def __init__(self, max_memory_entries=128, disk_dir=None, max_disk_bytes=256 * 1024 * 1024):
+        self.max_memory_entries = max_memory_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        """Return the CacheEntry for key, or None on a miss"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def get_image(self, key, name):
+        """PNG bytes for one figure of a cached entry, without touching the hit counters"""
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None:
+            entry = self._read_disk(key)
+        if entry is None:
+            return None
+        return entry.images.get(name)
+
+    def put(self, key, payload, images):
+        """Store a payload and its {name: png bytes} figures under key"""
+        entry = CacheEntry(payload, images)
+        with self._lock:
+            self._remember(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                shutil.rmtree(os.path.join(self.disk_dir, name), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': sum(entry.size for entry in self._memory.values()),
+            }
+
+    def _remember(self, key, entry):
+        # Caller holds the lock
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _entry_dir(self, key):
+        return os.path.join(self.disk_dir, key)
+
+    def _read_disk(self, key):
+        # Keys arrive from URLs, so never let one name a path outside disk_dir
+        if not self.disk_dir or not KEY_PATTERN.fullmatch(key):
+            return None
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, 'payload.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            images = {}
+            for name in meta['images']:
+                with open(os.path.join(entry_dir, f'{name}.png'), 'rb') as f:
+                    images[name] = f.read()
+            # Touch the directory so disk eviction sees it as recently used
+            os.utime(entry_dir)
+        except (OSError, ValueError, KeyError):
+            return None
+        return CacheEntry(meta['payload'], images)
+
+    def _write_disk(self, key, entry):
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+            for name, png in entry.images.items():
+                with open(os.path.join(tmp_dir, f'{name}.png'), 'wb') as f:
+                    f.write(png)
+            with open(os.path.join(tmp_dir, 'payload.json'), 'w', encoding='utf-8') as f:
+                json.dump({'payload': entry.payload, 'images': list(entry.images)}, f)
+            # Another worker may have stored the same key first; either copy is valid
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            else:
+                os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self._trim_disk()
+
+    def _trim_disk(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            if name.endswith('.tmp') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                continue
+            total += size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
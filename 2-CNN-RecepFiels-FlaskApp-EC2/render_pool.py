@@ -0,0 +1,65 @@
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _warm_worker():
+    """Pay matplotlib's backend and font initialisation once per worker process"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(1, 1))
+    ax.imshow([[0, 1], [1, 0]], cmap='gray', interpolation='nearest')
+    ax.set_title('warm-up ×', fontsize=12, fontweight='bold')
+    plt.tight_layout()
+    fig.savefig(io.BytesIO(), format='png', dpi=100, bbox_inches='tight')
+    plt.close(fig)
+
+
+def _ready():
+    return os.getpid()
+
+
+class RenderPool:
+    """Process pool for rendering independent matplotlib figures side by side.
+
+    matplotlib is not thread-safe, so figures are drawn in separate processes.
+    start() forks every worker up front and waits until each has warmed up, so
+    requests never pay process start-up or font loading. With workers=0 the
+    pool is disabled and map() renders serially in the calling process.
+    """
+
+    def __init__(self, workers=0):
+        self.workers = workers
+        self._executor = None
+
+    @property
+    def active(self):
+        return self._executor is not None
+
+    def start(self):
+        if self.workers <= 0 or self._executor is not None:
+            return
+        # Fork so workers inherit the already-imported app and its render functions
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                             initializer=_warm_worker)
+        # Workers spawn on demand; enough concurrent tasks force all of them up now
+        futures = [self._executor.submit(_ready) for _ in range(self.workers * 2)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def map(self, tasks):
+        """Run {name: (func, args)} and return {name: result} in the same order"""
+        if self._executor is None or len(tasks) < 2:
+            return {name: func(*args) for name, (func, args) in tasks.items()}
+        futures = {name: self._executor.submit(func, *args) for name, (func, args) in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
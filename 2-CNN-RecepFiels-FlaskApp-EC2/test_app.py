@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+"""
+Simple test script to verify the visualizer's layer operations
+"""
+
+import base64
+import io
+import json
+import sys
+import tempfile
+import zipfile
+
+import numpy as np
+from PIL import Image
+
+# Add current directory to path
+sys.path.append('.')
+
+import app
+from app import apply_convolution, apply_pooling, make_preview, run_layers, shrink_to_grid
+from conv_engine import conv2d
+from pool_engine import pool2d
+from render_cache import RenderCache, cache_key
+from image_store import ImageStore
+import fast_render
+from render_pool import RenderPool
+from prefix_cache import PrefixCache, prefix_keys
+from layer_stream import stream_stack
+from metrics import Metrics, StageTimer
+from digit_predictor import DynamicBatcher, prepare_digit
+
+
+def legacy_convolution(image, kernel, padding=0, stride=1):
+    """Reference per-pixel loop the vectorized engine replaced."""
+    h, w = image.shape
+    kh, kw = kernel.shape
+    output_h = (h + 2 * padding - kh) // stride + 1
+    output_w = (w + 2 * padding - kw) // stride + 1
+    padded = np.pad(image, ((padding, padding), (padding, padding)), mode='constant')
+    output = np.zeros((output_h, output_w))
+    for i in range(output_h):
+        for j in range(output_w):
+            y = i * stride
+            x = j * stride
+            output[i, j] = np.sum(padded[y:y+kh, x:x+kw] * kernel)
+    return output
+
+
+def legacy_pooling(image, pool_size=2, pool_type='max', stride=None):
+    """Reference per-cell pooling loop the vectorized engine replaced."""
+    if stride is None:
+        stride = pool_size
+    h, w = image.shape
+    output_h = (h - pool_size) // stride + 1
+    output_w = (w - pool_size) // stride + 1
+    output = np.zeros((output_h, output_w))
+    for i in range(output_h):
+        for j in range(output_w):
+            y = i * stride
+            x = j * stride
+            region = image[y:y+pool_size, x:x+pool_size]
+            if pool_type == 'max':
+                output[i, j] = np.max(region)
+            else:  # average
+                output[i, j] = np.mean(region)
+    return output
+
+
+def test_convolution_matches_legacy():
+    """apply_convolution must reproduce the old loop bit for bit."""
+    print("Testing convolution against the legacy loop...")
+    rng = np.random.default_rng(0)
+    kernels = [
+        np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]]),
+        np.ones((3, 3)) / 9,
+        rng.random((5, 5)) - 0.5,
+        rng.random((2, 3)),
+    ]
+    for kernel in kernels:
+        for image in (rng.integers(0, 256, (8, 8), dtype=np.uint8), rng.random((17, 13)) * 255):
+            for padding in (0, 1, 2):
+                for stride in (1, 2, 3):
+                    expected = legacy_convolution(image, kernel, padding, stride)
+                    actual = apply_convolution(image, kernel, padding=padding, stride=stride)
+                    assert actual.dtype == expected.dtype
+                    assert np.array_equal(actual, expected), (kernel.shape, padding, stride)
+    print("✅ Convolution is bit-identical to the legacy loop")
+
+
+def test_conv2d_multichannel_batched():
+    """Multi-channel, multi-filter, dilated and batched calls agree with a direct sum."""
+    print("Testing multi-channel conv2d...")
+    rng = np.random.default_rng(1)
+    x = rng.random((2, 3, 11, 10))
+    weight = rng.random((4, 3, 3, 3))
+    dilation = 2
+
+    out = conv2d(x, weight, padding=1, stride=2, dilation=dilation)
+    padded = np.pad(x, ((0, 0), (0, 0), (1, 1), (1, 1)))
+    expected = np.zeros(out.shape)
+    for n in range(out.shape[0]):
+        for f in range(out.shape[1]):
+            for i in range(out.shape[2]):
+                for j in range(out.shape[3]):
+                    y, xx = i * 2, j * 2
+                    patch = padded[n, :, y:y + 5:dilation, xx:xx + 5:dilation]
+                    expected[n, f, i, j] = np.sum(patch * weight[f])
+    assert out.shape == (2, 4, 5, 4)
+    assert np.allclose(out, expected)
+    assert np.array_equal(conv2d(x, weight, 1, 2, dilation, exact=True), expected)
+
+    # Batch axis and single-kernel shapes are preserved
+    assert conv2d(x[0], weight).shape == (4, 9, 8)
+    assert conv2d(x[0, 0], weight[0, 0]).shape == (9, 8)
+    print("✅ Multi-channel conv2d is correct")
+
+
+def test_pooling_matches_legacy():
+    """apply_pooling must reproduce the old loop bit for bit."""
+    print("Testing pooling against the legacy loop...")
+    rng = np.random.default_rng(2)
+    for image in (rng.integers(0, 256, (8, 8), dtype=np.uint8), rng.random((17, 13)) * 255 - 40):
+        for pool_type in ('max', 'average'):
+            for pool_size in (2, 3, 4):
+                for stride in (1, 2, 3, None):
+                    expected = legacy_pooling(image, pool_size, pool_type, stride)
+                    actual = apply_pooling(image, pool_size, pool_type, stride)
+                    assert np.array_equal(actual, expected), (pool_type, pool_size, stride)
+    print("✅ Pooling is bit-identical to the legacy loop")
+
+
+def test_pool2d_padding_and_stacks():
+    """Padding, ceil mode, extra pool types and stacked inputs."""
+    print("Testing pool2d options...")
+    image = np.arange(25, dtype=float).reshape(5, 5)
+
+    # Max padding never wins; ceil mode keeps the partial last window
+    assert pool2d(image, 2, 'max', 2).shape == (2, 2)
+    assert np.array_equal(pool2d(image, 2, 'max', 2, ceil_mode=True), [[6, 8, 9], [16, 18, 19], [21, 23, 24]])
+    assert np.array_equal(pool2d(image, 2, 'min', 2, padding=1), [[0, 1, 3], [5, 6, 8], [15, 16, 18]])
+
+    # Average divides by the full window with padding, by the real cells with ceil overhang
+    assert pool2d(image, 2, 'avg', 2, padding=1)[0, 0] == 0 / 4
+    assert pool2d(image, 2, 'avg', 2, ceil_mode=True)[2, 2] == 24
+    assert pool2d(image, 2, 'avg', 2, padding=1, count_include_pad=False)[0, 0] == 0
+
+    assert np.isclose(pool2d(image, 5, 'l2')[0, 0], np.sqrt(np.sum(image ** 2)))
+    assert np.array_equal(pool2d(image, pool_type='global_avg'), [[12]])
+
+    stack = np.random.default_rng(3).random((4, 3, 9, 9))
+    pooled = pool2d(stack, 3, 'max', 2)
+    assert pooled.shape == (4, 3, 4, 4)
+    assert np.array_equal(pooled[2, 1], pool2d(stack[2, 1], 3, 'max', 2))
+    assert pool2d(stack, pool_type='global_max').shape == (4, 3, 1, 1)
+
+    try:
+        pool2d(image, 2, 'median')
+        raise AssertionError("unknown pool type accepted")
+    except ValueError:
+        pass
+    print("✅ pool2d options are correct")
+
+
+def test_render_cache():
+    """Keys follow content, and entries survive memory eviction via disk."""
+    print("Testing render cache...")
+    image = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    layers = [{'type': 'conv', 'kernel_size': 3, 'stride': 1, 'padding': 0}]
+    key = cache_key(image, layers, {'renderer': 'matplotlib'})
+    assert key == cache_key(image.copy(), [dict(layers[0])], {'renderer': 'matplotlib'})
+    assert key != cache_key(image[::-1], layers, {'renderer': 'matplotlib'})
+    assert key != cache_key(image, [dict(layers[0], stride=2)], {'renderer': 'matplotlib'})
+    assert key != cache_key(image, layers, {'renderer': 'fast'})
+
+    with tempfile.TemporaryDirectory() as disk_dir:
+        cache = RenderCache(max_memory_entries=1, disk_dir=disk_dir)
+        assert cache.get(key) is None
+        cache.put(key, {'success': True}, {'original': b'png-bytes'})
+        cache.put('0' * 64, {'success': True}, {'original': b'other'})
+
+        # First key was pushed out of memory but is still on disk
+        entry = cache.get(key)
+        assert entry.payload == {'success': True}
+        assert cache.get_image(key, 'original') == b'png-bytes'
+        assert cache.get_image('../' + key, 'original') is None
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['disk_hits']) == (1, 1, 1)
+
+        # A tiny disk budget evicts the least recently used entries
+        cache.max_disk_bytes = 0
+        cache.put('1' * 64, {'success': True}, {'original': b'x'})
+        cache.clear()
+        assert cache.get(key) is None
+    print("✅ Render cache works")
+
+
+def test_image_store():
+    """Each put gets its own ID; entries expire and respect the size bounds."""
+    print("Testing per-request image store...")
+    store = ImageStore(ttl=60, max_entries=2, max_bytes=10)
+    first = store.put({'original': b'aaaa'})
+    second = store.put({'original': b'bbbb'})
+    assert first != second
+    assert store.get(first, 'original') == b'aaaa'
+    assert store.get(second, 'original') == b'bbbb'
+    assert store.get(second, 'missing') is None
+
+    # A third request pushes out the oldest one
+    third = store.put({'original': b'cccc'})
+    assert store.get(first, 'original') is None
+    assert store.get(third, 'original') == b'cccc'
+    assert store.stats() == {'entries': 2, 'bytes': 8}
+
+    expired = ImageStore(ttl=0)
+    request_id = expired.put({'original': b'x'})
+    assert expired.get(request_id, 'original') is None
+
+    # Workers sharing a directory serve each other's figures
+    with tempfile.TemporaryDirectory() as disk_dir:
+        worker_a = ImageStore(ttl=60, disk_dir=disk_dir, max_bytes=10, trim_every=2)
+        worker_b = ImageStore(ttl=60, disk_dir=disk_dir, max_bytes=10, trim_every=2)
+        request_id = worker_a.put({'original': b'aaaa'})
+        assert worker_b.get(request_id, 'original') == b'aaaa'
+        assert worker_b.get('../' + request_id, 'original') is None
+        newer = worker_b.put({'original': b'bbbbbbbb'})
+        assert worker_a.get(newer, 'original') == b'bbbbbbbb'
+        # Over budget, but worker_b has not reached its trim_every yet
+        assert worker_b.get(request_id, 'original') == b'aaaa'
+        worker_b.put({'original': b'c'})
+        # Trimmed to max_bytes on disk, oldest first
+        assert worker_b.get(request_id, 'original') is None
+        assert worker_a.get(newer, 'original') == b'bbbbbbbb'
+    print("✅ Image store works")
+
+
+def test_fast_renderer():
+    """The NumPy/PIL renderer produces valid PNGs with the maps upscaled cell by cell."""
+    print("Testing fast renderer...")
+    image = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    output = np.arange(36, dtype=float).reshape(6, 6)
+
+    layer_png = fast_render.render_layer(image, output, 'Conv 1', 'Kernel: (3, 3)')
+    layer_img = Image.open(io.BytesIO(layer_png))
+    assert layer_img.format == 'PNG' and layer_img.mode == 'RGB'
+    assert layer_img.width > 2 * fast_render.PANEL_SIZE
+
+    rf_img = Image.open(io.BytesIO(fast_render.render_receptive_fields(image, [1, 3, 5], 2)))
+    assert rf_img.width > 3 * fast_render.PANEL_SIZE
+
+    # Each input pixel becomes one flat cell, scaled like imshow
+    cell = fast_render.cell_size(image.shape)
+    rgb = fast_render.upscale(image, cell)
+    assert rgb.shape == (8 * cell, 8 * cell, 3)
+    assert rgb[0, 0, 0] == 0 and rgb[-1, -1, 0] == 255
+    assert np.all(fast_render.to_gray(np.full((3, 3), 7.0)) == 0)
+    print("✅ Fast renderer works")
+
+
+def test_render_pool():
+    """Pooled rendering returns the same figures, keyed and ordered like the serial path."""
+    print("Testing render pool...")
+    image = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    tasks = {
+        'original': (fast_render.render_layer, (image, image, 'Original', '8×8 Input')),
+        'receptive_fields': (fast_render.render_receptive_fields, (image, [1, 3], 1)),
+        'power': (pow, (2, 10)),
+    }
+    serial = RenderPool(workers=0).map(tasks)
+
+    pool = RenderPool(workers=2)
+    pool.start()
+    try:
+        assert pool.active
+        pooled = pool.map(tasks)
+    finally:
+        pool.shutdown()
+    assert not pool.active
+    assert list(pooled) == list(tasks)
+    assert pooled == serial and pooled['power'] == 1024
+    print("✅ Render pool works")
+
+
+def test_tiled_full_resolution():
+    """Banded processing matches the one-shot result; previews stay small."""
+    print("Testing tiled full-resolution processing...")
+    rng = np.random.default_rng(4)
+    image = rng.integers(0, 256, (97, 83), dtype=np.uint8)
+    kernel = np.ones((3, 3)) / 9
+
+    whole = conv2d(image, kernel, padding=1, exact=True)
+    banded = conv2d(image, kernel, padding=1, exact=True, max_tile_bytes=1)
+    assert np.array_equal(whole, banded)
+    assert np.array_equal(pool2d(whole, 3, 'avg', 2, padding=1), pool2d(whole, 3, 'avg', 2, padding=1, max_tile_bytes=1))
+
+    preview, scale = make_preview(whole, 32)
+    assert max(preview.shape) == 32 and scale == 32 / 97
+    assert make_preview(image[:8, :8], 32)[1] == 1.0
+
+    # Streaming the stack band by band gives the same maps, reduced to previews
+    layers = [
+        {'type': 'conv', 'kernel_size': 3, 'stride': 2, 'padding': 2, 'dilation': 2, 'kernel_type': 'sharpen'},
+        {'type': 'pool', 'pool_size': 3, 'stride': 2, 'padding': 1, 'pool_type': 'avg', 'ceil_mode': True},
+        {'type': 'pool', 'pool_size': 2, 'stride': 1, 'pool_type': 'max'},
+        {'type': 'pool', 'pool_type': 'global_avg'},
+    ]
+    expected = run_layers(image, layers)[0]
+    stages = [(layer['type'], app.layer_params(layer)) for layer in layers]
+    previews, shapes = stream_stack(image, stages, preview_size=128, max_tile_bytes=1)
+    assert shapes == [output.shape for output in expected]
+    assert all(np.allclose(preview, output) for preview, output in zip(previews, expected))
+    previews, _ = stream_stack(image, stages, preview_size=8)
+    assert max(previews[0].shape) <= 8 and np.isclose(previews[0].mean(), expected[0].mean(), rtol=0.05)
+
+    client = app.app.test_client()
+    result = client.post('/process', json={'layers': layers, 'resolution': 'full', 'renderer': 'fast',
+                                           'output': 'inline', 'cache': False}).get_json()
+    assert result['success'] and result['layer_info'][0]['output_shape'] == [14, 14]
+    # The global pool sees the whole 28x28 input, and needs no pool_size
+    assert result['receptive_fields'] == [1, 9, 13, 14, 28]
+    assert app.calculate_receptive_field(layers[::-1], 8) == [1, 8, 8, 8, 8]
+    print("✅ Tiled processing works")
+
+
+def test_prefix_cache():
+    """Editing the last layer reuses every earlier layer output."""
+    print("Testing prefix-cached recomputation...")
+    image = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    layers = [
+        {'type': 'conv', 'kernel_size': 3, 'stride': 1, 'padding': 1, 'kernel_type': 'blur'},
+        {'type': 'conv', 'kernel_size': 3, 'stride': 1, 'padding': 1, 'kernel_type': 'sharpen'},
+        {'type': 'pool', 'pool_size': 2, 'stride': 2},
+    ]
+    edited = layers[:2] + [dict(layers[2], pool_type='average')]
+
+    keys = prefix_keys(image, layers)
+    edited_keys = prefix_keys(image, edited)
+    assert len(keys) == 4
+    assert keys[:3] == edited_keys[:3] and keys[3] != edited_keys[3]
+
+    saved = app.prefix_cache
+    app.prefix_cache = PrefixCache()
+    try:
+        expected = run_layers(image, edited)
+        run_layers(image, layers, keys)
+        before = app.prefix_cache.stats()
+        actual = run_layers(image, edited, edited_keys)
+        after = app.prefix_cache.stats()
+    finally:
+        app.prefix_cache = saved
+    # Two layers came from the cache, only the edited pool layer missed
+    assert after['hits'] - before['hits'] == 2
+    assert after['misses'] - before['misses'] == 1
+    assert all(np.array_equal(a, b) for a, b in zip(actual[0], expected[0]))
+    assert actual[1:] == expected[1:]
+
+    # Byte budget evicts least recently used entries first
+    small = PrefixCache(max_bytes=10)
+    small.put_figure('a', 'tag', b'123456')
+    small.put_figure('b', 'tag', b'123456')
+    assert small.get_figure('a', 'tag') is None and small.get_figure('b', 'tag') == b'123456'
+    print("✅ Prefix cache works")
+
+
+def test_batch_endpoint():
+    """/process/batch matches running each image through run_layers on its own."""
+    print("Testing batch processing endpoint...")
+    rng = np.random.default_rng(0)
+    images = rng.integers(0, 256, (6, 28, 28), dtype=np.uint8)
+    stacks = [
+        [{'type': 'conv', 'kernel_size': 3, 'stride': 1, 'padding': 1, 'kernel_type': 'edge_detection'},
+         {'type': 'pool', 'pool_size': 2, 'stride': 2}],
+        [{'type': 'pool', 'pool_size': 2, 'stride': 2, 'pool_type': 'avg'}],
+    ]
+    npz = io.BytesIO()
+    np.savez(npz, images=images)
+    npz.seek(0)
+
+    client = app.app.test_client()
+    response = client.post('/process/batch', content_type='multipart/form-data',
+                           data={'npz': (npz, 'images.npz'), 'config': json.dumps({'stacks': stacks})})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    results, summary = lines[:-1], lines[-1]['summary']
+    assert len(results) == 12 and summary['results'] == 12
+
+    for result in results:
+        expected = run_layers(shrink_to_grid(images[result['image']]), stacks[result['stack']])[0]
+        assert result['layer_shapes'] == [list(output.shape) for output in expected]
+        assert np.array_equal(np.array(result['output']), expected[-1])
+
+    # The zip is streamed entry by entry, with full-resolution figures drawn from previews
+    npz = io.BytesIO()
+    np.savez(npz, images=images)
+    npz.seek(0)
+    config = {'stacks': stacks, 'format': 'zip', 'render': True, 'renderer': 'fast', 'resolution': 'full'}
+    response = client.post('/process/batch', content_type='multipart/form-data',
+                           data={'npz': (npz, 'images.npz'), 'config': json.dumps(config)})
+    assert response.status_code == 200 and response.is_streamed
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        names = archive.namelist()
+        zipped = json.loads(archive.read('summary.json'))
+        result = json.loads(archive.read('stack_1/image_5/result.json'))
+    assert zipped['results'] == 12 and zipped['images'] == 6
+    assert zipped['results_per_second'] > zipped['images_per_second']
+    assert result['layer_shapes'] == [[14, 14]] and 'stack_1/image_5/layer_1.png' in names
+
+    # Oversized batches are refused from the npy header, before the array is inflated
+    npz = io.BytesIO()
+    np.savez_compressed(npz, images=np.zeros((20000, 8, 8), dtype=np.uint8))
+    npz.seek(0)
+    too_many = client.post('/process/batch', content_type='multipart/form-data', data={'npz': (npz, 'images.npz')})
+    assert too_many.status_code == 400 and 'images' in too_many.get_json()['error']
+    saved = app.MAX_BATCH_PIXELS
+    app.MAX_BATCH_PIXELS = 28 * 28 * 5
+    try:
+        npz = io.BytesIO()
+        np.savez_compressed(npz, images=images)
+        npz.seek(0)
+        too_large = client.post('/process/batch', content_type='multipart/form-data', data={'npz': (npz, 'images.npz')})
+        assert too_large.status_code == 400 and 'pixels in total' in too_large.get_json()['error']
+    finally:
+        app.MAX_BATCH_PIXELS = saved
+
+    bad = client.post('/process/batch', json={'layers': stacks[0], 'format': 'tar'})
+    assert bad.status_code == 400
+    print(f"✅ Batch endpoint works ({summary['images_per_second']:.0f} images/s)")
+
+
+def test_metrics():
+    """Stage timers feed both the request breakdown and the Prometheus histograms."""
+    print("Testing stage metrics...")
+    registry = Metrics(prefix='test', buckets=(0.1, 1.0))
+    with StageTimer() as timer:
+        with registry.stage('conv'):
+            pass
+        with registry.stage('conv'):
+            pass
+    with registry.stage('pool'):
+        pass
+    assert list(timer.timings) == ['conv']
+    registry.inc('requests_total', endpoint='/process', status=200)
+    text = registry.render({'cache_bytes': (42, {})})
+    assert 'test_stage_seconds_count{stage="conv"} 2' in text
+    assert 'test_stage_seconds_bucket{stage="pool",le="+Inf"} 1' in text
+    assert 'test_requests_total{endpoint="/process",status="200"} 1' in text
+    assert '# TYPE test_cache_bytes gauge' in text and 'test_cache_bytes 42' in text
+
+    client = app.app.test_client()
+    layers = [{'type': 'conv', 'kernel_size': 3, 'stride': 1, 'padding': 1, 'kernel_type': 'blur'}]
+    result = client.post('/process', json={'layers': layers, 'renderer': 'fast', 'output': 'inline',
+                                           'cache': False, 'debug': True}).get_json()
+    assert {'decode', 'conv', 'render_layer', 'deliver'} <= set(result['timings'])
+    scrape = client.get('/metrics').get_data(as_text=True)
+    assert 'visualizer_requests_total{endpoint="/process",status="200"}' in scrape
+    print("✅ Metrics work")
+
+
+def test_predict_endpoint():
+    """Concurrent digits share forward passes and /predict answers with probabilities."""
+    print("Testing dynamic batching and /predict...")
+    from concurrent.futures import ThreadPoolExecutor
+
+    def predict(batch):
+        # Stand-in model: the class is the digit's mean brightness bucket
+        scores = np.full((len(batch), 10), 0.01, dtype=np.float32)
+        scores[np.arange(len(batch)), np.clip(batch.mean(axis=(1, 2, 3)).astype(int), 0, 9)] = 0.91
+        return scores
+
+    digit = prepare_digit(np.zeros((28, 28)))
+    assert digit.shape == (1, 28, 28) and digit.dtype == np.float32
+    assert prepare_digit(Image.new('L', (56, 40), 255)).shape == (1, 28, 28)
+
+    batcher = DynamicBatcher(predict, max_batch=8, max_wait=0.05)
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(batcher, [np.full((1, 28, 28), i % 10, np.float32) for i in range(32)]))
+    assert [int(np.argmax(row)) for row in results] == [i % 10 for i in range(32)]
+    stats = batcher.stats()
+    assert stats['items'] == 32 and stats['largest_batch'] <= 8 and stats['batches'] < 32
+    batcher.close()
+
+    client = app.app.test_client()
+    saved_model, saved_batcher, saved_pixels = app.DIGIT_MODEL, app.digit_batcher, app.MAX_IMAGE_PIXELS
+    try:
+        app.DIGIT_MODEL, app.digit_batcher = None, None
+        assert client.post('/predict', json={'pixels': [[0] * 28] * 28}).status_code == 503
+
+        app.DIGIT_MODEL, app.digit_batcher = 'stub', DynamicBatcher(predict, max_wait=0)
+        result = client.post('/predict', json={'pixels': [[0] * 28] * 28}).get_json()
+        assert result['success'] and result['digit'] == 0 and len(result['probabilities']) == 10
+        png = io.BytesIO()
+        Image.new('L', (28, 28), 255).save(png, format='PNG')
+        encoded = base64.b64encode(png.getvalue()).decode()
+        assert client.post('/predict', json={'image': encoded}).get_json()['digit'] == 2  # white normalizes to 2.8
+        assert client.post('/predict', json={'pixels': [1, 2, 3]}).status_code == 400
+        # Uploads over the pixel limit are refused from their header
+        app.MAX_IMAGE_PIXELS = 100
+        oversized = client.post('/predict', json={'image': encoded})
+        app.MAX_IMAGE_PIXELS = saved_pixels
+        assert oversized.status_code == 400 and '28×28' in oversized.get_json()['error']
+        assert client.post('/predict', json={}).status_code == 400
+        assert client.get('/predict/stats').get_json()['items'] == 2
+        assert 'visualizer_predict_items 2' in client.get('/metrics').get_data(as_text=True)
+        app.digit_batcher.close()
+    finally:
+        app.DIGIT_MODEL, app.digit_batcher, app.MAX_IMAGE_PIXELS = saved_model, saved_batcher, saved_pixels
+    print("✅ Dynamic batching and /predict work")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing CNN Visualizer Operations")
+    print("=" * 40)
+
+    test_convolution_matches_legacy()
+    test_conv2d_multichannel_batched()
+    test_pooling_matches_legacy()
+    test_pool2d_padding_and_stacks()
+    test_render_cache()
+    test_image_store()
+    test_fast_renderer()
+    test_render_pool()
+    test_tiled_full_resolution()
+    test_prefix_cache()
+    test_batch_endpoint()
+    test_metrics()
+    test_predict_endpoint()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+KEY_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+def normalize_question(question):
+    """Fold case, whitespace and trailing punctuation so trivially different phrasings match."""
+    question = ' '.join(question.lower().split())
+    return question.strip(' \'"`').rstrip('?!.').strip()
+
+
+def answer_key(question, bot_role, corpus_version, settings=None):
+    """Cache key for an answer: normalized question, role, notes version and any answer-shaping settings."""
+    parts = [normalize_question(question), bot_role, str(corpus_version),
+             json.dumps(settings or {}, sort_keys=True)]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """TTL- and LRU-bounded cache of model answers, optionally persisted to disk.
+
+    Entries live ttl seconds and at most max_entries are held in memory.
+    With disk_dir, each answer is also written there as <key>.json (answers
+    only, never API keys), so a restarted server keeps its warm cache; the
+    oldest files are removed once there are more than max_disk_entries.
+    """
+
+    def __init__(self, ttl=3600, max_entries=1024, disk_dir=None, max_disk_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()     # key -> (expiry in wall-clock seconds, answer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        """The cached answer for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, entry)
+        return entry[1]
+
+    def put(self, key, answer):
+        entry = (time.time() + self.ttl, answer)
+        with self._lock:
+            self._remember(key, entry)
+        if self.disk_dir:
+            self._write_disk(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._memory),
+            }
+
+    def _remember(self, key, entry):
+        # Caller holds the lock
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.json')
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir or not KEY_PATTERN.fullmatch(key):
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            expires, answer = data['expires'], data['answer']
+        except (OSError, ValueError, KeyError):
+            return None
+        if expires <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return expires, answer
+
+    def _write_disk(self, key, entry):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'expires': entry[0], 'answer': entry[1]}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._trim_disk()
+
+    def _trim_disk(self):
+        names = [name for name in os.listdir(self.disk_dir) if name.endswith('.json')]
+        if len(names) <= self.max_disk_entries:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(self.disk_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        for _, path in sorted(entries)[:len(entries) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
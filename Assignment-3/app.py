@@ -1,8 +1,16 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
+import importlib
+import json
 import os
-import google.generativeai as genai
-from pathlib import Path
 import logging
+import time
+from functools import partial
+
+from answer_cache import AnswerCache, answer_key
+from concurrency import ConcurrencyLimiter, QueueTimeout, RequestTimeout, Saturated
+from llm_clients import FakeBackend, GeminiBackend, key_digest
+from notes_corpus import NotesCorpus
+from notes_index import NotesIndex
 
 app = Flask(__name__)
 
@@ -13,103 +21,144 @@ logger = logging.getLogger(__name__)
 # Path to the Notes directory (local to the project)
 NOTES_DIR = "notes"
 
+# Notes are read once and then only re-read when they change on disk
+notes_corpus = NotesCorpus(NOTES_DIR, refresh_interval=float(os.environ.get('NOTES_REFRESH_SECONDS', 2)))
+
 def read_notes_files():
-    """Read all text files from the Notes directory and return their content."""
-    notes_content = []
-    
+    """Return the content of every text file and notebook in the Notes directory."""
     try:
-        notes_path = Path(NOTES_DIR)
-        if not notes_path.exists():
+        if not notes_corpus.exists:
             logger.warning(f"Notes directory does not exist: {NOTES_DIR}")
             return "Notes directory not found."
         
-        # Read all text files in the directory
-        for file_path in notes_path.rglob("*.txt"):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    content = file.read().strip()
-                    if content:
-                        notes_content.append(f"File: {file_path.name}\n{content}\n")
-            except Exception as e:
-                logger.error(f"Error reading file {file_path}: {e}")
-                continue
-        
-        # Read Jupyter notebooks
-        for file_path in notes_path.rglob("*.ipynb"):
-            try:
-                import json
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    notebook = json.load(file)
-                    # Extract text from notebook cells
-                    notebook_text = []
-                    for cell in notebook.get('cells', []):
-                        if cell.get('cell_type') == 'markdown' or cell.get('cell_type') == 'code':
-                            source = cell.get('source', [])
-                            if isinstance(source, list):
-                                cell_text = ''.join(source)
-                            else:
-                                cell_text = str(source)
-                            if cell_text.strip():
-                                notebook_text.append(cell_text.strip())
-                    
-                    if notebook_text:
-                        content = '\n\n'.join(notebook_text)
-                        notes_content.append(f"File: {file_path.name}\n{content}\n")
-            except Exception as e:
-                logger.error(f"Error reading notebook {file_path}: {e}")
-                continue
-        
-        # Also read other common text file extensions
-        for ext in ['.md', '.py', '.js', '.html', '.css', '.json']:
-            for file_path in notes_path.rglob(f"*{ext}"):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as file:
-                        content = file.read().strip()
-                        if content:
-                            notes_content.append(f"File: {file_path.name}\n{content}\n")
-                except Exception as e:
-                    logger.error(f"Error reading file {file_path}: {e}")
-                    continue
-        
-        if not notes_content:
+        content = notes_corpus.text()
+        if not content:
             return "No readable text files found in the Notes directory."
         
-        return "\n".join(notes_content)
+        return content
     
     except Exception as e:
         logger.error(f"Error reading notes directory: {e}")
         return f"Error reading notes: {str(e)}"
 
-def ask_gemini(api_key, question, context, bot_role="teacher"):
-    """Ask Gemini AI a question with the provided context and role."""
+# Only the note chunks most relevant to a question go into the prompt
+RETRIEVAL_ENABLED = os.environ.get('RETRIEVAL', '1') != '0'
+RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', 8))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 3000))
+notes_index = NotesIndex()
+
+def preload_notes():
+    """Read and index the notes now, so the first question does not pay for it"""
+    if not os.path.exists(NOTES_DIR):
+        logger.warning(f"Notes directory not found: {NOTES_DIR}")
+        logger.info("Please ensure the Notes directory exists and contains text files.")
+        return
+    notes_corpus.refresh(force=True)
+    notes_index.update(notes_corpus)
+    logger.info(f"Loaded notes corpus version {notes_corpus.version}: {notes_index.stats()['chunks']} chunks "
+                f"from {notes_corpus.stats()['files']} files")
+
+# At import, so every gunicorn worker (or the master, with --preload) starts warm
+if os.environ.get('PRELOAD_NOTES', '1') != '0':
+    preload_notes()
+
+# Gemini clients are pooled per API key (in memory only); LLM_BACKEND=fake
+# answers offline for tests and load tests
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini')
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 60))
+
+def make_llm_backend(name):
+    """Build the LLM backend: 'gemini', 'fake', or 'package.module:Factory' for any LLMBackend."""
+    if name == 'fake':
+        return FakeBackend(first_token_delay=float(os.environ.get('FAKE_LLM_FIRST_TOKEN_DELAY', 0)),
+                           token_delay=float(os.environ.get('FAKE_LLM_TOKEN_DELAY', 0)))
+    if name == 'gemini':
+        return GeminiBackend(max_clients=int(os.environ.get('LLM_CLIENT_POOL_SIZE', 32)),
+                             ttl=int(os.environ.get('LLM_CLIENT_TTL', 900)), timeout=LLM_TIMEOUT)
+    module_name, _, factory = name.partition(':')
+    if not factory:
+        raise ValueError(f"Unknown LLM backend '{name}', expected gemini, fake or module:factory")
+    return getattr(importlib.import_module(module_name), factory)()
+
+llm_backend = make_llm_backend(LLM_BACKEND)
+
+# Model calls run on a bounded pool: past LLM_MAX_CONCURRENT running and
+# LLM_MAX_QUEUE waiting, requests get an immediate 429; waiting longer than
+# LLM_QUEUE_TIMEOUT gets a 503, and a call over LLM_TIMEOUT a 504
+llm_limiter = ConcurrencyLimiter(
+    max_concurrent=int(os.environ.get('LLM_MAX_CONCURRENT', 16)),
+    max_queue=int(os.environ.get('LLM_MAX_QUEUE', 64)),
+    queue_timeout=float(os.environ.get('LLM_QUEUE_TIMEOUT', 10)),
+)
+BUSY_ERRORS = {Saturated: 429, QueueTimeout: 503, RequestTimeout: 504}
+
+def busy_response(error):
+    """JSON error for a request refused or cut off by the concurrency limiter."""
+    response = jsonify({
+        'success': False,
+        'error': str(error)
+    })
+    response.status_code = BUSY_ERRORS[type(error)]
+    if response.status_code != 504:
+        response.headers['Retry-After'] = '1'
+    return response
+
+# Repeated questions are answered from a cache keyed on the normalized
+# question, role, notes version and API key digest; roles outside ANSWER_CACHE_ROLES (the
+# quizzer, by default, so quizzes stay fresh) always ask the model
+ANSWER_CACHE_ENABLED = os.environ.get('ANSWER_CACHE', '1') != '0'
+ANSWER_CACHE_ROLES = tuple(role for role in os.environ.get('ANSWER_CACHE_ROLES', 'teacher').split(',') if role)
+answer_cache = AnswerCache(
+    ttl=int(os.environ.get('ANSWER_CACHE_TTL', 3600)),
+    max_entries=int(os.environ.get('ANSWER_CACHE_ENTRIES', 1024)),
+    disk_dir=os.environ.get('ANSWER_CACHE_DIR') or None,
+)
+
+def retrieve_context(question):
+    """Return the notes context for a question: its best-matching chunks within the token budget."""
+    if not RETRIEVAL_ENABLED:
+        return read_notes_files()
+    
     try:
-        # Configure the Gemini API
-        genai.configure(api_key=api_key)
+        if not notes_corpus.exists:
+            logger.warning(f"Notes directory does not exist: {NOTES_DIR}")
+            return "Notes directory not found."
         
-        # Create the model
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        # Re-chunks only the notes that changed since the last question
+        notes_index.update(notes_corpus)
+        context = notes_index.build_context(question, RETRIEVAL_TOP_K, CONTEXT_TOKEN_BUDGET)
+        if not context:
+            return "No notes matched this question."
         
-        # Define role-based prompts
-        role_prompts = {
-            "teacher": """You are a helpful Python programming tutor specializing in ERA V4 course material. Your role is to:
+        return context
+    
+    except Exception as e:
+        logger.error(f"Error searching notes: {e}")
+        return f"Error reading notes: {str(e)}"
+
+def build_prompt(question, context, bot_role="teacher"):
+    """Combine the role instructions, notes context and question into one prompt."""
+    # Define role-based prompts
+    role_prompts = {
+        "teacher": """You are a helpful Python programming tutor specializing in ERA V4 course material. Your role is to:
 - Explain concepts clearly and thoroughly
 - Provide detailed explanations with examples
 - Break down complex topics into understandable parts
 - Help students understand the 'why' behind concepts
 - Be encouraging and supportive""",
-            
-            "quizzer": """You are a Python programming quiz master specializing in ERA V4 course material. Your role is to:
+        
+        "quizzer": """You are a Python programming quiz master specializing in ERA V4 course material. Your role is to:
 - Create challenging but fair questions
 - Test understanding through practical examples
 - Provide immediate feedback on answers
 - Ask follow-up questions to deepen understanding
 - Challenge students to think critically"""
-        }
-        
-        role_instruction = role_prompts.get(bot_role, role_prompts["teacher"])
-        
-        # Create the prompt with context and role
-        prompt = f"""{role_instruction}
+    }
+    
+    role_instruction = role_prompts.get(bot_role, role_prompts["teacher"])
+    
+    # Create the prompt with context and role
+    return f"""{role_instruction}
 
 Context from ERA V4 Python notes and files:
 {context}
@@ -118,13 +167,30 @@ Student Question: {question}
 
 Please respond according to your role. If the answer cannot be found in the provided context, please say so clearly and offer to help with related topics."""
 
-        # Generate response
-        response = model.generate_content(prompt)
+def cached_answer_key(question, bot_role, data, api_key):
+    """Answer cache key for a request, or None when its answer should not be cached.
+
+    A hit never reaches the model, so nothing checks the API key; scoping
+    entries to its digest keeps a made-up key from reading other keys' answers.
+    """
+    if not ANSWER_CACHE_ENABLED or bot_role not in ANSWER_CACHE_ROLES or not data.get('cache', True):
+        return None
+    notes_corpus.refresh()
+    # Anything else that changes the answer for the same question goes into the key too
+    settings = {'backend': LLM_BACKEND, 'retrieval': RETRIEVAL_ENABLED,
+                'top_k': RETRIEVAL_TOP_K, 'budget': CONTEXT_TOKEN_BUDGET, 'api_key': key_digest(api_key)}
+    return answer_key(question, bot_role, notes_corpus.version, settings)
+
+def ask_gemini(api_key, question, context, bot_role="teacher"):
+    """Ask Gemini AI a question with the provided context and role."""
+    try:
+        # The client for this key is reused across requests instead of rebuilt
+        response = llm_backend.generate(api_key, build_prompt(question, context, bot_role))
         
         # Clear the API key from memory immediately after use
         api_key = None
         
-        return response.text
+        return response
     
     except Exception as e:
         logger.error(f"Error calling Gemini API: {e}")
@@ -132,6 +198,11 @@ Please respond according to your role. If the answer cannot be found in the prov
         api_key = None
         raise e
 
+def sse_event(data, event=None):
+    """Format one Server-Sent Event with a JSON payload."""
+    lines = f"event: {event}\n" if event else ""
+    return f"{lines}data: {json.dumps(data)}\n\n"
+
 @app.route('/')
 def index():
     """Serve the main page."""
@@ -143,6 +214,22 @@ def static_files(filename):
     """Serve static files."""
     return app.send_static_file(filename)
 
+@app.route('/corpus')
+def corpus_info():
+    """Report the notes corpus version and size."""
+    notes_corpus.refresh()
+    return jsonify(dict(notes_corpus.stats(), index=notes_index.stats()))
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Report answer cache hits, misses and size."""
+    return jsonify(dict(answer_cache.stats(), roles=list(ANSWER_CACHE_ROLES)))
+
+@app.route('/load')
+def load_stats():
+    """Report running, queued, refused and timed-out model calls."""
+    return jsonify(llm_limiter.stats())
+
 @app.route('/ask', methods=['POST'])
 def ask_question():
     """Handle the question asking endpoint."""
@@ -159,22 +246,40 @@ def ask_question():
                 'error': 'API key and question are required'
             }), 400
         
-        # Read notes content
-        logger.info("Reading notes files...")
-        notes_content = read_notes_files()
+        key = cached_answer_key(question, bot_role, data, api_key)
+        response = answer_cache.get(key) if key else None
+        if response is not None:
+            api_key = None
+            return jsonify({
+                'success': True,
+                'response': response,
+                'cached': True
+            })
+        
+        # Notes come from the in-memory corpus, narrowed to the relevant chunks
+        notes_content = retrieve_context(question)
         
-        # Ask Gemini
+        # Ask Gemini, on the bounded model pool
         logger.info(f"Asking Gemini AI as {bot_role}...")
-        response = ask_gemini(api_key, question, notes_content, bot_role)
+        response = llm_limiter.run(partial(ask_gemini, api_key, question, notes_content, bot_role),
+                                   timeout=LLM_TIMEOUT)
         
         # Clear API key from memory immediately after successful use
         api_key = None
+        if key:
+            answer_cache.put(key, response)
         
         return jsonify({
             'success': True,
-            'response': response
+            'response': response,
+            'cached': False
         })
     
+    except (Saturated, QueueTimeout, RequestTimeout) as e:
+        logger.warning(f"Question not answered: {e}")
+        api_key = None
+        return busy_response(e)
+    
     except Exception as e:
         logger.error(f"Error processing question: {e}")
         # Clear API key from memory even on error
@@ -184,10 +289,69 @@ def ask_question():
             'error': str(e)
         }), 500
 
-if __name__ == '__main__':
-    # Check if Notes directory exists
-    if not os.path.exists(NOTES_DIR):
-        logger.warning(f"Notes directory not found: {NOTES_DIR}")
-        logger.info("Please ensure the Notes directory exists and contains text files.")
+@app.route('/ask/stream', methods=['POST'])
+def ask_question_stream():
+    """Answer a question as Server-Sent Events, forwarding text as the model produces it."""
+    data = request.get_json()
+    api_key = data.get('api_key')
+    question = data.get('question')
+    bot_role = data.get('bot_role', 'teacher')
+    
+    if not api_key or not question:
+        return jsonify({
+            'success': False,
+            'error': 'API key and question are required'
+        }), 400
+    
+    key = cached_answer_key(question, bot_role, data, api_key)
+    cached = answer_cache.get(key) if key else None
+    if cached is not None:
+        api_key = None
+        return Response(sse_event({'text': cached}) + sse_event({'cached': True}, event='done'),
+                        mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Refuse before streaming starts, while a proper status code can still be sent
+    try:
+        llm_limiter.acquire()
+    except (Saturated, QueueTimeout) as e:
+        logger.warning(f"Question not answered: {e}")
+        return busy_response(e)
+    
+    try:
+        prompt = build_prompt(question, retrieve_context(question), bot_role)
+    except Exception:
+        llm_limiter.release()
+        raise
+    logger.info(f"Streaming Gemini AI answer as {bot_role}...")
+    deadline = time.monotonic() + LLM_TIMEOUT
+    
+    def generate():
+        nonlocal api_key
+        try:
+            pieces = []
+            for text in llm_backend.stream(api_key, prompt):
+                pieces.append(text)
+                yield sse_event({'text': text})
+                if time.monotonic() > deadline:
+                    raise RequestTimeout(f"The model did not finish within {LLM_TIMEOUT:g} seconds")
+            # Only complete answers are cached
+            if key:
+                answer_cache.put(key, ''.join(pieces))
+            yield sse_event({'cached': False}, event='done')
+        except Exception as e:
+            logger.error(f"Error streaming answer: {e}")
+            yield sse_event({'error': str(e)}, event='error')
+        finally:
+            # Clear the API key from memory once the stream ends, however it ends
+            api_key = None
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Frees the slot when the stream ends, even if the client disconnects before reading it
+    response.call_on_close(llm_limiter.release)
+    return response
+
+if __name__ == '__main__':
+    # Each waiting student holds a server thread; for hundreds of them run under
+    # a threaded server such as gunicorn -k gthread (see README)
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1') == '1', threaded=True, host='0.0.0.0', port=5000)
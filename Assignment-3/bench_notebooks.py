@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: json.load vs the streaming notebook reader on output-heavy notebooks
+
+Writes synthetic notebooks whose cells carry base64 plots and long training
+logs, then compares time and peak Python memory of extracting the cell
+sources, and serial vs threaded loading of a folder of them.
+
+Usage: python bench_notebooks.py [--cells N] [--plot-kb KB] [--files N]
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append('.')
+
+from notes_corpus import NotesCorpus, read_notebook
+
+
+def legacy_read_notebook(file_path):
+    """The json.load reader read_notebook replaced."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        notebook = json.load(file)
+    notebook_text = []
+    for cell in notebook.get('cells', []):
+        if cell.get('cell_type') == 'markdown' or cell.get('cell_type') == 'code':
+            source = cell.get('source', [])
+            cell_text = ''.join(source) if isinstance(source, list) else str(source)
+            if cell_text.strip():
+                notebook_text.append(cell_text.strip())
+    return notebook_text
+
+
+def write_notebook(path, cells, plot_kb, log_lines):
+    plot = base64.b64encode(os.urandom(plot_kb * 1024)).decode('ascii')
+    log = [f"Epoch {i}: loss=0.{i:04d} acc=0.9{i % 10}\n" for i in range(log_lines)]
+    notebook = {'cells': [], 'metadata': {}, 'nbformat': 4, 'nbformat_minor': 5}
+    for i in range(cells):
+        notebook['cells'].append({'cell_type': 'markdown', 'metadata': {}, 'source': [f"## Step {i}\n", "Train it."]})
+        notebook['cells'].append({
+            'cell_type': 'code', 'execution_count': i, 'metadata': {},
+            'source': [f"model.fit(x, y, epochs={i})\n", "plt.plot(history)"],
+            'outputs': [
+                {'name': 'stdout', 'output_type': 'stream', 'text': log},
+                {'output_type': 'display_data', 'metadata': {},
+                 'data': {'image/png': plot, 'text/plain': ['<Figure>']}},
+            ],
+        })
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(notebook, file, indent=1)
+
+
+def measure(func, *args):
+    """(seconds, peak traced MB, result) of func(*args)
+
+    Timed on its own first: tracing allocations slows Python-level loops far
+    more than C ones, so a traced run would flatter json.load.
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cells', type=int, default=40, help='code cells per notebook (each with outputs)')
+    parser.add_argument('--plot-kb', type=int, default=100, help='raw size of each embedded plot')
+    parser.add_argument('--log-lines', type=int, default=2000, help='stdout lines per code cell')
+    parser.add_argument('--files', type=int, default=8, help='notebooks for the folder-loading comparison')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as notes_dir:
+        paths = [os.path.join(notes_dir, f'notebook_{i}.ipynb') for i in range(args.files)]
+        for path in paths:
+            write_notebook(path, args.cells, args.plot_kb, args.log_lines)
+        size_mb = os.path.getsize(paths[0]) / 1024 / 1024
+
+        legacy = measure(legacy_read_notebook, paths[0])
+        streaming = measure(read_notebook, paths[0])
+        assert legacy[2] == streaming[2]
+        print(f"one notebook, {size_mb:.1f} MB on disk, {len(streaming[2])} cells kept")
+        print(f"{'reader':>12} {'seconds':>8} {'peak MB':>8}")
+        print(f"{'json.load':>12} {legacy[0]:>8.3f} {legacy[1]:>8.1f}")
+        print(f"{'streaming':>12} {streaming[0]:>8.3f} {streaming[1]:>8.1f}")
+
+        print(f"\nfolder of {args.files} notebooks")
+        for workers in (1, 4):
+            def load():
+                return NotesCorpus(notes_dir, read_workers=workers).refresh()
+            seconds, peak, _ = measure(load)
+            print(f"{workers} reader thread(s): {seconds:.3f} s, peak {peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
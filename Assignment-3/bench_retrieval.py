@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark: prompt size and retrieval latency vs notes corpus size
+
+Copies the notes folder 1, 2, 4, ... times into a scratch directory and, for
+each size, compares the full-notes prompt with the retrieved context and
+times index build, incremental update and search. No API key or network.
+
+Usage: python bench_retrieval.py [--max-copies N] [--budget TOKENS] [--top-k K]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append('.')
+
+from notes_corpus import NotesCorpus
+from notes_index import NotesIndex, estimate_tokens
+
+QUESTIONS = [
+    "How do tensors move to the GPU?",
+    "What is string interning?",
+    "Explain default arguments in functions",
+    "How does autograd compute gradients?",
+    "What is the difference between a tuple and a list?",
+    "How do I reshape a tensor?",
+]
+
+
+def ms(seconds):
+    return seconds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', default='notes')
+    parser.add_argument('--max-copies', type=int, default=32)
+    parser.add_argument('--budget', type=int, default=3000, help='context token budget')
+    parser.add_argument('--top-k', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=20, help='searches per question')
+    args = parser.parse_args()
+
+    sources = [path for path in Path(args.notes).rglob('*') if path.is_file()]
+    print(f"{'copies':>6} {'files':>6} {'chunks':>7} {'full tokens':>12} {'context tokens':>15} "
+          f"{'build ms':>9} {'update ms':>10} {'search ms':>10}")
+
+    copies = 1
+    while copies <= args.max_copies:
+        with tempfile.TemporaryDirectory() as scratch:
+            for copy in range(copies):
+                for source in sources:
+                    shutil.copy(source, Path(scratch) / f"{source.stem}_{copy}{source.suffix}")
+
+            corpus = NotesCorpus(scratch, refresh_interval=0)
+            full_tokens = estimate_tokens(corpus.text())
+
+            index = NotesIndex()
+            start = time.perf_counter()
+            index.update(corpus)
+            build = time.perf_counter() - start
+
+            # Touch one file so only it is re-chunked
+            touched = next(Path(scratch).iterdir())
+            os.utime(touched, ns=(time.time_ns(), time.time_ns()))
+            start = time.perf_counter()
+            index.update(corpus)
+            update = time.perf_counter() - start
+
+            context_tokens = []
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for question in QUESTIONS:
+                    context_tokens.append(estimate_tokens(index.build_context(question, args.top_k, args.budget)))
+            search = (time.perf_counter() - start) / (args.repeat * len(QUESTIONS))
+
+            stats = index.stats()
+            print(f"{copies:>6} {stats['files']:>6} {stats['chunks']:>7} {full_tokens:>12} "
+                  f"{max(context_tokens):>15} {ms(build):>9.1f} {ms(update):>10.2f} {ms(search):>10.3f}")
+        copies *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class Saturated(Exception):
+    """Every slot is busy and the wait queue is full (HTTP 429)."""
+
+
+class QueueTimeout(Exception):
+    """No slot freed up within the queue timeout (HTTP 503)."""
+
+
+class RequestTimeout(Exception):
+    """The model call itself took longer than the request timeout (HTTP 504)."""
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent model calls, with a bounded queue of requests waiting for a slot.
+
+    At most max_concurrent calls run at once and at most max_queue more wait,
+    each for up to queue_timeout seconds. Anything beyond that is refused
+    straight away, so a burst of students gets quick 429/503 answers instead
+    of piling up behind the model. run() executes a call on a thread pool of
+    max_concurrent workers and stops waiting for it after a timeout; the slot
+    stays taken until the call really ends, so the cap holds even then.
+    """
+
+    def __init__(self, max_concurrent=16, max_queue=64, queue_timeout=10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='llm')
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_timeouts = 0
+        self.request_timeouts = 0
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if there is room; raise Saturated or QueueTimeout otherwise."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise Saturated("Too many questions at once, please retry in a moment")
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                with self._lock:
+                    self.queue_timeouts += 1
+                raise QueueTimeout("The tutor is busy, please retry shortly")
+        with self._lock:
+            self.active += 1
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def run(self, func, timeout=None):
+        """Return func() run under a slot, raising RequestTimeout if it takes over timeout seconds."""
+        self.acquire()
+        try:
+            future = self._executor.submit(func)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                self.request_timeouts += 1
+            raise RequestTimeout(f"The model did not answer within {timeout:g} seconds")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'active': self.active,
+                'waiting': self.waiting,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'queue_timeouts': self.queue_timeouts,
+                'request_timeouts': self.request_timeouts,
+            }
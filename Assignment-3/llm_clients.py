@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+MODEL_NAME = 'models/gemini-1.5-flash'
+
+
+def key_digest(api_key):
+    """SHA-256 hex digest of an API key, so it can be told apart without being kept."""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+class ClientPool:
+    """Bounded, expiring in-memory pool of API clients, one per API key.
+
+    Clients are looked up by the SHA-256 digest of their key and are never
+    written anywhere. A client unused for ttl seconds is dropped, and the
+    least recently used one goes once more than max_clients keys are live,
+    so a key does not stay in memory much longer than its student is active.
+    """
+
+    def __init__(self, factory, max_clients=32, ttl=900):
+        self.factory = factory
+        self.max_clients = max_clients
+        self.ttl = ttl
+        self._clients = OrderedDict()     # digest -> (expires, client)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def get(self, api_key):
+        """The client for api_key, creating it on first use."""
+        digest = key_digest(api_key)
+        with self._lock:
+            self._evict()
+            entry = self._clients.get(digest)
+            if entry is not None:
+                self._clients[digest] = (time.monotonic() + self.ttl, entry[1])
+                self._clients.move_to_end(digest)
+                self.reused += 1
+                return entry[1]
+
+        # Build outside the lock; if two requests race, the later client wins and both work
+        client = self.factory(api_key)
+        with self._lock:
+            self._clients[digest] = (time.monotonic() + self.ttl, client)
+            self._clients.move_to_end(digest)
+            self.created += 1
+            self._evict()
+        return client
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self):
+        with self._lock:
+            self._evict()
+            return {'clients': len(self._clients), 'created': self.created, 'reused': self.reused}
+
+    def _evict(self):
+        # Caller holds the lock; entries are kept least recently used first
+        now = time.monotonic()
+        while self._clients:
+            digest, (expires, _) = next(iter(self._clients.items()))
+            if expires > now and len(self._clients) <= self.max_clients:
+                break
+            del self._clients[digest]
+
+
+class LLMBackend:
+    """Interface the app talks to, so a stub model can stand in for Gemini.
+
+    generate() returns the whole answer to a prompt and stream() yields it in
+    pieces; both get the student's API key, which a backend may ignore.
+    """
+
+    def generate(self, api_key, prompt):
+        raise NotImplementedError
+
+    def stream(self, api_key, prompt):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class GeminiBackend(LLMBackend):
+    """Gemini over per-key pooled clients, so concurrent students never share global API state."""
+
+    def __init__(self, model_name=MODEL_NAME, max_clients=32, ttl=900, timeout=None):
+        self.model_name = model_name
+        self.timeout = timeout
+        self.pool = ClientPool(self._make_client, max_clients, ttl)
+
+    @staticmethod
+    def _make_client(api_key):
+        import google.ai.generativelanguage as glm
+        return glm.GenerativeServiceClient(client_options={'api_key': api_key})
+
+    def _request(self, prompt):
+        import google.ai.generativelanguage as glm
+        return glm.GenerateContentRequest(
+            model=self.model_name,
+            contents=[glm.Content(role='user', parts=[glm.Part(text=prompt)])],
+        )
+
+    def _options(self):
+        # A deadline on the RPC itself, so a hung call does not hold a worker forever
+        return {'timeout': self.timeout} if self.timeout else {}
+
+    @staticmethod
+    def _text(response):
+        if not response.candidates:
+            raise ValueError(f"The model returned no answer: {response.prompt_feedback}")
+        return ''.join(part.text for part in response.candidates[0].content.parts)
+
+    def generate(self, api_key, prompt):
+        """The full answer to prompt."""
+        response = self.pool.get(api_key).generate_content(self._request(prompt), **self._options())
+        return self._text(response)
+
+    def stream(self, api_key, prompt):
+        """Yield pieces of the answer as the model produces them."""
+        client = self.pool.get(api_key)
+        for response in client.stream_generate_content(self._request(prompt), **self._options()):
+            text = self._text(response)
+            if text:
+                yield text
+
+    def stats(self):
+        return self.pool.stats()
+
+
+class FakeBackend(LLMBackend):
+    """Offline stand-in for Gemini that answers word by word, for tests and load tests.
+
+    first_token_delay and token_delay (seconds) mimic model latency, so
+    time-to-first-byte and concurrency can be measured without an API key.
+    """
+
+    def __init__(self, first_token_delay=0.0, token_delay=0.0, words=40):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.words = words
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, api_key, prompt):
+        return ''.join(self.stream(api_key, prompt))
+
+    def stream(self, api_key, prompt):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.first_token_delay)
+        answer = f"Fake answer from {len(prompt)} characters of prompt."
+        words = (answer.split() * self.words)[:self.words]
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            yield word if i == 0 else ' ' + word
+
+    def stats(self):
+        return {'calls': self.calls}
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Load test for /ask against a local fake LLM with injected latency
+
+Starts the app on a threaded local server with the offline fake backend (or
+targets --url), fires --students simultaneous questions and reports status
+codes, latency percentiles and throughput. No API key or network needed.
+
+Usage: python load_test.py [--students N] [--latency S] [--max-concurrent N] [--max-queue N] [--stream]
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+sys.path.append('.')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def start_local_server(args):
+    """Serve the app in this process with a fake LLM, returning its base URL."""
+    from werkzeug.serving import make_server
+
+    import app
+    from answer_cache import AnswerCache
+    from concurrency import ConcurrencyLimiter
+    from llm_clients import FakeBackend
+
+    app.llm_backend = FakeBackend(first_token_delay=args.latency, token_delay=args.token_delay, words=20)
+    app.llm_limiter = ConcurrencyLimiter(args.max_concurrent, args.max_queue, args.queue_timeout)
+    app.answer_cache = AnswerCache(max_entries=0)
+    app.LLM_TIMEOUT = args.timeout
+    app.notes_index.update(app.notes_corpus)
+
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    # Let every student connect at once rather than overflowing the default backlog of 128
+    server.socket.listen(max(args.students, 128))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+def ask(url, path, student, results, first_bytes, start_barrier):
+    body = json.dumps({'api_key': 'load-test', 'question': f'What is a tensor? ({student})',
+                       'cache': False}).encode()
+    request = urllib.request.Request(url + path, data=body, headers={'Content-Type': 'application/json'})
+    start_barrier.wait()
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            first_bytes.append(time.perf_counter() - start)
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception as e:
+        status = type(e).__name__
+    results.append((status, time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url', help='test a running server instead of a local one (its own backend is used)')
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=1.0, help='fake model time to first token, seconds')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='fake model delay per token, seconds')
+    parser.add_argument('--max-concurrent', type=int, default=16)
+    parser.add_argument('--max-queue', type=int, default=64)
+    parser.add_argument('--queue-timeout', type=float, default=10.0)
+    parser.add_argument('--timeout', type=float, default=60.0, help='per-request model timeout, seconds')
+    parser.add_argument('--stream', action='store_true', help='use /ask/stream instead of /ask')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        url, server = start_local_server(args)
+
+    path = '/ask/stream' if args.stream else '/ask'
+    results = []
+    first_bytes = []
+    start_barrier = threading.Barrier(args.students + 1)
+    threads = [threading.Thread(target=ask, args=(url, path, i, results, first_bytes, start_barrier))
+               for i in range(args.students)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for status, _ in results)
+    ok = [seconds for status, seconds in results if status == 200]
+    refused = [seconds for status, seconds in results if status != 200]
+    print(f"{args.students} students -> {path} (max {args.max_concurrent} concurrent, queue {args.max_queue}, "
+          f"fake latency {args.latency:g}s)")
+    print(f"status codes: {dict(sorted(statuses.items(), key=str))}")
+    print(f"answered:     p50 {percentile(ok, 0.5):.2f}s  p95 {percentile(ok, 0.95):.2f}s  "
+          f"max {max(ok, default=0):.2f}s")
+    if args.stream:
+        print(f"first byte:   p50 {percentile(first_bytes, 0.5):.2f}s  p95 {percentile(first_bytes, 0.95):.2f}s")
+    print(f"refused:      p50 {percentile(refused, 0.5) * 1000:.0f}ms  max {max(refused, default=0) * 1000:.0f}ms")
+    print(f"throughput:   {len(ok) / elapsed:.1f} answers/s over {elapsed:.2f}s")
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Streaming reader for Jupyter notebooks that keeps only cell sources.
+
+json.load() materializes every cell's outputs (base64 plots, long training
+logs) just so the caller can throw them away. This reader walks the JSON a
+chunk at a time instead: it decodes each cell's "cell_type" and "source",
+and steps over everything else by scanning for quotes and brackets without
+building any objects. Memory per file stays around one chunk plus the
+largest single source, however large the outputs are.
+"""
+
+import json
+import re
+
+CHUNK_SIZE = 256 * 1024     # Characters read from the file at a time
+WHITESPACE = ' \t\n\r'
+
+# A run of anything but brackets, with complete strings (brackets inside them
+# included) swallowed whole, so a skipped log of thousands of lines is one match
+_PLAIN_RUN = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+_LITERAL_END = re.compile(r'[,}\]\s]')
+
+
+class _Reader:
+    """Forward-only JSON scanner over a text file, forgetting what it has consumed."""
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.hold = None     # Start of a value being captured, kept across refills
+
+    def _fill(self):
+        data = self.file.read(self.chunk_size)
+        if not data:
+            raise ValueError("Unexpected end of notebook")
+        keep = self.pos if self.hold is None else self.hold
+        self.buf = self.buf[keep:] + data
+        self.pos -= keep
+        if self.hold is not None:
+            self.hold = 0
+
+    def peek(self):
+        """The next non-whitespace character, without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            self._fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in notebook, found '{self.buf[self.pos]}'")
+        self.pos += 1
+
+    def skip_string(self):
+        # At the opening quote
+        self.pos += 1
+        while True:
+            end = self.buf.find('"', self.pos)
+            if end == -1:
+                # Keep any trailing backslashes: they may escape the next chunk's first quote
+                trailing = len(self.buf) - len(self.buf.rstrip('\\'))
+                self.pos = len(self.buf) - trailing
+                self._fill()
+                continue
+            backslashes = 0
+            while end - 1 - backslashes >= 0 and self.buf[end - 1 - backslashes] == '\\':
+                backslashes += 1
+            self.pos = end + 1
+            if backslashes % 2 == 0:
+                return
+
+    def skip_value(self):
+        """Step over the next value without decoding it."""
+        char = self.peek()
+        if char == '"':
+            self.skip_string()
+        elif char in '{[':
+            depth = 0
+            while True:
+                self.pos = _PLAIN_RUN.match(self.buf, self.pos).end()
+                if self.pos == len(self.buf):
+                    self._fill()
+                    continue
+                char = self.buf[self.pos]
+                if char == '"':
+                    # A string running past the end of the buffer
+                    self.skip_string()
+                    continue
+                self.pos += 1
+                depth += 1 if char in '{[' else -1
+                if depth == 0:
+                    return
+        else:
+            # Number, true, false or null
+            while True:
+                match = _LITERAL_END.search(self.buf, self.pos)
+                if match is not None:
+                    self.pos = match.start()
+                    return
+                self.pos = len(self.buf)
+                try:
+                    self._fill()
+                except ValueError:
+                    return
+
+    def read_value(self):
+        """Decode the next value."""
+        self.peek()
+        self.hold = self.pos
+        try:
+            self.skip_value()
+            return json.loads(self.buf[self.hold:self.pos])
+        finally:
+            self.hold = None
+
+    def iter_object(self):
+        """Yield each key of the next object; the caller must consume its value before continuing."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise ValueError("Expected a key in notebook object")
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or '}}' in notebook, found '{char}'")
+
+    def iter_array(self):
+        """Yield once per element of the next array; the caller must consume each element."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Expected ',' or ']' in notebook, found '{char}'")
+
+
+def iter_cells(file_path, chunk_size=CHUNK_SIZE):
+    """Yield (cell_type, source) for every cell of a notebook, skipping outputs and metadata.
+
+    source is returned as stored: a list of lines or a single string.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        reader = _Reader(file, chunk_size)
+        for key in reader.iter_object():
+            if key != 'cells':
+                reader.skip_value()
+                continue
+            for _ in reader.iter_array():
+                if reader.peek() != '{':
+                    reader.skip_value()
+                    continue
+                cell_type = None
+                source = []
+                for cell_key in reader.iter_object():
+                    if cell_key == 'cell_type':
+                        cell_type = reader.read_value()
+                    elif cell_key == 'source':
+                        source = reader.read_value()
+                    else:
+                        reader.skip_value()
+                yield cell_type, source
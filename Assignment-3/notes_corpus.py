@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from notebook_stream import iter_cells
+
+logger = logging.getLogger(__name__)
+
+# Read in this order, as read_notes_files always has: text, notebooks, then the rest
+NOTE_EXTENSIONS = ('.txt', '.ipynb', '.md', '.py', '.js', '.html', '.css', '.json')
+
+
+def read_text_file(file_path):
+    """Stripped contents of a plain text note, as a single section."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        content = file.read().strip()
+    return [content] if content else []
+
+
+def read_notebook(file_path):
+    """Stripped markdown and code cell sources of a Jupyter notebook, one section per cell.
+
+    Outputs are skipped while streaming through the file, never loaded.
+    """
+    notebook_text = []
+    for cell_type, source in iter_cells(file_path):
+        if cell_type == 'markdown' or cell_type == 'code':
+            if isinstance(source, list):
+                cell_text = ''.join(source)
+            else:
+                cell_text = str(source)
+            if cell_text.strip():
+                notebook_text.append(cell_text.strip())
+    return notebook_text
+
+
+class NotesCorpus:
+    """In-memory copy of the notes directory, kept in step with the files on disk.
+
+    refresh() walks the directory once, compares each note's size and mtime
+    with what it read last time, and re-reads only files that were added or
+    changed; deleted files are dropped. Whenever anything changed, version
+    goes up by one, so callers can key caches on it. Calls within
+    refresh_interval seconds of the last walk reuse it without touching disk.
+    Changed files are read on up to read_workers threads at once.
+    """
+
+    def __init__(self, notes_dir, refresh_interval=2.0, extensions=NOTE_EXTENSIONS, read_workers=4):
+        self.notes_dir = Path(notes_dir)
+        self.refresh_interval = refresh_interval
+        self.extensions = tuple(extensions)
+        self.read_workers = read_workers
+        self.version = 0
+        self._files = {}       # path -> (size, mtime_ns, sections, or None if unreadable)
+        self._text = None
+        self._last_refresh = None
+        self._lock = threading.Lock()
+
+    @property
+    def exists(self):
+        return self.notes_dir.is_dir()
+
+    def refresh(self, force=False):
+        """Re-read added or changed notes; return True if the corpus changed."""
+        with self._lock:
+            now = time.monotonic()
+            if (not force and self._last_refresh is not None
+                    and now - self._last_refresh < self.refresh_interval):
+                return False
+            self._last_refresh = now
+
+            seen = {}
+            for file_path in self._scan():
+                try:
+                    stat = file_path.stat()
+                except OSError:
+                    continue
+                seen[file_path] = (stat.st_size, stat.st_mtime_ns)
+
+            changed = False
+            for file_path in list(self._files):
+                if file_path not in seen:
+                    del self._files[file_path]
+                    changed = True
+
+            stale = [file_path for file_path, stamp in seen.items()
+                     if file_path not in self._files or self._files[file_path][:2] != stamp]
+            if len(stale) > 1 and self.read_workers > 1:
+                with ThreadPoolExecutor(max_workers=min(self.read_workers, len(stale))) as executor:
+                    contents = list(executor.map(self._read, stale))
+            else:
+                contents = [self._read(file_path) for file_path in stale]
+            for file_path, sections in zip(stale, contents):
+                self._files[file_path] = seen[file_path] + (sections,)
+                changed = True
+
+            if changed:
+                self.version += 1
+                self._text = None
+            return changed
+
+    def text(self):
+        """Every readable note as 'File: <name>' sections, refreshing first if due."""
+        self.refresh()
+        with self._lock:
+            if self._text is None:
+                order = {ext: i for i, ext in enumerate(self.extensions)}
+                paths = sorted(self._files, key=lambda path: (order[path.suffix], str(path)))
+                sections = []
+                for path in paths:
+                    if self._files[path][2]:
+                        content = '\n\n'.join(self._files[path][2])
+                        sections.append(f"File: {path.name}\n{content}\n")
+                self._text = "\n".join(sections)
+            return self._text
+
+    def files(self):
+        """Snapshot of the readable notes as {path: (size, mtime_ns, sections)}, refreshing first if due.
+
+        A notebook has one section per cell; other files are a single section.
+        """
+        self.refresh()
+        with self._lock:
+            return {path: entry for path, entry in self._files.items() if entry[2]}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'files': len(self._files),
+                'readable_files': sum(1 for entry in self._files.values() if entry[2]),
+                'characters': sum(len(section) for entry in self._files.values() if entry[2]
+                                  for section in entry[2]),
+            }
+
+    def _scan(self):
+        # One walk of the tree instead of one rglob per extension
+        if not self.exists:
+            return
+        for root, _, names in os.walk(self.notes_dir):
+            for name in names:
+                if os.path.splitext(name)[1] in self.extensions:
+                    yield Path(root) / name
+
+    def _read(self, file_path):
+        try:
+            if file_path.suffix == '.ipynb':
+                return read_notebook(file_path)
+            return read_text_file(file_path)
+        except Exception as e:
+            # Remember the failure so the file is retried only once it changes
+            logger.error(f"Error reading file {file_path}: {e}")
+            return None
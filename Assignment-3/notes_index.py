@@ -0,0 +1,217 @@
+import math
+import re
+import threading
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9_]+')
+HEADING_PATTERN = re.compile(r'#{1,6}\s')
+
+# Question words that say nothing about the topic; Python keywords such as
+# "is", "in" and "for" are kept, since they are topics in these notes
+QUERY_STOPWORDS = frozenset((
+    'a', 'an', 'the', 'of', 'to', 'what', 'whats', 'how', 'why', 'when', 'which', 'who', 'does', 'do',
+    'can', 'could', 'would', 'should', 'you', 'i', 'me', 'my', 'we', 'please', 'explain', 'tell',
+    'about', 'difference', 'between', 'example', 'give', 'show', 'mean', 'means',
+))
+
+# Markdown-like notes are also split at their headings, not just between files
+HEADED_EXTENSIONS = ('.md', '.txt')
+
+
+def tokenize(text):
+    """Lower-cased word and identifier tokens, with a plural 's' dropped so "lists" finds "list"."""
+    return [token[:-1] if len(token) > 3 and token.endswith('s') and not token.endswith('ss') else token
+            for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+def estimate_tokens(text):
+    """Rough model token count: about four characters per token for English and code."""
+    return max(1, len(text) // 4)
+
+
+def _split_long(text, max_chars):
+    """Split text longer than max_chars at paragraph, then line, boundaries."""
+    if len(text) <= max_chars:
+        return [text]
+    for separator in ('\n\n', '\n'):
+        parts = text.split(separator)
+        if len(parts) > 1:
+            break
+    else:
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+    pieces = []
+    current = ''
+    for part in parts:
+        candidate = f'{current}{separator}{part}' if current else part
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        if len(part) > max_chars:
+            pieces.extend(_split_long(part, max_chars))
+            current = ''
+        else:
+            current = part
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_sections(sections, max_chars=1200, split_headings=False):
+    """Pack note sections (notebook cells, or whole files) into chunks of up to max_chars.
+
+    Chunks always end at a section boundary and a new one starts at every
+    section that opens with a heading; with split_headings, each section is
+    first cut before its heading lines too. Sections longer than max_chars are
+    split at blank lines, then at line breaks.
+    """
+    pieces = []
+    for section in sections:
+        parts = re.split(r'\n(?=#{1,6}\s)', section) if split_headings else [section]
+        for part in parts:
+            pieces.extend(_split_long(part.strip(), max_chars))
+
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        if not piece:
+            continue
+        if current and (HEADING_PATTERN.match(piece) or size + len(piece) > max_chars):
+            chunks.append('\n\n'.join(current))
+            current = []
+            size = 0
+        current.append(piece)
+        size += len(piece) + 2
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+class Chunk:
+    """One retrievable piece of a note"""
+
+    def __init__(self, chunk_id, path, text):
+        self.chunk_id = chunk_id
+        self.path = path
+        self.text = text
+        self.term_counts = Counter(tokenize(text))
+        self.length = sum(self.term_counts.values())
+        self.tokens = estimate_tokens(text)
+
+    @property
+    def name(self):
+        return self.path.name
+
+
+class NotesIndex:
+    """BM25 index over chunks of the notes corpus, updated file by file.
+
+    update() compares the corpus against what was last indexed and only
+    re-chunks files whose size or mtime changed, so editing one note costs
+    one file's worth of work. build_context() returns the best-scoring chunks
+    for a question that fit in a token budget.
+    """
+
+    def __init__(self, max_chunk_chars=1200, k1=1.5, b=0.75):
+        self.max_chunk_chars = max_chunk_chars
+        self.k1 = k1
+        self.b = b
+        self.version = None     # Corpus version last indexed
+        self._files = {}        # path -> ((size, mtime_ns), [Chunk])
+        self._postings = {}     # term -> {chunk_id: term count}
+        self._chunks = {}       # chunk_id -> Chunk
+        self._total_length = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def update(self, corpus):
+        """Re-index the files of corpus that changed since the last update; return True if any did."""
+        corpus.refresh()
+        if corpus.version == self.version:
+            return False
+        # Read the version before the files: a refresh in between only causes a redundant re-diff
+        version = corpus.version
+        files = corpus.files()
+
+        with self._lock:
+            for path in [path for path in self._files if path not in files]:
+                self._remove_file(path)
+            for path, (size, mtime, sections) in files.items():
+                known = self._files.get(path)
+                if known is not None and known[0] == (size, mtime):
+                    continue
+                if known is not None:
+                    self._remove_file(path)
+                self._add_file(path, (size, mtime), sections)
+            self.version = version
+        return True
+
+    def search(self, query, top_k=8):
+        """[(score, Chunk)] for the top_k chunks sharing at least one term with query, best first."""
+        terms = set(tokenize(query)) - QUERY_STOPWORDS
+        with self._lock:
+            count = len(self._chunks)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, term_count in postings.items():
+                    length = self._chunks[chunk_id].length
+                    norm = term_count + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[chunk_id] += idf * term_count * (self.k1 + 1) / norm
+            return [(score, self._chunks[chunk_id]) for chunk_id, score in scores.most_common(top_k)]
+
+    def build_context(self, query, top_k=8, token_budget=3000):
+        """Prompt context from the best chunks for query whose estimated tokens fit token_budget."""
+        sections = []
+        used = 0
+        for _, chunk in self.search(query, top_k):
+            if used + chunk.tokens > token_budget:
+                continue
+            sections.append(f"File: {chunk.name}\n{chunk.text}\n")
+            used += chunk.tokens
+        return "\n".join(sections)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'files': len(self._files),
+                'chunks': len(self._chunks),
+                'terms': len(self._postings),
+            }
+
+    def _add_file(self, path, stamp, sections):
+        # Caller holds the lock
+        texts = chunk_sections(sections, self.max_chunk_chars,
+                               split_headings=path.suffix in HEADED_EXTENSIONS)
+        chunks = []
+        for text in texts:
+            chunk = Chunk(self._next_id, path, text)
+            self._next_id += 1
+            self._chunks[chunk.chunk_id] = chunk
+            self._total_length += chunk.length
+            for term, term_count in chunk.term_counts.items():
+                self._postings.setdefault(term, {})[chunk.chunk_id] = term_count
+            chunks.append(chunk)
+        self._files[path] = (stamp, chunks)
+
+    def _remove_file(self, path):
+        # Caller holds the lock
+        _, chunks = self._files.pop(path)
+        for chunk in chunks:
+            del self._chunks[chunk.chunk_id]
+            self._total_length -= chunk.length
+            for term in chunk.term_counts:
+                postings = self._postings[term]
+                del postings[chunk.chunk_id]
+                if not postings:
+                    del self._postings[term]
@@ -3,14 +3,25 @@
 Simple test script to verify the application functionality
 """
 
+import json
 import os
 import sys
+import tempfile
+import threading
+import time
 from pathlib import Path
 
 # Add current directory to path
 sys.path.append('.')
 
+import app
 from app import read_notes_files
+from answer_cache import AnswerCache, answer_key
+from concurrency import ConcurrencyLimiter, QueueTimeout, RequestTimeout, Saturated
+from llm_clients import ClientPool, FakeBackend, LLMBackend
+from notebook_stream import iter_cells
+from notes_corpus import NotesCorpus
+from notes_index import NotesIndex, chunk_sections, estimate_tokens
 
 def test_notes_reading():
     """Test if notes files are being read correctly."""
@@ -46,11 +57,262 @@ def test_notes_reading():
         print(f"❌ Error reading notes: {e}")
         return False
 
+def test_corpus_cache():
+    """Test that the notes corpus only re-reads changed files."""
+    print("Testing incremental notes corpus...")
+    
+    with tempfile.TemporaryDirectory() as notes_dir:
+        notes = Path(notes_dir)
+        (notes / "a.txt").write_text("first note")
+        (notes / "b.ipynb").write_text(json.dumps({"cells": [
+            {"cell_type": "markdown", "source": ["# Title"]},
+            {"cell_type": "code", "source": "x = 1", "outputs": [{"text": "ignored"}]},
+        ]}))
+        
+        corpus = NotesCorpus(notes_dir, refresh_interval=0)
+        text = corpus.text()
+        assert corpus.version == 1
+        assert text == "File: a.txt\nfirst note\n\nFile: b.ipynb\n# Title\n\nx = 1\n"
+        
+        # Nothing changed: same version, no re-read
+        assert not corpus.refresh()
+        assert corpus.text() is text
+        
+        # Edit, add and delete each bump the version once
+        (notes / "a.txt").write_text("first note, edited")
+        assert corpus.refresh() and corpus.version == 2
+        (notes / "c.md").write_text("# More")
+        assert corpus.refresh() and corpus.version == 3
+        (notes / "b.ipynb").unlink()
+        assert corpus.refresh() and corpus.version == 4
+        assert corpus.text() == "File: a.txt\nfirst note, edited\n\nFile: c.md\n# More\n"
+        
+        # Within the refresh interval the disk is not checked at all
+        throttled = NotesCorpus(notes_dir, refresh_interval=3600)
+        throttled.refresh()
+        (notes / "d.txt").write_text("late")
+        assert not throttled.refresh() and throttled.stats()['files'] == 2
+    
+    print("✅ Notes corpus only re-reads changed files")
+    return True
+
+def test_streaming_notebook_reader():
+    """Test that the streaming notebook reader matches json.load while skipping outputs."""
+    print("Testing streaming notebook reader...")
+    
+    cells = [
+        {"cell_type": "markdown", "metadata": {"tags": ["a]b", "{c"]}, "source": ["# Say \"hi\"\n", "C:\\path\\"]},
+        {"cell_type": "code", "execution_count": 3, "metadata": {}, "source": "print('}{')",
+         "outputs": [{"output_type": "stream", "text": [f"line {i} \\\"]\n" for i in range(500)]},
+                     {"data": {"image/png": "iVBOR" * 4000, "text/plain": ["<Figure>"]}}]},
+        {"cell_type": "raw", "source": []},
+    ]
+    with tempfile.TemporaryDirectory() as notes_dir:
+        path = Path(notes_dir) / "n.ipynb"
+        path.write_text(json.dumps({"metadata": {"kernelspec": {}}, "cells": cells, "nbformat": 4}, indent=1))
+        expected = [(cell["cell_type"], cell["source"]) for cell in cells]
+        # Tiny chunks put strings, escapes and brackets across refills
+        for chunk_size in (1, 2, 7, 64, 1 << 20):
+            assert list(iter_cells(path, chunk_size)) == expected, chunk_size
+    
+    print("✅ Streaming reader matches json.load")
+    return True
+
+def test_retrieval():
+    """Test that only relevant chunks within the token budget reach the prompt."""
+    print("Testing chunked retrieval...")
+    
+    # Chunks break at headings and never exceed the size limit
+    chunks = chunk_sections(["intro", "# Lists\nappend adds items", "x = [1]", "# Dicts\nkeys map to values"],
+                            max_chars=100)
+    assert chunks == ["intro", "# Lists\nappend adds items\n\nx = [1]", "# Dicts\nkeys map to values"]
+    long_cell = "\n\n".join(f"paragraph {i} " + "word " * 20 for i in range(10))
+    assert all(len(chunk) <= 200 for chunk in chunk_sections([long_cell], max_chars=200))
+    
+    with tempfile.TemporaryDirectory() as notes_dir:
+        notes = Path(notes_dir)
+        (notes / "python.md").write_text("# Lists\nLists are mutable sequences.\n\n# Tuples\nTuples are immutable.")
+        (notes / "torch.txt").write_text("# Tensors\nMove tensors to the GPU with .to('cuda').")
+        
+        corpus = NotesCorpus(notes_dir, refresh_interval=0)
+        index = NotesIndex()
+        assert index.update(corpus) and not index.update(corpus)
+        assert index.stats()['chunks'] == 3
+        
+        context = index.build_context("How do I move a tensor to the GPU?")
+        assert context.startswith("File: torch.txt") and "Lists" not in context
+        assert "Tuples are immutable" in index.build_context("are tuples immutable?", top_k=1)
+        assert index.build_context("tensor", token_budget=1) == ""
+        
+        # Editing one file re-indexes just that file
+        (notes / "torch.txt").write_text("# Autograd\nbackward() fills .grad")
+        assert index.update(corpus)
+        assert index.build_context("tensor GPU") == ""
+        assert "backward" in index.build_context("autograd")
+    
+    # The shipped notes shrink to the budget
+    index = NotesIndex()
+    index.update(NotesCorpus("notes"))
+    context = index.build_context("How do tensors move to the GPU?", token_budget=3000)
+    assert 0 < estimate_tokens(context) <= 3000 < estimate_tokens(read_notes_files())
+    
+    print("✅ Retrieval sends only relevant chunks")
+    return True
+
+def test_client_pool_and_streaming():
+    """Test per-key client reuse and the streaming /ask/stream endpoint."""
+    print("Testing pooled clients and streaming answers...")
+    
+    made = []
+    pool = ClientPool(lambda key: made.append(key) or object(), max_clients=2, ttl=60)
+    first = pool.get("key-a")
+    assert pool.get("key-a") is first and made == ["key-a"]
+    pool.get("key-b")
+    pool.get("key-c")
+    # Bounded: the least recently used key was dropped and is rebuilt on return
+    assert pool.stats()['clients'] == 2
+    assert pool.get("key-a") is not first and made == ["key-a", "key-b", "key-c", "key-a"]
+    expired = ClientPool(lambda key: object(), ttl=0)
+    expired.get("key-a")
+    assert expired.stats()['clients'] == 0
+    
+    saved = app.llm_backend
+    app.llm_backend = FakeBackend(words=5)
+    try:
+        client = app.app.test_client()
+        response = client.post('/ask/stream', json={'api_key': 'k', 'question': 'What is a tensor?'})
+        assert response.mimetype == 'text/event-stream'
+        events = response.get_data(as_text=True).strip().split('\n\n')
+        texts = [json.loads(event[len('data: '):])['text'] for event in events[:-1]]
+        assert len(texts) == 5 and ''.join(texts).startswith("Fake answer from")
+        assert events[-1] == 'event: done\ndata: {"cached": false}'
+        assert client.post('/ask/stream', json={'question': 'x'}).status_code == 400
+        
+        # Skip the cache the stream just filled, so this really goes to the backend
+        answer = client.post('/ask', json={'api_key': 'k', 'question': 'What is a tensor?', 'cache': False}).get_json()
+        assert answer['success'] and not answer['cached'] and answer['response'] == ''.join(texts)
+    finally:
+        app.llm_backend = saved
+    
+    print("✅ Clients are pooled and answers stream")
+    return True
+
+class StubBackend(LLMBackend):
+    """Local stand-in model that counts how often it is asked."""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def generate(self, api_key, prompt):
+        self.calls += 1
+        return f"answer {self.calls}"
+    
+    def stream(self, api_key, prompt):
+        yield self.generate(api_key, prompt)
+
+def test_answer_cache():
+    """Test that repeated questions are answered from the cache."""
+    print("Testing answer cache...")
+    
+    # Keys ignore case, spacing and trailing punctuation, but not role or notes version
+    key = answer_key("What is a receptive field?", "teacher", 1)
+    assert key == answer_key("  what is a RECEPTIVE   field ", "teacher", 1)
+    assert key != answer_key("What is a receptive field?", "quizzer", 1)
+    assert key != answer_key("What is a receptive field?", "teacher", 2)
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = AnswerCache(ttl=60, max_entries=1, disk_dir=cache_dir)
+        cache.put(key, "cached answer")
+        cache.put("b" * 64, "other answer")
+        # Evicted from memory by the LRU bound, but still on disk
+        assert cache.get(key) == "cached answer" and cache.stats()['disk_hits'] == 1
+        assert AnswerCache(disk_dir=cache_dir).get(key) == "cached answer"
+    expired = AnswerCache(ttl=0)
+    expired.put(key, "stale")
+    assert expired.get(key) is None
+    
+    stub = StubBackend()
+    saved_backend, saved_cache = app.llm_backend, app.answer_cache
+    app.llm_backend = stub
+    app.answer_cache = AnswerCache()
+    try:
+        client = app.app.test_client()
+        ask = lambda question, api_key='k', **extra: client.post(
+            '/ask', json=dict(api_key=api_key, question=question, **extra)).get_json()
+        
+        assert ask("What is a tensor?") == {'success': True, 'response': 'answer 1', 'cached': False}
+        assert ask("what is a tensor") == {'success': True, 'response': 'answer 1', 'cached': True}
+        # The quizzer opts out by default, and any request can
+        assert ask("What is a tensor?", bot_role="quizzer")['cached'] is False
+        assert ask("What is a tensor?", cache=False)['response'] == 'answer 3'
+        # Entries belong to the key that paid for them; another key asks the model
+        assert ask("What is a tensor?", api_key='other') == {'success': True, 'response': 'answer 4',
+                                                              'cached': False}
+        assert stub.calls == 4
+        assert client.get('/cache/stats').get_json()['hits'] == 1
+    finally:
+        app.llm_backend, app.answer_cache = saved_backend, saved_cache
+    
+    print("✅ Repeated questions come from the cache")
+    return True
+
+def test_backpressure():
+    """Test that a saturated model pool refuses quickly instead of piling up."""
+    print("Testing concurrency limits...")
+    
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    release = threading.Event()
+    holder = threading.Thread(target=limiter.run, args=(release.wait,))
+    holder.start()
+    while limiter.stats()['active'] == 0:
+        time.sleep(0.001)
+    
+    # One slot busy: a second caller queues and times out, and a full queue refuses outright
+    try:
+        limiter.acquire()
+        assert False, "expected QueueTimeout"
+    except QueueTimeout:
+        pass
+    limiter.max_queue = 0
+    try:
+        limiter.acquire()
+        assert False, "expected Saturated"
+    except Saturated:
+        pass
+    
+    client = app.app.test_client()
+    saved = app.llm_limiter
+    app.llm_limiter = limiter
+    try:
+        for path in ('/ask', '/ask/stream'):
+            response = client.post(path, json={'api_key': 'k', 'question': 'Busy?', 'cache': False})
+            assert response.status_code == 429 and response.headers['Retry-After'] == '1'
+    finally:
+        app.llm_limiter = saved
+    release.set()
+    holder.join()
+    
+    # A call over the request timeout is abandoned, but keeps its slot until it really ends
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=0)
+    try:
+        limiter.run(lambda: time.sleep(0.2), timeout=0.01)
+        assert False, "expected RequestTimeout"
+    except RequestTimeout:
+        pass
+    assert limiter.stats()['active'] == 1
+    time.sleep(0.3)
+    assert limiter.stats()['active'] == 0 and limiter.stats()['request_timeouts'] == 1
+    
+    print("✅ Saturated requests are refused quickly")
+    return True
+
 if __name__ == "__main__":
     print("🧪 Testing AI Chatbot Application")
     print("=" * 40)
     
-    success = test_notes_reading()
+    success = (test_notes_reading() and test_corpus_cache() and test_streaming_notebook_reader()
+               and test_retrieval()
+               and test_client_pool_and_streaming() and test_answer_cache() and test_backpressure())
     
     if success:
         print("\n✅ All tests passed! The application should work correctly.")
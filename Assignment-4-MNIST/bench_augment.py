@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the notebook's per-image train transforms vs BatchAugment on whole batches
+
+Times augmenting the same digits both ways, in-process, and compares
+simple statistics of the results (mean intensity, ink fraction, ink centre
+spread) to check the batched version draws from the same distribution.
+
+Usage: python bench_augment.py [--data DIR] [--samples N] [--batch-size N]
+"""
+
+import argparse
+import sys
+import time
+
+import torch
+from PIL import Image
+
+sys.path.append('.')
+
+from bench_loading import load_digits, train_transforms
+from mnist_training import BatchAugment, TensorMNIST
+
+
+def summary(batch):
+    """Per-image statistics of a normalized batch, averaged: mean, ink fraction, ink centre spread."""
+    pixels = batch[:, 0] * 0.3081 + 0.1307
+    ink = pixels > 0.5
+    ys = torch.arange(pixels.shape[1], dtype=torch.float32)[:, None]
+    mass = pixels.sum(dim=(1, 2)).clamp(min=1e-6)
+    centre_y = (pixels * ys).sum(dim=(1, 2)) / mass
+    return {
+        'mean': pixels.mean().item(),
+        'ink': ink.float().mean().item(),
+        'centre_y_std': centre_y.std().item(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--data', default='../data', help='torchvision MNIST root, if downloaded')
+    parser.add_argument('--samples', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=48)
+    args = parser.parse_args()
+
+    images, targets, source = load_digits(args.data, args.samples)
+    dataset = TensorMNIST(images, targets)
+    print(f"{len(targets)} {source}, batch size {args.batch_size}, {torch.get_num_threads()} torch threads\n")
+
+    torch.manual_seed(0)
+    start = time.perf_counter()
+    per_image = torch.stack([train_transforms(Image.fromarray(image.numpy())) for image in images])
+    per_image_seconds = time.perf_counter() - start
+
+    augment = BatchAugment(seed=0)
+    batches = [dataset.batch(torch.arange(i, min(i + args.batch_size, len(dataset))))[0]
+               for i in range(0, len(dataset), args.batch_size)]
+    start = time.perf_counter()
+    batched = torch.cat([augment(batch) for batch in batches])
+    batched_seconds = time.perf_counter() - start
+
+    print(f"{'pipeline':<26} {'seconds':>8} {'samples/s':>10} {'per 60k epoch':>14}")
+    for name, seconds in (('PIL train transforms', per_image_seconds), ('BatchAugment', batched_seconds)):
+        print(f"{name:<26} {seconds:>8.3f} {len(dataset) / seconds:>10.0f} {seconds * 60000 / len(dataset):>13.1f}s")
+    print(f"speedup: {per_image_seconds / batched_seconds:.1f}x\n")
+
+    original = dataset.batch(torch.arange(len(dataset)))[0]
+    print(f"{'statistic':<14} {'original':>9} {'PIL':>9} {'batched':>9}")
+    stats = [summary(original), summary(per_image), summary(batched)]
+    for key in stats[0]:
+        print(f"{key:<14} " + ' '.join(f"{s[key]:>9.4f}" for s in stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark: epoch time and accuracy parity of the CPU training modes
+
+Trains Net from the same seed on the same data under each TrainingMode
+(fp32, channels_last, bf16 autocast and torch.compile on their own, then
+combined), each in its own process. Epoch 1 includes torch.compile's
+one-time compilation, so speedups are taken from the last epoch. Accuracy after epoch 1 is checked
+against the fp32 run, and against the README's 95% target when training on
+real MNIST. Exits non-zero if a mode falls outside the tolerance.
+
+Usage: python bench_fast.py [--modes fp32 bf16 ...] [--epochs N] [--samples N] [--tolerance POINTS]
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+sys.path.append('.')
+
+from mnist_training import (TRAINING_MODES, BatchAugment, BatchLoader, Net, fuse_for_inference, load_datasets,
+                            test, train)
+
+TARGET_ACCURACY = 95.0
+
+
+def run_mode(config):
+    """Train under one mode; returns epoch times and accuracy after the first epoch."""
+    torch.set_num_threads(config['threads'])
+    torch.manual_seed(config['seed'])
+    train_data, test_data, _ = load_datasets(config['data'], config['samples'], config['test_samples'])
+    train_loader = BatchLoader(train_data, config['batch_size'], shuffle=True, seed=config['seed'])
+    test_loader = BatchLoader(test_data, batch_size=1000)
+
+    mode = TRAINING_MODES[config['mode']]
+    model = mode.prepare(Net())
+    optimizer = optim.Adam(model.parameters(), lr=config['lr'])
+    criterion = nn.CrossEntropyLoss()
+    augment = BatchAugment(seed=config['seed'])
+
+    epoch_seconds = []
+    accuracy = None
+    for epoch in range(config['epochs']):
+        start = time.perf_counter()
+        train(model, 'cpu', train_loader, optimizer, criterion, augment, mode=mode)
+        epoch_seconds.append(time.perf_counter() - start)
+        if epoch == 0:
+            _, accuracy = test(model, 'cpu', test_loader, criterion, mode=mode)
+    return {'mode': config['mode'], 'epoch_seconds': epoch_seconds, 'accuracy': accuracy,
+            'samples_per_second': len(train_data) / epoch_seconds[-1]}
+
+
+def eval_throughput(config, repeat=5):
+    """Samples/s of inference for the plain, BatchNorm-folded and folded + bf16 model."""
+    torch.set_num_threads(config['threads'])
+    _, test_data, _ = load_datasets(config['data'], 1, config['test_samples'])
+    data = test_data.batch(torch.arange(len(test_data)))[0]
+    model = Net().eval()
+    fused = fuse_for_inference(model)
+
+    results = []
+    with torch.no_grad():
+        for name, net, dtype in (('fp32', model, None), ('folded BN', fused, None), ('folded BN + bf16', fused, torch.bfloat16)):
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                with torch.autocast('cpu', dtype=dtype, enabled=dtype is not None):
+                    net(data)
+                best = min(best, time.perf_counter() - start)
+            results.append((name, len(data) / best))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--modes', nargs='+', choices=list(TRAINING_MODES), default=list(TRAINING_MODES))
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--samples', type=int, default=None, help='training samples (default: all)')
+    parser.add_argument('--test-samples', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=48)
+    parser.add_argument('--lr', type=float, default=0.0055)
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--data', default='../data', help='torchvision MNIST root, if downloaded')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tolerance', type=float, default=1.0, help='allowed accuracy gap to fp32, in points')
+    args = parser.parse_args()
+
+    modes = ['fp32'] + [mode for mode in args.modes if mode != 'fp32']
+    _, _, source = load_datasets(args.data, 1, 1)
+    print(f"{source}, batch size {args.batch_size}, seed {args.seed}, {args.threads} torch thread(s)\n")
+
+    results = []
+    for mode in modes:
+        config = dict(vars(args), mode=mode)
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results.append(executor.submit(run_mode, config).result())
+
+    baseline = results[0]
+    ok = True
+    print(f"{'mode':<21} {'epoch 1 s':>9} {'last epoch s':>12} {'samples/s':>10} {'speedup':>8} "
+          f"{'acc % (ep 1)':>12} {'vs fp32':>8}")
+    for result in results:
+        gap = result['accuracy'] - baseline['accuracy']
+        parity = abs(gap) <= args.tolerance
+        if source == 'MNIST':
+            parity = parity and result['accuracy'] > TARGET_ACCURACY
+        ok = ok and parity
+        print(f"{result['mode']:<21} {result['epoch_seconds'][0]:>9.2f} {result['epoch_seconds'][-1]:>12.2f} "
+              f"{result['samples_per_second']:>10.0f} {baseline['epoch_seconds'][-1] / result['epoch_seconds'][-1]:>7.2f}x "
+              f"{result['accuracy']:>12.2f} {gap:>+7.2f}{'' if parity else '  FAIL'}")
+
+    print(f"\n{'inference':<18} {'samples/s':>10}")
+    for name, rate in eval_throughput(dict(vars(args))):
+        print(f"{name:<18} {rate:>10.0f}")
+
+    if not ok:
+        print(f"\nAccuracy parity failed (tolerance {args.tolerance} points"
+              f"{f', target {TARGET_ACCURACY}%' if source == 'MNIST' else ''})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: samples/second of the notebook's per-sample MNIST pipeline vs BatchLoader
+
+The notebook path decodes every digit into a PIL image and runs the
+transforms item by item in DataLoader workers. BatchLoader slices and
+normalizes whole batches of a TensorMNIST, held in memory or memory-mapped
+from an .npy cache. Uses real MNIST from --data when it is there, otherwise
+synthetic digits of the same shape.
+
+Usage: python bench_loading.py [--data DIR] [--samples N] [--batch-size N] [--workers N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import torch
+from PIL import Image
+from torchvision import transforms
+
+sys.path.append('.')
+
+from mnist_training import BatchLoader, TensorMNIST, save_npy, synthetic_mnist
+
+# The notebook's transforms
+train_transforms = transforms.Compose([
+    transforms.RandomApply([transforms.CenterCrop(22), ], p=0.1),
+    transforms.Resize((28, 28)),
+    transforms.RandomRotation((-15., 15.), fill=0),
+    transforms.ToTensor(),
+    transforms.Normalize((0.1307,), (0.3081,)),
+    ])
+
+test_transforms = transforms.Compose([
+    transforms.ToTensor(),
+    transforms.Normalize((0.1307,), (0.3081,))
+    ])
+
+
+class PILDigits(torch.utils.data.Dataset):
+    """What datasets.MNIST does per item: uint8 array -> PIL image -> transform."""
+
+    def __init__(self, images, targets, transform):
+        self.images = images
+        self.targets = targets
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __getitem__(self, index):
+        image = Image.fromarray(self.images[index].numpy())
+        return self.transform(image), int(self.targets[index])
+
+
+def load_digits(data_dir, samples):
+    raw_dir = os.path.join(data_dir, 'MNIST', 'raw')
+    if os.path.isdir(raw_dir):
+        from torchvision import datasets
+        mnist = datasets.MNIST(data_dir, train=True, download=False)
+        return mnist.data[:samples], mnist.targets[:samples], 'MNIST'
+    images, targets = synthetic_mnist(samples)
+    return images, targets, 'synthetic digits'
+
+
+def samples_per_second(loader, limit):
+    """Drain loader (up to limit samples) and return its throughput."""
+    start = time.perf_counter()
+    seen = 0
+    for data, _ in loader:
+        seen += len(data)
+        if seen >= limit:
+            break
+    return seen / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--data', default='../data', help='torchvision MNIST root, if downloaded')
+    parser.add_argument('--samples', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=48)
+    parser.add_argument('--workers', type=int, default=2, help='DataLoader workers for the PIL pipeline')
+    args = parser.parse_args()
+
+    images, targets, source = load_digits(args.data, args.samples)
+    print(f"{len(targets)} {source}, batch size {args.batch_size}, "
+          f"{torch.get_num_threads()} torch threads, {os.cpu_count()} CPUs\n")
+
+    results = []
+    for name, transform in (('PIL + train transforms', train_transforms),
+                            ('PIL + test transforms', test_transforms)):
+        loader = torch.utils.data.DataLoader(PILDigits(images, targets, transform), batch_size=args.batch_size,
+                                             shuffle=True, num_workers=args.workers)
+        results.append((name, samples_per_second(loader, args.samples)))
+
+    in_memory = TensorMNIST(images, targets)
+    results.append(('BatchLoader, uint8', samples_per_second(
+        BatchLoader(in_memory, args.batch_size, shuffle=True, seed=0), args.samples)))
+    normalized = TensorMNIST(images, targets, normalize_in_memory=True)
+    results.append(('BatchLoader, float32', samples_per_second(
+        BatchLoader(normalized, args.batch_size, shuffle=True, seed=0), args.samples)))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        image_path = os.path.join(cache_dir, 'images.npy')
+        target_path = os.path.join(cache_dir, 'targets.npy')
+        save_npy(images, targets, image_path, target_path)
+        mapped = TensorMNIST.from_npy(image_path, target_path)
+        results.append(('BatchLoader, memmap', samples_per_second(
+            BatchLoader(mapped, args.batch_size, shuffle=True, seed=0), args.samples)))
+
+    baseline = results[0][1]
+    print(f"{'loader':<24} {'samples/s':>10} {'speedup':>8}")
+    for name, rate in results:
+        print(f"{name:<24} {rate:>10.0f} {rate / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark: training throughput of Net variants, phase by phase, on equal footing
+
+Each configuration (channel depths, batch size) trains from the same seed on
+the same data in its own process, so peak memory is its own. Reports time
+per phase (data wait, augmentation, forward, backward, optimizer step,
+eval), training samples/second, peak RSS and test accuracy. Evaluation is
+on the test split, not the training one. With --trace, a few training steps
+of the first configuration are also recorded with torch.profiler and saved
+as a Chrome trace (open in chrome://tracing or Perfetto).
+
+Usage: python bench_training.py [--channels 32,32,48 16,16,32 ...] [--epochs N] [--samples N] [--trace FILE]
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+sys.path.append('.')
+
+from mnist_training import (BatchAugment, BatchLoader, Net, PhaseTimer, count_parameters, load_datasets,
+                            test, train)
+
+PHASES = ('data', 'augment', 'forward', 'backward', 'step', 'eval')
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_config(config):
+    """Train one configuration; returns a dict of its measurements."""
+    torch.set_num_threads(config['threads'])
+    torch.manual_seed(config['seed'])
+    train_data, test_data, _ = load_datasets(config['data'], config['samples'], config['test_samples'])
+    train_loader = BatchLoader(train_data, config['batch_size'], shuffle=True, seed=config['seed'])
+    test_loader = BatchLoader(test_data, batch_size=1000)
+
+    model = Net(*config['channels'])
+    optimizer = optim.Adam(model.parameters(), lr=config['lr'])
+    criterion = nn.CrossEntropyLoss()
+    augment = BatchAugment(seed=config['seed']) if config['augment'] else None
+    timer = PhaseTimer()
+
+    start = time.perf_counter()
+    for _ in range(config['epochs']):
+        train(model, 'cpu', train_loader, optimizer, criterion, augment, timer)
+    train_seconds = time.perf_counter() - start
+    _, accuracy = test(model, 'cpu', test_loader, criterion, timer)
+
+    return {
+        'channels': config['channels'],
+        'batch_size': config['batch_size'],
+        'params': count_parameters(model),
+        'train_seconds': train_seconds,
+        'samples_per_second': config['epochs'] * len(train_data) / train_seconds,
+        'phases': timer.seconds,
+        'accuracy': accuracy,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def export_trace(config, path, steps=20):
+    """Profile a few training steps of config and write a Chrome trace to path."""
+    torch.set_num_threads(config['threads'])
+    torch.manual_seed(config['seed'])
+    train_data, _, _ = load_datasets(config['data'], steps * config['batch_size'], 1)
+    loader = BatchLoader(train_data, config['batch_size'], shuffle=True, seed=config['seed'])
+    model = Net(*config['channels'])
+    optimizer = optim.Adam(model.parameters(), lr=config['lr'])
+    augment = BatchAugment(seed=config['seed']) if config['augment'] else None
+
+    # One unprofiled pass first, so one-time allocations stay out of the trace
+    train(model, 'cpu', loader, optimizer, nn.CrossEntropyLoss(), augment)
+    with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU],
+                                profile_memory=True) as profiler:
+        train(model, 'cpu', loader, optimizer, nn.CrossEntropyLoss(), augment, PhaseTimer(label=True))
+    profiler.export_chrome_trace(path)
+    print(profiler.key_averages().table(sort_by='self_cpu_time_total', row_limit=12))
+    print(f"Trace of {steps} steps written to {path}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--channels', nargs='+', default=['32,32,48'],
+                        help='channel depths of conv1,conv2,conv3, one configuration each')
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[48])
+    parser.add_argument('--epochs', type=int, default=1)
+    parser.add_argument('--samples', type=int, default=None, help='training samples (default: all)')
+    parser.add_argument('--test-samples', type=int, default=None)
+    parser.add_argument('--lr', type=float, default=0.0055)
+    parser.add_argument('--no-augment', action='store_true')
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads(), help='torch threads per run')
+    parser.add_argument('--data', default='../data', help='torchvision MNIST root, if downloaded')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--trace', help='write a torch.profiler Chrome trace of the first configuration here')
+    args = parser.parse_args()
+
+    configs = [{
+        'channels': tuple(int(depth) for depth in channels.split(',')),
+        'batch_size': batch_size,
+        'epochs': args.epochs,
+        'samples': args.samples,
+        'test_samples': args.test_samples,
+        'lr': args.lr,
+        'augment': not args.no_augment,
+        'threads': args.threads,
+        'data': args.data,
+        'seed': args.seed,
+    } for channels in args.channels for batch_size in args.batch_size]
+
+    _, _, source = load_datasets(args.data, 1, 1)
+    print(f"{source}, {args.epochs} epoch(s), {args.threads} torch thread(s) per run, {os.cpu_count()} CPUs\n")
+    if args.trace:
+        export_trace(configs[0], args.trace)
+
+    results = []
+    for config in configs:
+        # A fresh process per configuration keeps peak memory and allocator state separate
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            results.append(executor.submit(run_config, config).result())
+
+    print(f"{'channels':<12} {'batch':>5} {'params':>7} {'samples/s':>10} {'acc %':>6} {'peak MB':>8}  "
+          + ' '.join(f"{phase:>8}" for phase in PHASES))
+    for result in results:
+        phases = result['phases']
+        total = sum(phases.values())
+        shares = ' '.join(f"{100 * phases.get(phase, 0) / total:>7.1f}%" for phase in PHASES)
+        print(f"{','.join(map(str, result['channels'])):<12} {result['batch_size']:>5} {result['params']:>7} "
+              f"{result['samples_per_second']:>10.0f} {result['accuracy']:>6.2f} {result['peak_rss_mb']:>8.0f}  {shares}")
+
+
+if __name__ == "__main__":
+    main()
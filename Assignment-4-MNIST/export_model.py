@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Export a trained Net for serving: TorchScript, and optionally ONNX
+
+Loads weights from a checkpoint (train_ddp.py's, or a plain state_dict), or
+trains for --train-epochs when none is given. Then it folds BatchNorm where
+it can, traces the model and checks the export against the eager model.
+The visualizer app serves the result at /predict with DIGIT_MODEL=<output>.
+
+Usage: python export_model.py [--checkpoint PATH] [--output net.pt] [--onnx net.onnx] [--train-epochs N]
+"""
+
+import argparse
+import os
+import sys
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+sys.path.append('.')
+
+from mnist_training import (TRAINING_MODES, BatchAugment, BatchLoader, Net, count_parameters, fuse_for_inference,
+                            load_datasets, test, train)
+
+
+def export_torchscript(model, path):
+    """Trace an eval-mode model (any batch size works with this Net) and save it to path."""
+    example = torch.zeros(8, 1, 28, 28)
+    with torch.no_grad():
+        traced = torch.jit.trace(model.eval(), example)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    traced.save(path)
+    return traced
+
+
+def export_onnx(model, path):
+    """Write an ONNX graph with a dynamic batch dimension; needs the onnx package."""
+    torch.onnx.export(model.eval(), torch.zeros(1, 1, 28, 28), path, input_names=['digits'],
+                      output_names=['log_probabilities'], dynamic_axes={'digits': {0: 'batch'}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--checkpoint', help="train_ddp.py checkpoint or a Net state_dict")
+    parser.add_argument('--channels', default='32,32,48', help='channel depths the checkpoint was trained with')
+    parser.add_argument('--output', default='net.pt', help='TorchScript file to write')
+    parser.add_argument('--onnx', help='also write an ONNX file here')
+    parser.add_argument('--train-epochs', type=int, default=1, help='epochs to train when there is no checkpoint')
+    parser.add_argument('--samples', type=int, default=None, help='training samples when training here')
+    parser.add_argument('--data', default='../data', help='torchvision MNIST root, if downloaded')
+    args = parser.parse_args()
+
+    model = Net(*(int(depth) for depth in args.channels.split(',')))
+    train_data, test_data, source = load_datasets(args.data, args.samples, None)
+    if args.checkpoint:
+        state = torch.load(args.checkpoint, map_location='cpu')
+        model.load_state_dict(state.get('model', state))
+        print(f"Loaded {args.checkpoint}")
+    else:
+        torch.manual_seed(1)
+        mode = TRAINING_MODES['channels_last+bf16']
+        optimizer = optim.Adam(model.parameters(), lr=0.0055)
+        loader = BatchLoader(train_data, 48, shuffle=True, seed=1)
+        augment = BatchAugment(seed=1)
+        model = mode.prepare(model)
+        for epoch in range(args.train_epochs):
+            train(model, 'cpu', loader, optimizer, nn.CrossEntropyLoss(), augment, mode=mode)
+        print(f"Trained {args.train_epochs} epoch(s) on {len(train_data)} {source}")
+
+    test_loader = BatchLoader(test_data, batch_size=1000)
+    _, accuracy = test(model, 'cpu', test_loader, nn.CrossEntropyLoss())
+    fused = fuse_for_inference(model)
+    exported = export_torchscript(fused, args.output)
+
+    data = test_data.batch(torch.arange(min(500, len(test_data))))[0]
+    with torch.no_grad():
+        difference = (exported(data) - model.eval()(data)).abs().max().item()
+    print(f"{count_parameters(model)} parameters, {accuracy:.2f}% on {len(test_data)} test digits ({source})")
+    print(f"TorchScript written to {args.output} (max difference from eager {difference:.1e})")
+
+    if args.onnx:
+        try:
+            export_onnx(fused, args.onnx)
+            print(f"ONNX written to {args.onnx}")
+        except (ImportError, ModuleNotFoundError) as e:
+            print(f"ONNX export needs the onnx package: {e}")
+
+
+if __name__ == "__main__":
+    main()
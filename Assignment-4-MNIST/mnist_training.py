@@ -0,0 +1,456 @@
+"""
+Reusable training code for the MNIST Net from MNIST_Training.ipynb.
+
+The notebook's datasets.MNIST pipeline turns every sample into a PIL image
+and back into a tensor, one item at a time. TensorMNIST instead keeps all
+digits as a single uint8 tensor (or a memory-mapped .npy cache of one) and
+BatchLoader slices whole batches out of it, so each batch costs one indexing
+operation and one vectorized normalization.
+"""
+
+import contextlib
+import copy
+import math
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+MNIST_MEAN = 0.1307
+MNIST_STD = 0.3081
+
+
+class Net(nn.Module):
+    # Final architecture from the notebook: 24,154 parameters with the default depths
+    def __init__(self, channel_1_depth=32, channel_2_depth=32, channel_3_depth=48):
+        super(Net, self).__init__()
+        self.conv1 = nn.Conv2d(1, channel_1_depth, kernel_size=3)
+        self.conv2 = nn.Conv2d(channel_1_depth, channel_2_depth, kernel_size=3)
+        self.conv3 = nn.Conv2d(channel_2_depth, channel_3_depth, kernel_size=3)
+        # bn1 normalizes the pooled conv2 output, so it has conv2's depth (the notebook's
+        # equal depths hid this)
+        self.bn1 = nn.BatchNorm2d(channel_2_depth)
+        self.bn2 = nn.BatchNorm2d(channel_2_depth)
+        self.bn3 = nn.BatchNorm2d(channel_3_depth)
+        self.gap = nn.AdaptiveAvgPool2d(1)
+        self.fc1 = nn.Linear(channel_3_depth, 10)
+
+    def forward(self, x):
+        x = F.relu(self.conv1(x))
+        x = F.relu(self.bn1(F.max_pool2d(self.bn2(self.conv2(x)), 2)))
+        x = F.relu(self.conv3(x))
+        x = F.relu(self.bn3(F.max_pool2d(x, 2)))
+        x = self.gap(x)
+        x = torch.flatten(x, 1)
+        x = self.fc1(x)
+        return F.log_softmax(x, dim=1)
+
+
+def count_parameters(model):
+    return sum(p.numel() for p in model.parameters() if p.requires_grad)
+
+
+class TensorMNIST:
+    """All MNIST digits of one split as an N x 1 x 28 x 28 tensor, indexed a batch at a time.
+
+    images is uint8 (0-255), either a tensor or a read-only numpy memmap.
+    With normalize_in_memory=True they are converted once to normalized
+    float32 (4x the memory) so batches need no arithmetic at all.
+    """
+
+    def __init__(self, images, targets, normalize_in_memory=False):
+        if images.ndim == 3:
+            images = images[:, None]
+        if len(images) != len(targets):
+            raise ValueError(f"{len(images)} images but {len(targets)} targets")
+        self.targets = torch.as_tensor(np.asarray(targets), dtype=torch.long)
+        self.normalized = normalize_in_memory
+        if normalize_in_memory:
+            images = torch.as_tensor(np.asarray(images)).float().div_(255).sub_(MNIST_MEAN).div_(MNIST_STD)
+        self.images = images
+
+    def __len__(self):
+        return len(self.targets)
+
+    @property
+    def memory_mapped(self):
+        return isinstance(self.images, np.memmap)
+
+    def batch(self, indices):
+        """(data, target) for a 1-D LongTensor of indices, data normalized float32."""
+        if isinstance(self.images, np.ndarray):
+            # Sorted reads walk the memmap forwards; targets are reordered to match
+            indices, _ = torch.sort(indices)
+            data = torch.from_numpy(self.images[indices.numpy()])
+        else:
+            data = self.images[indices]
+        if not self.normalized:
+            data = data.float().div_(255).sub_(MNIST_MEAN).div_(MNIST_STD)
+        return data, self.targets[indices]
+
+    def head(self, count):
+        """The first count samples, sharing this dataset's storage."""
+        subset = copy.copy(self)
+        subset.images = self.images[:count]
+        subset.targets = self.targets[:count]
+        return subset
+
+    @classmethod
+    def from_torchvision(cls, root='../data', train=True, download=True, cache_dir=None, **kwargs):
+        """Load a split from torchvision's MNIST files, reading its raw tensors without any PIL decoding.
+
+        With cache_dir, the split is also saved there as .npy files on first use
+        and memory-mapped from them afterwards.
+        """
+        split = 'train' if train else 'test'
+        if cache_dir is not None:
+            image_path = os.path.join(cache_dir, f'mnist_{split}_images.npy')
+            target_path = os.path.join(cache_dir, f'mnist_{split}_targets.npy')
+            if os.path.exists(image_path) and os.path.exists(target_path):
+                return cls.from_npy(image_path, target_path, **kwargs)
+
+        from torchvision import datasets
+        mnist = datasets.MNIST(root, train=train, download=download)
+        dataset = cls(mnist.data, mnist.targets, **kwargs)
+        if cache_dir is not None:
+            save_npy(mnist.data, mnist.targets, image_path, target_path)
+        return dataset
+
+    @classmethod
+    def from_npy(cls, image_path, target_path, mmap=True, **kwargs):
+        """Load images and targets saved with save_npy, memory-mapping the images by default."""
+        images = np.load(image_path, mmap_mode='r' if mmap else None)
+        targets = np.load(target_path)
+        return cls(images, targets, **kwargs)
+
+
+def save_npy(images, targets, image_path, target_path):
+    """Write uint8 images and their targets as .npy files, atomically."""
+    os.makedirs(os.path.dirname(os.path.abspath(image_path)), exist_ok=True)
+    for path, array in ((image_path, images), (target_path, targets)):
+        tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+        np.save(tmp_path, np.asarray(array))
+        os.replace(tmp_path, path)
+
+
+def load_datasets(root='../data', train_samples=None, test_samples=None, cache_dir=None):
+    """(train, test, source): MNIST from root if it has been downloaded there, else synthetic digits.
+
+    train_samples and test_samples cut each split down to its first samples.
+    """
+    try:
+        train_data = TensorMNIST.from_torchvision(root, train=True, download=False, cache_dir=cache_dir)
+        test_data = TensorMNIST.from_torchvision(root, train=False, download=False, cache_dir=cache_dir)
+        source = 'MNIST'
+    except RuntimeError:
+        images, targets = synthetic_mnist((train_samples or 60000) + (test_samples or 10000))
+        split = train_samples or 60000
+        train_data = TensorMNIST(images[:split], targets[:split])
+        test_data = TensorMNIST(images[split:], targets[split:])
+        source = 'synthetic digits'
+    if train_samples:
+        train_data = train_data.head(train_samples)
+    if test_samples:
+        test_data = test_data.head(test_samples)
+    return train_data, test_data, source
+
+
+class BatchLoader:
+    """DataLoader replacement over a TensorMNIST that yields whole batches at once.
+
+    Shuffling draws one permutation per epoch from its own generator, so a
+    seed gives the same batches every run. len() is the number of batches and
+    .dataset is the TensorMNIST, like torch's DataLoader.
+
+    With world_size > 1 the loader only yields rank's shard of each epoch, like
+    DistributedSampler: every rank draws the same permutation (give them the
+    same seed) and takes every world_size-th sample of it, dropping the
+    remainder so all ranks run the same number of steps.
+    """
+
+    def __init__(self, dataset, batch_size=48, shuffle=False, drop_last=False, seed=None, rank=0, world_size=1):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.rank = rank
+        self.world_size = world_size
+        self.generator = torch.Generator()
+        if seed is not None:
+            self.generator.manual_seed(seed)
+        else:
+            self.generator.seed()
+
+    def shard_size(self):
+        return len(self.dataset) // self.world_size if self.world_size > 1 else len(self.dataset)
+
+    def __len__(self):
+        if self.drop_last:
+            return self.shard_size() // self.batch_size
+        return -(-self.shard_size() // self.batch_size)
+
+    def batch_sizes(self):
+        """Sizes of one epoch's batches, without loading them."""
+        sizes = [self.batch_size] * len(self)
+        if sizes and not self.drop_last:
+            sizes[-1] = self.shard_size() - (len(self) - 1) * self.batch_size
+        return sizes
+
+    def __iter__(self):
+        count = len(self.dataset)
+        if self.shuffle:
+            order = torch.randperm(count, generator=self.generator)
+        else:
+            order = torch.arange(count)
+        if self.world_size > 1:
+            order = order[self.rank:self.shard_size() * self.world_size:self.world_size]
+        for batch_idx in range(len(self)):
+            yield self.dataset.batch(order[batch_idx * self.batch_size:(batch_idx + 1) * self.batch_size])
+
+
+def synthetic_mnist(count, seed=0, size=28):
+    """MNIST-shaped (images, targets) of rendered digits, for offline tests and benchmarks.
+
+    Each digit is drawn in a font at a random size, offset and stroke width,
+    so a model can genuinely learn it, but it is no stand-in for MNIST accuracy.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = np.random.default_rng(seed)
+    fonts = [ImageFont.load_default(size=font_size) for font_size in (16, 18, 20, 22)]
+    targets = rng.integers(0, 10, count)
+    images = np.zeros((count, size, size), dtype=np.uint8)
+    for i, digit in enumerate(targets):
+        image = Image.new('L', (size, size))
+        draw = ImageDraw.Draw(image)
+        font = fonts[rng.integers(len(fonts))]
+        x, y = 8 + rng.integers(-3, 4), 3 + rng.integers(-3, 4)
+        draw.text((x, y), str(digit), fill=255, font=font, stroke_width=int(rng.integers(0, 2)), stroke_fill=255)
+        images[i] = np.asarray(image)
+    return torch.from_numpy(images), torch.from_numpy(targets)
+
+
+class BatchAugment:
+    """The notebook's train-time augmentation, applied to a whole normalized batch at once.
+
+    Matches RandomApply([CenterCrop(crop_size)], p=crop_p) + Resize(size) +
+    RandomRotation((-degrees, degrees), fill=0): each image gets a uniform
+    random angle and, with probability crop_p, a centre zoom of size/crop_size.
+    Both are folded into one affine grid per image and resampled in a single
+    grid_sample call, instead of two PIL resamplings per image. A seed makes
+    the draws reproducible; they come from the augmenter's own generator.
+    """
+
+    def __init__(self, degrees=15.0, crop_size=22, crop_p=0.1, size=28, mode='bilinear', seed=None):
+        self.degrees = degrees
+        self.crop_scale = crop_size / size
+        self.crop_p = crop_p
+        self.mode = mode
+        # Normalized value of a black pixel, the fill outside the rotated image
+        self.background = (0.0 - MNIST_MEAN) / MNIST_STD
+        self.generator = torch.Generator()
+        if seed is not None:
+            self.generator.manual_seed(seed)
+        else:
+            self.generator.seed()
+
+    def thetas(self, count):
+        """count x 2 x 3 affine matrices mapping output to input coordinates."""
+        angles = (torch.rand(count, generator=self.generator) * 2 - 1) * math.radians(self.degrees)
+        cropped = torch.rand(count, generator=self.generator) < self.crop_p
+        scale = torch.where(cropped, torch.tensor(self.crop_scale), torch.tensor(1.0))
+        cos, sin = torch.cos(angles) * scale, torch.sin(angles) * scale
+        zeros = torch.zeros(count)
+        # Positive angles turn the digit counter-clockwise, as in torchvision
+        return torch.stack([
+            torch.stack([cos, -sin, zeros], dim=1),
+            torch.stack([sin, cos, zeros], dim=1),
+        ], dim=1)
+
+    def skip(self, batch_sizes):
+        """Advance the generator as if batches of these sizes had been augmented, e.g. to resume training."""
+        for count in batch_sizes:
+            self.thetas(count)
+
+    def __call__(self, data):
+        theta = self.thetas(len(data)).to(device=data.device, dtype=data.dtype)
+        grid = F.affine_grid(theta, data.shape, align_corners=False)
+        # grid_sample pads with zeros, so shift the background to zero and back
+        out = F.grid_sample(data - self.background, grid, mode=self.mode,
+                            padding_mode='zeros', align_corners=False)
+        return out.add_(self.background)
+
+
+def GetCorrectPredCount(pPrediction, pLabels):
+    return pPrediction.argmax(dim=1).eq(pLabels).sum().item()
+
+
+class PhaseTimer:
+    """Wall time per training phase (data, augment, forward, backward, step, eval), summed over batches.
+
+    On CUDA the device is synchronized around each phase so asynchronous
+    kernels are charged to the phase that launched them; on CPU nothing
+    extra happens. With label=True each phase is also a torch.profiler
+    record_function range, so it shows up by name in profiler traces.
+    """
+
+    def __init__(self, device='cpu', label=False):
+        self.sync = torch.cuda.synchronize if torch.device(device).type == 'cuda' else None
+        self.label = label
+        self.seconds = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if self.sync:
+            self.sync()
+        start = time.perf_counter()
+        try:
+            if self.label:
+                with torch.profiler.record_function(name):
+                    yield
+            else:
+                yield
+        finally:
+            if self.sync:
+                self.sync()
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self):
+        return sum(self.seconds.values())
+
+
+def _no_phase(name):
+    return contextlib.nullcontext()
+
+
+class TrainingMode:
+    """How train() and test() run the model on CPU, beyond plain fp32.
+
+    channels_last stores activations NHWC, which oneDNN convolutions prefer;
+    bf16 runs the forward pass under CPU bfloat16 autocast (weights and
+    optimizer state stay fp32); compile wraps the model in torch.compile,
+    whose generated kernels also fuse the BatchNorm and ReLU elementwise work.
+    """
+
+    def __init__(self, channels_last=False, bf16=False, compile=False):
+        self.channels_last = channels_last
+        self.bf16 = bf16
+        self.compile = compile
+
+    def __repr__(self):
+        flags = [name for name in ('channels_last', 'bf16', 'compile') if getattr(self, name)]
+        return f"TrainingMode({', '.join(flags) or 'fp32'})"
+
+    def prepare(self, model):
+        """The model to hand to the optimizer's training loop; call before creating the optimizer."""
+        if self.channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        if self.compile:
+            model = torch.compile(model)
+        return model
+
+    def inputs(self, data):
+        if self.channels_last:
+            return data.contiguous(memory_format=torch.channels_last)
+        return data
+
+    def autocast(self, device):
+        if self.bf16:
+            return torch.autocast(device_type=torch.device(device).type, dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
+
+TRAINING_MODES = {
+    'fp32': TrainingMode(),
+    'channels_last': TrainingMode(channels_last=True),
+    'bf16': TrainingMode(bf16=True),
+    'compile': TrainingMode(compile=True),
+    'channels_last+bf16': TrainingMode(channels_last=True, bf16=True),
+    'channels_last+compile': TrainingMode(channels_last=True, compile=True),
+    'fast': TrainingMode(channels_last=True, bf16=True, compile=True),
+}
+
+
+def fuse_for_inference(model):
+    """An eval-mode copy of a Net with bn2 folded into conv2, the one BatchNorm right after a conv.
+
+    bn1 and bn3 follow a max pool, which an affine BatchNorm does not commute
+    with in general, so they stay as they are.
+    """
+    from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+    model = getattr(model, '_orig_mod', model)
+    fused = copy.deepcopy(model).eval()
+    fused.conv2 = fuse_conv_bn_eval(fused.conv2, fused.bn2)
+    fused.bn2 = nn.Identity()
+    return fused
+
+
+def train(model, device, train_loader, optimizer, criterion, augment=None, timer=None, mode=None):
+    """One epoch over train_loader; returns (average loss, accuracy %).
+
+    augment, e.g. a BatchAugment, is applied to each batch on the device.
+    Loss and correct counts are summed on the device and read once at the
+    end, rather than forcing a sync with .item() every batch. With a
+    PhaseTimer, time per phase is added to it. mode is a TrainingMode whose
+    prepare() has already been applied to model.
+    """
+    model.train()
+    phase = timer.phase if timer is not None else _no_phase
+    mode = mode or TRAINING_MODES['fp32']
+
+    train_loss = torch.zeros((), device=device)
+    correct = torch.zeros((), dtype=torch.long, device=device)
+    processed = 0
+
+    batches = iter(train_loader)
+    while True:
+        with phase('data'):
+            batch = next(batches, None)
+            if batch is not None:
+                data, target = batch[0].to(device), batch[1].to(device)
+        if batch is None:
+            break
+        if augment is not None:
+            with phase('augment'):
+                data = augment(data)
+
+        with phase('forward'):
+            optimizer.zero_grad()
+            with mode.autocast(device):
+                pred = model(mode.inputs(data))
+            loss = criterion(pred.float(), target)
+        with phase('backward'):
+            loss.backward()
+        with phase('step'):
+            optimizer.step()
+
+        train_loss += loss.detach()
+        correct += pred.detach().argmax(dim=1).eq(target).sum()
+        processed += len(data)
+
+    return train_loss.item() / len(train_loader), 100 * correct.item() / processed
+
+
+def test(model, device, test_loader, criterion, timer=None, mode=None):
+    """Evaluate on test_loader; returns (loss averaged per sample, accuracy %)."""
+    model.eval()
+    phase = timer.phase if timer is not None else _no_phase
+    mode = mode or TRAINING_MODES['fp32']
+
+    test_loss = torch.zeros((), device=device)
+    correct = torch.zeros((), dtype=torch.long, device=device)
+
+    with phase('eval'), torch.no_grad():
+        for data, target in test_loader:
+            data, target = data.to(device), target.to(device)
+            with mode.autocast(device):
+                output = model(mode.inputs(data))
+            # criterion averages over the batch; weight it so a short last batch counts per sample
+            test_loss += criterion(output.float(), target) * len(target)
+            correct += output.argmax(dim=1).eq(target).sum()
+
+    return test_loss.item() / len(test_loader.dataset), 100. * correct.item() / len(test_loader.dataset)
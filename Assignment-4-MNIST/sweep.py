@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Parallel hyperparameter sweep over Net channel depths, learning rate, batch size and StepLR settings
+
+Trials run concurrently in a process pool, each limited to --threads torch
+threads. Configurations over --max-params are skipped without training.
+After --prune-after training samples every trial is evaluated on a slice
+of the test split and stopped if it is below --prune-below, or below the
+median of the trials already checked after that same number of samples.
+Every trial's configuration, parameter count, accuracy, time and status
+goes into a SQLite results store (and optionally a CSV export), so sweeps
+can be compared and resumed.
+
+Usage: python sweep.py [--search grid|random] [--c1 16 24 32] [--c2 ...] [--c3 ...] [--lr 0.002 0.0055]
+                       [--batch-size 48 128] [--workers N] [--threads N] [--db sweeps.sqlite] [--csv out.csv]
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+sys.path.append('.')
+
+from mnist_training import (TRAINING_MODES, BatchAugment, BatchLoader, Net, count_parameters, load_datasets,
+                            test, train)
+
+SEARCH_KEYS = ('c1', 'c2', 'c3', 'lr', 'batch_size', 'step_size', 'gamma')
+CHECKPOINT_SAMPLES = 2000     # Test samples used for the pruning check
+
+
+class ResultsStore:
+    """SQLite table of trials, shared by the sweep's worker processes.
+
+    Each call opens its own short-lived connection, so it is safe from any
+    process; WAL mode lets trials write while others read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('''CREATE TABLE IF NOT EXISTS trials (
+                id INTEGER PRIMARY KEY,
+                sweep TEXT NOT NULL,
+                config TEXT NOT NULL,
+                params INTEGER,
+                status TEXT NOT NULL,
+                checkpoint_samples INTEGER,
+                checkpoint_accuracy REAL,
+                accuracy REAL,
+                seconds REAL,
+                started REAL,
+                finished REAL)''')
+            # Stores made before checkpoints were taken after a fixed sample count
+            columns = {row[1] for row in db.execute('PRAGMA table_info(trials)')}
+            if 'checkpoint_samples' not in columns:
+                db.execute('ALTER TABLE trials ADD COLUMN checkpoint_samples INTEGER')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def start(self, sweep, config, params):
+        with self._connect() as db:
+            cursor = db.execute('INSERT INTO trials (sweep, config, params, status, started) VALUES (?, ?, ?, ?, ?)',
+                                (sweep, json.dumps(config, sort_keys=True), params, 'running', time.time()))
+            return cursor.lastrowid
+
+    def checkpoint(self, trial_id, samples, accuracy):
+        with self._connect() as db:
+            db.execute('UPDATE trials SET checkpoint_samples = ?, checkpoint_accuracy = ? WHERE id = ?',
+                       (samples, accuracy, trial_id))
+
+    def checkpoint_accuracies(self, sweep, exclude_id, samples):
+        """Checkpoint accuracies of the other trials checked after the same number of training samples."""
+        with self._connect() as db:
+            rows = db.execute('SELECT checkpoint_accuracy FROM trials WHERE sweep = ? AND id != ? '
+                              'AND checkpoint_samples = ? AND checkpoint_accuracy IS NOT NULL',
+                              (sweep, exclude_id, samples)).fetchall()
+        return [row[0] for row in rows]
+
+    def finish(self, trial_id, status, accuracy=None, seconds=None):
+        with self._connect() as db:
+            db.execute('UPDATE trials SET status = ?, accuracy = ?, seconds = ?, finished = ? WHERE id = ?',
+                       (status, accuracy, seconds, time.time(), trial_id))
+
+    def done_configs(self, sweep):
+        """Configurations of this sweep that already ended, so a rerun can skip them; failed trials are retried."""
+        with self._connect() as db:
+            rows = db.execute("SELECT config FROM trials WHERE sweep = ? AND status IN ('complete', 'pruned', 'skipped')",
+                              (sweep,)).fetchall()
+        return {row[0] for row in rows}
+
+    def rows(self, sweep):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            rows = db.execute('SELECT * FROM trials WHERE sweep = ? ORDER BY id', (sweep,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def export_csv(self, sweep, path):
+        rows = self.rows(sweep)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', *SEARCH_KEYS, 'params', 'status', 'checkpoint_samples', 'checkpoint_accuracy',
+                             'accuracy', 'seconds'])
+            for row in rows:
+                config = json.loads(row['config'])
+                writer.writerow([row['id'], *(config.get(key) for key in SEARCH_KEYS), row['params'], row['status'],
+                                 row['checkpoint_samples'], row['checkpoint_accuracy'], row['accuracy'],
+                                 row['seconds']])
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def search_space(args):
+    """Trial configurations: the full grid, or --trials random picks from it."""
+    choices = {'c1': args.c1, 'c2': args.c2, 'c3': args.c3, 'lr': args.lr, 'batch_size': args.batch_size,
+               'step_size': args.step_size, 'gamma': args.gamma}
+    if args.search == 'grid':
+        return [dict(zip(SEARCH_KEYS, values)) for values in itertools.product(*(choices[key] for key in SEARCH_KEYS))]
+    rng = random.Random(args.seed)
+    configs = []
+    seen = set()
+    # Stop early if the space holds fewer distinct configurations than --trials
+    for _ in range(args.trials * 20):
+        config = {key: rng.choice(choices[key]) for key in SEARCH_KEYS}
+        key = json.dumps(config, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+        if len(configs) == args.trials:
+            break
+    return configs
+
+
+class _Steps:
+    """Loader view of the next count batches of a running epoch, so one epoch can be trained in parts."""
+
+    def __init__(self, batches, count, dataset):
+        self.batches = batches
+        self.count = count
+        self.dataset = dataset
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return itertools.islice(self.batches, self.count)
+
+
+_datasets = {}
+
+
+def _load(settings):
+    # Once per worker process, not once per trial
+    key = (settings['data'], settings['samples'], settings['test_samples'])
+    if key not in _datasets:
+        _datasets[key] = load_datasets(*key)
+    return _datasets[key]
+
+
+def _init_worker(threads):
+    torch.set_num_threads(threads)
+
+
+def run_trial(config, settings):
+    """Train one configuration, pruning it at the checkpoint if it lags; returns its final row."""
+    store = ResultsStore(settings['db'])
+    model = Net(config['c1'], config['c2'], config['c3'])
+    params = count_parameters(model)
+    trial_id = store.start(settings['sweep'], config, params)
+    if params > settings['max_params']:
+        store.finish(trial_id, 'skipped')
+        return {'id': trial_id, 'config': config, 'params': params, 'status': 'skipped'}
+
+    try:
+        torch.manual_seed(settings['seed'])
+        train_data, test_data, _ = _load(settings)
+        train_loader = BatchLoader(train_data, config['batch_size'], shuffle=True, seed=settings['seed'])
+        checkpoint_loader = BatchLoader(test_data.head(CHECKPOINT_SAMPLES), batch_size=1000)
+        test_loader = BatchLoader(test_data, batch_size=1000)
+
+        mode = TRAINING_MODES[settings['mode']]
+        model = mode.prepare(model)
+        optimizer = optim.Adam(model.parameters(), lr=config['lr'])
+        scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=config['step_size'], gamma=config['gamma'])
+        criterion = nn.CrossEntropyLoss()
+        augment = BatchAugment(seed=settings['seed']) if settings['augment'] else None
+        # Every trial is checked after the same number of samples (rounded up to a
+        # whole batch), whatever its batch size or the size of the training set
+        prune_after = settings['prune_after']
+        checkpoint_step = -(-prune_after // config['batch_size']) if prune_after else None
+
+        start = time.perf_counter()
+        step = 0
+        for epoch in range(settings['epochs']):
+            steps = len(train_loader)
+            if checkpoint_step is not None and step < checkpoint_step <= step + steps:
+                batches = iter(train_loader)
+                first = checkpoint_step - step
+                train(model, 'cpu', _Steps(batches, first, train_data), optimizer, criterion, augment, mode=mode)
+
+                _, accuracy = test(model, 'cpu', checkpoint_loader, criterion, mode=mode)
+                others = store.checkpoint_accuracies(settings['sweep'], trial_id, prune_after)
+                store.checkpoint(trial_id, prune_after, accuracy)
+                lagging = len(others) >= settings['prune_min_trials'] and accuracy < median(others)
+                if accuracy < settings['prune_below'] or lagging:
+                    seconds = time.perf_counter() - start
+                    store.finish(trial_id, 'pruned', accuracy, seconds)
+                    return {'id': trial_id, 'config': config, 'params': params, 'status': 'pruned',
+                            'accuracy': accuracy, 'seconds': seconds}
+
+                if steps > first:
+                    train(model, 'cpu', _Steps(batches, steps - first, train_data), optimizer, criterion, augment,
+                          mode=mode)
+            else:
+                train(model, 'cpu', train_loader, optimizer, criterion, augment, mode=mode)
+            step += steps
+            scheduler.step()
+
+        _, accuracy = test(model, 'cpu', test_loader, criterion, mode=mode)
+        seconds = time.perf_counter() - start
+    except Exception:
+        store.finish(trial_id, 'failed')
+        raise
+    store.finish(trial_id, 'complete', accuracy, seconds)
+    return {'id': trial_id, 'config': config, 'params': params, 'status': 'complete',
+            'accuracy': accuracy, 'seconds': seconds}
+
+
+def describe(config):
+    return (f"{config['c1']},{config['c2']},{config['c3']} lr={config['lr']:g} batch={config['batch_size']} "
+            f"step={config['step_size']} gamma={config['gamma']:g}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--search', choices=('grid', 'random'), default='grid')
+    parser.add_argument('--trials', type=int, default=20, help='configurations to draw with --search random')
+    parser.add_argument('--c1', type=int, nargs='+', default=[16, 24, 32], help='conv1 channel depths')
+    parser.add_argument('--c2', type=int, nargs='+', default=[16, 32], help='conv2 channel depths')
+    parser.add_argument('--c3', type=int, nargs='+', default=[32, 48], help='conv3 channel depths')
+    parser.add_argument('--lr', type=float, nargs='+', default=[0.002, 0.0055])
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[48, 128])
+    parser.add_argument('--step-size', type=int, nargs='+', default=[15])
+    parser.add_argument('--gamma', type=float, nargs='+', default=[0.1])
+    parser.add_argument('--epochs', type=int, default=1)
+    parser.add_argument('--max-params', type=int, default=25000, help='skip configurations above this size')
+    parser.add_argument('--prune-after', type=int, default=10000,
+                        help='training samples before the checkpoint (0: no pruning)')
+    parser.add_argument('--prune-below', type=float, default=0.0,
+                        help='also prune below this checkpoint accuracy (0: median only)')
+    parser.add_argument('--prune-min-trials', type=int, default=3,
+                        help='checkpointed trials needed before pruning below their median')
+    parser.add_argument('--workers', type=int, default=None, help='concurrent trials (default: CPUs / threads)')
+    parser.add_argument('--threads', type=int, default=1, help='torch threads per trial')
+    parser.add_argument('--mode', choices=list(TRAINING_MODES), default='fp32')
+    parser.add_argument('--no-augment', action='store_true')
+    parser.add_argument('--samples', type=int, default=None, help='training samples (default: all)')
+    parser.add_argument('--test-samples', type=int, default=None)
+    parser.add_argument('--data', default='../data', help='torchvision MNIST root, if downloaded')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', default='sweeps.sqlite', help='SQLite results store')
+    parser.add_argument('--sweep', default=None, help='sweep name in the store (default: a timestamp)')
+    parser.add_argument('--csv', help='also export this sweep\'s trials to a CSV file')
+    args = parser.parse_args()
+
+    sweep = args.sweep or time.strftime('sweep-%Y%m%d-%H%M%S')
+    workers = args.workers or max(1, (os.cpu_count() or 1) // args.threads)
+    store = ResultsStore(args.db)
+    done = store.done_configs(sweep)
+    configs = [config for config in search_space(args) if json.dumps(config, sort_keys=True) not in done]
+    settings = {
+        'db': args.db, 'sweep': sweep, 'seed': args.seed, 'epochs': args.epochs, 'mode': args.mode,
+        'augment': not args.no_augment, 'max_params': args.max_params, 'prune_after': args.prune_after,
+        'prune_below': args.prune_below, 'prune_min_trials': args.prune_min_trials,
+        'data': args.data, 'samples': args.samples, 'test_samples': args.test_samples,
+    }
+    print(f"Sweep {sweep}: {len(configs)} trials ({len(done)} already done), {workers} workers x "
+          f"{args.threads} thread(s), results in {args.db}\n")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(args.threads,)) as executor:
+        futures = [executor.submit(run_trial, config, settings) for config in configs]
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  trial failed: {e}")
+                continue
+            accuracy = f"{result['accuracy']:.2f}%" if result.get('accuracy') is not None else '-'
+            seconds = f"{result['seconds']:.1f}s" if result.get('seconds') is not None else '-'
+            print(f"  #{result['id']:<4} {result['status']:<9} {describe(result['config']):<48} "
+                  f"{result['params']:>6} params  {accuracy:>7}  {seconds:>7}", flush=True)
+    wall = time.perf_counter() - start
+
+    rows = store.rows(sweep)
+    counts = {status: sum(row['status'] == status for row in rows)
+              for status in ('complete', 'pruned', 'skipped', 'failed')}
+    print(f"\n{wall:.0f} s wall time: " + ', '.join(f"{count} {status}" for status, count in counts.items()))
+    best = sorted((row for row in rows if row['status'] == 'complete'), key=lambda row: -row['accuracy'])[:5]
+    if best:
+        print(f"\nBest under {args.max_params} parameters:")
+        for row in best:
+            print(f"  {describe(json.loads(row['config'])):<48} {row['params']:>6} params  {row['accuracy']:.2f}%")
+    if args.csv:
+        store.export_csv(sweep, args.csv)
+        print(f"\nTrials written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Tests for the MNIST training module
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from PIL import Image
+from torchvision import transforms
+from torchvision.transforms import functional as TF
+
+# Add current directory to path
+sys.path.append('.')
+
+import mnist_training
+import sweep
+from mnist_training import (TRAINING_MODES, BatchAugment, BatchLoader, Net, PhaseTimer, TensorMNIST,
+                            count_parameters, fuse_for_inference, save_npy, synthetic_mnist)
+
+def test_net_parameters():
+    """The default Net is the notebook's final model, under the 25k-parameter limit."""
+    print("Testing Net parameter count...")
+    assert count_parameters(Net()) == 24154
+    assert Net()(torch.zeros(2, 1, 28, 28)).shape == (2, 10)
+    # Unequal depths, as the sweep tries them
+    assert Net(16, 32, 24)(torch.zeros(2, 1, 28, 28)).shape == (2, 10)
+    print("✅ Net has 24,154 parameters")
+
+def test_tensor_dataset_matches_transforms():
+    """Batches equal the notebook's ToTensor + Normalize output, from memory, float and memmap storage."""
+    print("Testing TensorMNIST batches...")
+    images, targets = synthetic_mnist(50, seed=1)
+    to_tensor = transforms.Compose([transforms.ToTensor(), transforms.Normalize((0.1307,), (0.3081,))])
+    indices = torch.tensor([7, 3, 41, 0])
+    expected = torch.stack([to_tensor(Image.fromarray(images[i].numpy())) for i in indices])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        image_path = os.path.join(cache_dir, 'images.npy')
+        target_path = os.path.join(cache_dir, 'targets.npy')
+        save_npy(images, targets, image_path, target_path)
+        mapped = TensorMNIST.from_npy(image_path, target_path)
+        assert mapped.memory_mapped
+
+        for dataset in (TensorMNIST(images, targets), TensorMNIST(images, targets, normalize_in_memory=True), mapped):
+            data, target = dataset.batch(indices)
+            # The memmap reads in sorted index order, with targets kept alongside
+            order = torch.argsort(indices) if dataset.memory_mapped else torch.arange(len(indices))
+            assert torch.allclose(data, expected[order], atol=1e-6)
+            assert torch.equal(target, targets[indices[order]])
+            assert data.dtype == torch.float32 and data.shape == (4, 1, 28, 28)
+    print("✅ TensorMNIST batches match the per-sample transforms")
+
+def test_batch_loader():
+    """Every sample comes once per epoch; the same seed gives the same batches."""
+    print("Testing BatchLoader...")
+    images, targets = synthetic_mnist(100, seed=2)
+    dataset = TensorMNIST(images, targets)
+
+    loader = BatchLoader(dataset, batch_size=32, shuffle=True, seed=5)
+    assert len(loader) == 4 and len(BatchLoader(dataset, 32, drop_last=True)) == 3
+    batches = list(loader)
+    assert [len(data) for data, _ in batches] == [32, 32, 32, 4] == loader.batch_sizes()
+    assert BatchLoader(dataset, 32, drop_last=True).batch_sizes() == [32, 32, 32]
+    seen = torch.cat([data for data, _ in batches]).flatten(1)
+    assert torch.equal(seen.sort(dim=0).values, dataset.batch(torch.arange(100))[0].flatten(1).sort(dim=0).values)
+
+    again = list(BatchLoader(dataset, batch_size=32, shuffle=True, seed=5))
+    assert all(torch.equal(a[1], b[1]) for a, b in zip(batches, again))
+    # A second epoch is shuffled differently
+    assert not all(torch.equal(a[1], b[1]) for a, b in zip(batches, loader))
+
+    # Ranks get disjoint, equal shards of the same permutation
+    shards = [[target for _, target in BatchLoader(dataset, 16, shuffle=True, seed=5, rank=rank, world_size=3)]
+              for rank in range(3)]
+    assert [len(shard) for shard in shards] == [3, 3, 3]
+    indices = torch.randperm(100, generator=torch.Generator().manual_seed(5))[:99]
+    for rank, shard in enumerate(shards):
+        assert torch.equal(torch.cat(shard), targets[indices[rank::3]])
+    print("✅ BatchLoader covers each sample once and is reproducible")
+
+def test_batch_augment():
+    """Batched augmentation is seeded and matches torchvision's rotation and crop-and-resize."""
+    print("Testing BatchAugment...")
+    images, targets = synthetic_mnist(64, seed=4)
+    data = TensorMNIST(images, targets).batch(torch.arange(64))[0]
+
+    assert torch.equal(BatchAugment(seed=3)(data), BatchAugment(seed=3)(data))
+    assert not torch.equal(BatchAugment(seed=3)(data), BatchAugment(seed=4)(data))
+    assert torch.allclose(BatchAugment(degrees=0, crop_p=0)(data), data, atol=1e-5)
+
+    # Skipping batches leaves the generator where augmenting them would, so a resumed run continues the same draws
+    trained = BatchAugment(seed=3)
+    for count in [32, 32, 7]:
+        trained(data[:count])
+    resumed = BatchAugment(seed=3)
+    resumed.skip([32, 32, 7])
+    assert torch.equal(resumed(data), trained(data))
+
+    # Same angles as torchvision's rotate, in the same direction
+    augment = BatchAugment(crop_p=0, seed=0)
+    theta = BatchAugment(crop_p=0, seed=0).thetas(len(data))
+    angles = torch.rad2deg(torch.atan2(theta[:, 1, 0], theta[:, 0, 0]))
+    rotated = augment(data)
+    for i in range(4):
+        expected = TF.rotate(data[i], angles[i].item(), interpolation=TF.InterpolationMode.BILINEAR,
+                             fill=augment.background)
+        assert (rotated[i] - expected).abs().mean() < 0.02
+
+    # The crop is CenterCrop(22) + Resize(28)
+    cropped = BatchAugment(degrees=0, crop_p=1)(data)
+    expected = TF.resize(TF.center_crop(data, 22), [28, 28], antialias=True)
+    assert (cropped - expected).abs().mean() < 0.01
+    print("✅ BatchAugment matches the per-image transforms")
+
+def test_training_learns():
+    """A couple of epochs on synthetic digits gets well above chance."""
+    print("Testing training loop...")
+    torch.manual_seed(0)
+    images, targets = synthetic_mnist(2000, seed=3)
+    train_loader = BatchLoader(TensorMNIST(images[:1600], targets[:1600]), batch_size=48, shuffle=True, seed=0)
+    test_loader = BatchLoader(TensorMNIST(images[1600:], targets[1600:]), batch_size=200)
+
+    model = Net()
+    optimizer = optim.Adam(model.parameters(), lr=0.0055)
+    criterion = nn.CrossEntropyLoss()
+    augment = BatchAugment(seed=0)
+    for _ in range(2):
+        train_loss, train_accuracy = mnist_training.train(model, 'cpu', train_loader, optimizer, criterion, augment)
+    test_loss, test_accuracy = mnist_training.test(model, 'cpu', test_loader, criterion)
+    print(f"📊 train {train_accuracy:.1f}%, test {test_accuracy:.1f}%")
+    assert test_accuracy > 60
+    # The loss is averaged per sample, so batching (with a short last batch) does not change it
+    uneven_loss, _ = mnist_training.test(model, 'cpu', BatchLoader(test_loader.dataset, batch_size=150), criterion)
+    assert abs(uneven_loss - test_loss) < 1e-4 * test_loss
+    print("✅ Training loop learns")
+
+def test_phase_timer():
+    """A timed epoch records every phase and gives the same results as an untimed one."""
+    print("Testing PhaseTimer...")
+    images, targets = synthetic_mnist(300, seed=5)
+    dataset = TensorMNIST(images, targets)
+    criterion = nn.CrossEntropyLoss()
+
+    results = []
+    for timer in (None, PhaseTimer()):
+        torch.manual_seed(0)
+        model = Net()
+        optimizer = optim.Adam(model.parameters(), lr=0.0055)
+        loader = BatchLoader(dataset, batch_size=48, shuffle=True, seed=0)
+        results.append(mnist_training.train(model, 'cpu', loader, optimizer, criterion, BatchAugment(seed=0), timer)
+                       + mnist_training.test(model, 'cpu', BatchLoader(dataset, 100), criterion, timer))
+    assert results[0] == results[1]
+    assert set(timer.seconds) == {'data', 'augment', 'forward', 'backward', 'step', 'eval'}
+    assert all(seconds > 0 for seconds in timer.seconds.values())
+    print(f"📊 {', '.join(f'{name} {seconds:.3f}s' for name, seconds in timer.seconds.items())}")
+    print("✅ PhaseTimer covers each phase without changing results")
+
+def test_training_modes():
+    """channels_last and bf16 train to the same place as fp32; folding BatchNorm keeps outputs."""
+    print("Testing training modes...")
+    images, targets = synthetic_mnist(1200, seed=6)
+    train_data, test_data = TensorMNIST(images[:1000], targets[:1000]), TensorMNIST(images[1000:], targets[1000:])
+    criterion = nn.CrossEntropyLoss()
+
+    accuracies = {}
+    for name in ('fp32', 'channels_last', 'bf16'):
+        mode = TRAINING_MODES[name]
+        torch.manual_seed(0)
+        model = mode.prepare(Net())
+        optimizer = optim.Adam(model.parameters(), lr=0.0055)
+        for _ in range(2):
+            mnist_training.train(model, 'cpu', BatchLoader(train_data, 48, shuffle=True, seed=0), optimizer,
+                                 criterion, mode=mode)
+        accuracies[name] = mnist_training.test(model, 'cpu', BatchLoader(test_data, 100), criterion, mode=mode)[1]
+    print(f"📊 {accuracies}")
+    assert all(abs(accuracy - accuracies['fp32']) <= 5 for accuracy in accuracies.values())
+
+    data = test_data.batch(torch.arange(50))[0]
+    fused = fuse_for_inference(model)
+    model.eval()
+    assert isinstance(fused.bn2, nn.Identity)
+    assert torch.allclose(fused(data), model(data), atol=1e-4)
+    print("✅ Training modes agree with fp32")
+
+def test_sweep_trials():
+    """Sweep trials are skipped over the parameter limit, pruned when lagging and recorded in SQLite."""
+    print("Testing sweep runner...")
+    with tempfile.TemporaryDirectory() as results_dir:
+        settings = {
+            'db': os.path.join(results_dir, 'sweeps.sqlite'), 'sweep': 'test', 'seed': 1, 'epochs': 1,
+            'mode': 'fp32', 'augment': True, 'max_params': 25000, 'prune_after': 240, 'prune_below': 0.0,
+            'prune_min_trials': 3, 'data': results_dir, 'samples': 480, 'test_samples': 100,
+        }
+        small = {'c1': 8, 'c2': 8, 'c3': 16, 'lr': 0.0055, 'batch_size': 48, 'step_size': 15, 'gamma': 0.1}
+        large = dict(small, c1=64, c2=64, c3=64)
+
+        assert sweep.run_trial(large, settings)['status'] == 'skipped'
+        assert sweep.run_trial(small, settings)['status'] == 'complete'
+        assert sweep.run_trial(small, dict(settings, prune_below=101.0))['status'] == 'pruned'
+
+        store = sweep.ResultsStore(settings['db'])
+        rows = store.rows('test')
+        assert [row['status'] for row in rows] == ['skipped', 'complete', 'pruned']
+        assert rows[1]['params'] == count_parameters(Net(8, 8, 16)) and rows[1]['accuracy'] is not None
+        assert len(store.done_configs('test')) == 2
+        # Checkpoints are only compared with trials checked after as many samples
+        assert rows[1]['checkpoint_samples'] == 240
+        assert len(store.checkpoint_accuracies('test', rows[0]['id'], 240)) == 2
+        assert store.checkpoint_accuracies('test', rows[0]['id'], 480) == []
+
+        # A crashed trial is not done, so a rerun retries it
+        crashed = dict(small, lr=0.001)
+        store.finish(store.start('test', crashed, 0), 'failed')
+        assert json.dumps(crashed, sort_keys=True) not in store.done_configs('test')
+
+        csv_path = os.path.join(results_dir, 'trials.csv')
+        store.export_csv('test', csv_path)
+        with open(csv_path) as f:
+            assert len(f.readlines()) == 5
+    print("✅ Sweep trials are skipped, pruned and stored")
+
+if __name__ == "__main__":
+    print("🧪 Testing MNIST training module")
+    print("=" * 50)
+
+    test_net_parameters()
+    test_tensor_dataset_matches_transforms()
+    test_batch_loader()
+    test_batch_augment()
+    test_training_learns()
+    test_phase_timer()
+    test_training_modes()
+    test_sweep_trials()
+
+    print("\n✅ All tests passed!")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Data-parallel CPU training of Net across N processes on one machine
+
+Each process trains on its own shard of every epoch, DistributedDataParallel
+averages gradients over gloo after each backward pass, and BatchNorm running
+statistics are averaged across processes at the end of each epoch (CPU has
+no SyncBatchNorm, so batch statistics stay per process, as in plain DDP).
+Rank 0 evaluates on the test split and writes the checkpoint.
+
+--scaling runs the same training at several process counts and reports
+throughput and scaling efficiency against one process.
+
+Usage: python train_ddp.py [--processes N] [--epochs N] [--checkpoint PATH] [--resume]
+       python train_ddp.py --scaling 1 2 4 [--samples N]
+"""
+
+import argparse
+import os
+import socket
+import sys
+import time
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
+
+sys.path.append('.')
+
+from mnist_training import (TRAINING_MODES, BatchAugment, BatchLoader, Net, load_datasets, test, train)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def average_batchnorm_stats(model, world_size):
+    """All-reduce every BatchNorm's running mean and variance to their average over ranks."""
+    for module in model.modules():
+        if isinstance(module, nn.modules.batchnorm._BatchNorm):
+            for buffer in (module.running_mean, module.running_var):
+                dist.all_reduce(buffer, op=dist.ReduceOp.SUM)
+                buffer.div_(world_size)
+
+
+def save_checkpoint(path, model, optimizer, scheduler, epoch):
+    """Write the checkpoint atomically, so a crash mid-write keeps the previous one."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    torch.save({
+        'epoch': epoch,
+        'model': model.state_dict(),
+        'optimizer': optimizer.state_dict(),
+        'scheduler': scheduler.state_dict(),
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def worker(rank, world_size, port, args, results):
+    torch.set_num_threads(args.threads or max(1, (os.cpu_count() or 1) // world_size))
+    dist.init_process_group('gloo', init_method=f'tcp://127.0.0.1:{port}', rank=rank, world_size=world_size)
+    try:
+        # Same seed everywhere: identical initial weights and the same permutation to shard
+        torch.manual_seed(args.seed)
+        train_data, test_data, source = load_datasets(args.data, args.samples, args.test_samples)
+        batch_size = args.batch_size // world_size if args.global_batch else args.batch_size
+        train_loader = BatchLoader(train_data, batch_size, shuffle=True, seed=args.seed,
+                                   rank=rank, world_size=world_size)
+
+        mode = TRAINING_MODES[args.mode]
+        net = Net()
+        # BatchNorm buffers are averaged once per epoch instead of broadcast from rank 0 every step
+        model = DistributedDataParallel(mode.prepare(net), broadcast_buffers=False)
+        optimizer = optim.Adam(net.parameters(), lr=args.lr)
+        scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=args.step_size, gamma=0.1)
+        criterion = nn.CrossEntropyLoss()
+        augment = BatchAugment(seed=args.seed + rank)
+
+        start_epoch = 0
+        if args.resume and args.checkpoint and os.path.exists(args.checkpoint):
+            checkpoint = torch.load(args.checkpoint, map_location='cpu')
+            net.load_state_dict(checkpoint['model'])
+            optimizer.load_state_dict(checkpoint['optimizer'])
+            scheduler.load_state_dict(checkpoint['scheduler'])
+            start_epoch = checkpoint['epoch']
+            # Skip the permutations and augmentations of the epochs already trained
+            for _ in range(start_epoch):
+                torch.randperm(len(train_data), generator=train_loader.generator)
+                augment.skip(train_loader.batch_sizes())
+
+        epoch_seconds = []
+        for epoch in range(start_epoch, args.epochs):
+            dist.barrier()
+            start = time.perf_counter()
+            loss, accuracy = train(model, 'cpu', train_loader, optimizer, criterion, augment, mode=mode)
+            average_batchnorm_stats(net, world_size)
+            dist.barrier()
+            epoch_seconds.append(time.perf_counter() - start)
+            scheduler.step()
+
+            if rank == 0:
+                _, test_accuracy = test(net, 'cpu', BatchLoader(test_data, batch_size=1000), criterion, mode=mode)
+                print(f"Epoch {epoch + 1}: {epoch_seconds[-1]:.2f} s, train loss {loss:.4f} "
+                      f"(rank 0 shard), test accuracy {test_accuracy:.2f}%", flush=True)
+                if args.checkpoint:
+                    save_checkpoint(args.checkpoint, net, optimizer, scheduler, epoch + 1)
+            dist.barrier()
+
+        if rank == 0:
+            samples = train_loader.shard_size() * world_size
+            results.put({
+                'processes': world_size,
+                'source': source,
+                'epoch_seconds': epoch_seconds,
+                'samples_per_second': samples / min(epoch_seconds) if epoch_seconds else 0.0,
+                'test_accuracy': test_accuracy if epoch_seconds else None,
+            })
+    finally:
+        dist.destroy_process_group()
+
+
+def run(world_size, args):
+    """Train with world_size processes; returns rank 0's summary."""
+    context = mp.get_context('spawn')
+    results = context.SimpleQueue()
+    mp.spawn(worker, args=(world_size, free_port(), args, results), nprocs=world_size, join=True)
+    return results.get() if not results.empty() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--scaling', type=int, nargs='+', help='process counts to compare, e.g. 1 2 4')
+    parser.add_argument('--epochs', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=48, help='per process, or in total with --global-batch')
+    parser.add_argument('--global-batch', action='store_true', help='split --batch-size across processes')
+    parser.add_argument('--lr', type=float, default=0.0055)
+    parser.add_argument('--step-size', type=int, default=15, help='StepLR step size in epochs')
+    parser.add_argument('--mode', choices=list(TRAINING_MODES), default='fp32')
+    parser.add_argument('--threads', type=int, default=None, help='torch threads per process (default: CPUs / N)')
+    parser.add_argument('--samples', type=int, default=None, help='training samples (default: all)')
+    parser.add_argument('--test-samples', type=int, default=None)
+    parser.add_argument('--data', default='../data', help='torchvision MNIST root, if downloaded')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--checkpoint', help='rank 0 saves model, optimizer and scheduler here every epoch')
+    parser.add_argument('--resume', action='store_true', help='continue from --checkpoint if it exists')
+    args = parser.parse_args()
+
+    if not args.scaling:
+        result = run(args.processes, args)
+        if result:
+            print(f"\n{result['processes']} processes: {result['samples_per_second']:.0f} samples/s")
+        return
+
+    # Scaling runs always start fresh and leave no checkpoint behind
+    args.checkpoint = None
+    args.resume = False
+    results = [run(world_size, args) for world_size in args.scaling]
+    baseline = results[0]['samples_per_second'] / results[0]['processes']
+    print(f"\n{results[0]['source']}, {os.cpu_count()} CPUs, batch {args.batch_size}"
+          f"{' in total' if args.global_batch else ' per process'}")
+    print(f"{'processes':>9} {'epoch s':>8} {'samples/s':>10} {'speedup':>8} {'efficiency':>10} {'acc %':>6}")
+    for result in results:
+        speedup = result['samples_per_second'] / results[0]['samples_per_second']
+        efficiency = result['samples_per_second'] / (baseline * result['processes'])
+        print(f"{result['processes']:>9} {min(result['epoch_seconds']):>8.2f} {result['samples_per_second']:>10.0f} "
+              f"{speedup:>7.2f}x {100 * efficiency:>9.0f}% {result['test_accuracy']:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()